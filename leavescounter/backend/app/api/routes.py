@@ -1,22 +1,38 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query, Request
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 import uuid
+import asyncio
+from functools import partial
 import os
 import json
+import shutil
+import hashlib
 from datetime import datetime
-from app.services.image_processor import ImageProcessor
-from app.services.tree_analyzer import TreeAnalyzer
 from app.services.report_generator import ReportGenerator
+from app.services.job_engine import JobEngine
+from app.services.result_cache import ResultCache
+from app.services.batch_extractor import BatchExtractor
+from app.services.session_store import SessionStore, SESSION_STATUSES
+from app.services.result_store import ResultStore
+from app.services.export_cache import ExportCache, EXPORT_FORMATS
+from app.services.foliage_geometry import FoliageGeometry
+from app.services.analysis_pipeline import get_pipeline_parameters, save_result, recalibrate
 from app.core.config import settings
-from app.models.schemas import TreeAnalysisResult
+from app.models.schemas import ProcessingStatus
 
 router = APIRouter()
 
 # Initialize services
-image_processor = ImageProcessor()
-tree_analyzer = TreeAnalyzer()
 report_generator = ReportGenerator()
+job_engine = JobEngine()
+result_cache = ResultCache()
+batch_extractor = BatchExtractor()
+session_store = SessionStore()
+result_store = ResultStore()
+export_cache = ExportCache(report_generator, result_store=result_store)
+foliage_geometry = FoliageGeometry()
 
 def serialize_datetime(obj):
     """Custom JSON serializer for datetime objects"""
@@ -33,6 +49,94 @@ def dict_with_datetime_serialization(data):
     else:
         return serialize_datetime(data)
 
+def read_json(path):
+    """Read a JSON document from disk"""
+    with open(path, "r") as f:
+        return json.load(f)
+
+def write_json(path, data):
+    """Write a JSON document to disk"""
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+async def save_upload(upload: UploadFile, path: str, max_size: Optional[int] = None) -> str:
+    """
+    Stream an uploaded file to disk in fixed-size chunks and return its SHA-256.
+    
+    Writes happen off the event loop, and the upload is aborted with 413 as
+    soon as it exceeds max_size (MAX_FILE_SIZE by default).
+    """
+    max_size = max_size or settings.MAX_FILE_SIZE
+    digest = hashlib.sha256()
+    size = 0
+    
+    f = await run_in_threadpool(open, path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"{upload.filename} exceeds the maximum size of {max_size} bytes"
+                )
+            
+            digest.update(chunk)
+            await run_in_threadpool(f.write, chunk)
+    finally:
+        await run_in_threadpool(f.close)
+    
+    return digest.hexdigest()
+
+def get_result_cache_key(metadata):
+    """Content-address a session by its image bytes and analysis parameters"""
+    # Sessions uploaded before hashes were recorded are hashed on demand
+    front_hash = metadata.get("front_sha256") or ResultCache.hash_file(metadata["front_image"])
+    side_hash = metadata.get("side_sha256") or ResultCache.hash_file(metadata["side_image"])
+    
+    return ResultCache.make_key(front_hash, side_hash, get_pipeline_parameters(metadata))
+
+async def start_analysis(session_id, metadata):
+    """
+    Start analyzing a session.
+    
+    Returns (None, result) when an earlier analysis of identical images and
+    parameters is reused from the result cache, otherwise (job_id, None).
+    """
+    cache_key = None
+    if settings.RESULT_CACHE_ENABLED:
+        cache_key = await run_in_threadpool(get_result_cache_key, metadata)
+        cached = await run_in_threadpool(result_cache.get, cache_key)
+        
+        if cached is not None:
+            result = dict(cached, session_id=session_id, created_at=datetime.now().isoformat())
+            await run_in_threadpool(save_result, session_id, result)
+            export_cache.prerender(session_id, result_store.put(session_id, result))
+            await run_in_threadpool(session_store.set_status, session_id, "completed")
+            return None, result
+    
+    job_id = job_engine.submit(
+        session_id,
+        metadata,
+        on_complete=partial(result_cache.put, cache_key) if cache_key else None
+    )
+    await run_in_threadpool(session_store.set_status, session_id, "queued", job_id)
+    job_engine.get_job(job_id).future.add_done_callback(partial(record_job_outcome, session_id))
+    return job_id, None
+
+def record_job_outcome(session_id, future):
+    """Update the session index and result store once a session's analysis job finishes"""
+    if future.cancelled() or future.exception() is not None:
+        result_store.invalidate(session_id)
+        session_store.set_status(session_id, "failed")
+    else:
+        # The job just rewrote the result file with exactly this result
+        export_cache.prerender(session_id, result_store.put(session_id, future.result()))
+        session_store.set_status(session_id, "completed")
+
 @router.post("/upload")
 async def upload_images(
     front_image: UploadFile = File(...),
@@ -51,33 +155,34 @@ async def upload_images(
     # Generate unique session ID
     session_id = str(uuid.uuid4())
     session_dir = os.path.join(settings.UPLOAD_DIR, session_id)
-    os.makedirs(session_dir, exist_ok=True)
-    
-    # Save uploaded files
-    front_path = os.path.join(session_dir, f"front_{front_image.filename}")
-    side_path = os.path.join(session_dir, f"side_{side_image.filename}")
+    await run_in_threadpool(os.makedirs, session_dir, exist_ok=True)
     
-    with open(front_path, "wb") as f:
-        content = await front_image.read()
-        f.write(content)
+    # Stream uploaded files to disk
+    front_path = os.path.join(session_dir, f"front_{os.path.basename(front_image.filename)}")
+    side_path = os.path.join(session_dir, f"side_{os.path.basename(side_image.filename)}")
     
-    with open(side_path, "wb") as f:
-        content = await side_image.read()
-        f.write(content)
+    try:
+        front_sha256 = await save_upload(front_image, front_path)
+        side_sha256 = await save_upload(side_image, side_path)
+    except HTTPException:
+        await run_in_threadpool(shutil.rmtree, session_dir, ignore_errors=True)
+        raise
     
     # Save metadata
     metadata = {
         "session_id": session_id,
         "front_image": front_path,
         "side_image": side_path,
+        "front_sha256": front_sha256,
+        "side_sha256": side_sha256,
         "camera_height": camera_height,
         "distance_from_tree": distance_from_tree,
         "image_dpi": image_dpi
     }
     
     metadata_path = os.path.join(session_dir, "metadata.json")
-    with open(metadata_path, "w") as f:
-        json.dump(metadata, f)
+    await run_in_threadpool(write_json, metadata_path, metadata)
+    await run_in_threadpool(session_store.add, session_id)
     
     return JSONResponse({
         "session_id": session_id,
@@ -87,7 +192,7 @@ async def upload_images(
 
 @router.post("/process/{session_id}")
 async def process_tree_images(session_id: str):
-    """Process uploaded tree images and extract dimensions and leaf information"""
+    """Queue uploaded tree images for dimension and leaf analysis"""
     
     session_dir = os.path.join(settings.UPLOAD_DIR, session_id)
     metadata_path = os.path.join(session_dir, "metadata.json")
@@ -99,100 +204,212 @@ async def process_tree_images(session_id: str):
     with open(metadata_path, "r") as f:
         metadata = json.load(f)
     
-    try:
-        # Step 1: Preprocess images
-        front_processed = image_processor.preprocess_image(metadata["front_image"])
-        side_processed = image_processor.preprocess_image(metadata["side_image"])
-        
-        # Step 2: Segment trees from background
-        front_segmented = image_processor.segment_tree(front_processed)
-        side_segmented = image_processor.segment_tree(side_processed)
-        
-        # Step 3: Extract dimensions
-        dimensions = tree_analyzer.extract_dimensions(
-            front_segmented, 
-            side_segmented,
-            metadata.get("camera_height"),
-            metadata.get("distance_from_tree")
-        )
-        
-        # Step 4: Analyze leaf patterns
-        leaf_analysis = tree_analyzer.analyze_leaves(front_segmented, side_segmented)
-        
-        # Step 5: Generate 3D foliage data
-        foliage_data = tree_analyzer.generate_foliage_data(dimensions, leaf_analysis)
-        
-        # Compile results
-        result = TreeAnalysisResult(
-            session_id=session_id,
-            dimensions=dimensions,
-            leaf_analysis=leaf_analysis,
-            foliage_data=foliage_data
-        )
-        
-        # Save results
-        results_dir = os.path.join(settings.RESULTS_DIR, session_id)
-        os.makedirs(results_dir, exist_ok=True)
-        
-        results_path = os.path.join(results_dir, "analysis_result.json")
-        result_dict = result.dict()
-        
-        # Convert datetime objects to ISO format strings
-        if 'created_at' in result_dict:
-            result_dict['created_at'] = result_dict['created_at'].isoformat()
-        
-        with open(results_path, "w") as f:
-            json.dump(result_dict, f, indent=2)
-        
+    job_id, cached_result = await start_analysis(session_id, metadata)
+    
+    if cached_result is not None:
         return JSONResponse({
             "session_id": session_id,
             "status": "completed",
-            "result": result_dict
+            "cached": True,
+            "result": cached_result
         })
+    
+    # The analysis runs in a worker process; poll /jobs/{job_id} for progress
+    return JSONResponse({
+        "job_id": job_id,
+        "session_id": session_id,
+        "status": "queued"
+    }, status_code=202)
+
+@router.post("/calibrate/{session_id}")
+async def calibrate_session(
+    session_id: str,
+    camera_height: Optional[float] = Form(None),
+    distance_from_tree: Optional[float] = Form(None)
+):
+    """
+    Update the camera parameters of an analyzed session.
+    
+    Only the dimensions and the foliage volume and density depend on them,
+    so these are rescaled from the pixel measurements stored with the result
+    instead of analyzing the images again. A parameter that is omitted
+    keeps its stored value.
+    """
+    for name, value in (("camera_height", camera_height), ("distance_from_tree", distance_from_tree)):
+        if value is not None and not value > 0:
+            raise HTTPException(status_code=400, detail=f"{name} must be positive")
+    
+    session_dir = os.path.join(settings.UPLOAD_DIR, session_id)
+    metadata_path = os.path.join(session_dir, "metadata.json")
+    
+    if not os.path.exists(metadata_path):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    session = await run_in_threadpool(session_store.get, session_id)
+    if session is not None and session["status"] == "queued":
+        raise HTTPException(status_code=409, detail="Session is still being analyzed")
+    
+    stored = result_store.get(session_id)
+    if stored is None:
+        stored = await run_in_threadpool(result_store.load, session_id)
+    
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Results not found")
+    
+    result = json.loads(stored.body)
+    if not result.get("measurements"):
+        raise HTTPException(
+            status_code=409,
+            detail="Results predate calibration support; process the session again"
+        )
+    
+    metadata = await run_in_threadpool(read_json, metadata_path)
+    if camera_height is not None:
+        metadata["camera_height"] = camera_height
+    if distance_from_tree is not None:
+        metadata["distance_from_tree"] = distance_from_tree
+    
+    result = await run_in_threadpool(
+        recalibrate, result, metadata.get("camera_height"), metadata.get("distance_from_tree")
+    )
+    await run_in_threadpool(write_json, metadata_path, metadata)
+    
+    await run_in_threadpool(save_result, session_id, result)
+    export_cache.prerender(session_id, result_store.put(session_id, result))
+    
+    # A later /process with these parameters can reuse the recalibrated result
+    if settings.RESULT_CACHE_ENABLED:
+        cache_key = await run_in_threadpool(get_result_cache_key, metadata)
+        await run_in_threadpool(result_cache.put, cache_key, result)
+    
+    return JSONResponse({
+        "session_id": session_id,
+        "status": "completed",
+        "result": result
+    })
+
+@router.post("/batch")
+async def process_batch(
+    archive: UploadFile = File(...),
+    manifest: Optional[str] = Form(None)
+):
+    """
+    Analyze many trees in one request.
+    
+    The zip archive holds the front/side image pairs and, unless the manifest
+    is passed as a form field, a manifest.json listing them with their camera
+    parameters. One NDJSON line is streamed back per tree as its analysis
+    completes.
+    """
+    batch_dir = os.path.join(settings.UPLOAD_DIR, "batches")
+    await run_in_threadpool(os.makedirs, batch_dir, exist_ok=True)
+    archive_path = os.path.join(batch_dir, f"{uuid.uuid4()}.zip")
+    
+    try:
+        await save_upload(archive, archive_path, max_size=settings.MAX_BATCH_SIZE)
+        sessions = await run_in_threadpool(batch_extractor.extract, archive_path, manifest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if os.path.exists(archive_path):
+            await run_in_threadpool(os.remove, archive_path)
+    
+    for metadata in sessions:
+        await run_in_threadpool(
+            session_store.add, metadata["session_id"], tree_id=metadata["tree_id"]
+        )
+    
+    # Queue every tree before streaming so all workers are kept busy
+    completed_lines = []
+    pending = {}
+    for metadata in sessions:
+        job_id, cached_result = await start_analysis(metadata["session_id"], metadata)
+        line = {"tree_id": metadata["tree_id"], "session_id": metadata["session_id"]}
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+        if cached_result is not None:
+            completed_lines.append(dict(line, status="completed", cached=True, result=cached_result))
+        else:
+            future = asyncio.wrap_future(job_engine.get_job(job_id).future)
+            pending[future] = dict(line, job_id=job_id)
+    
+    async def stream_results():
+        for line in completed_lines:
+            yield json.dumps(line) + "\n"
+        
+        # Stream each tree as soon as its job finishes, in completion order
+        while pending:
+            done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                line = pending.pop(future)
+                if future.exception() is None:
+                    line.update(status="completed", result=future.result())
+                else:
+                    line.update(status="failed", message=f"Processing failed: {str(future.exception())}")
+                yield json.dumps(line) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@router.get("/jobs/{job_id}", response_model=ProcessingStatus)
+def get_job_status(job_id: str):
+    """Get the processing status of a queued analysis job"""
+    
+    status = job_engine.get_status(job_id)
+    
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return status
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss counters of the result cache"""
+    return JSONResponse(result_cache.stats())
 
 @router.get("/results/{session_id}")
-async def get_results(session_id: str):
-    """Get analysis results for a session"""
+async def get_results(session_id: str, request: Request):
+    """
+    Get analysis results for a session.
+    
+    Results are served from memory once read, and carry ETag/Last-Modified
+    validators so repeat polls with If-None-Match or If-Modified-Since get
+    a 304 without a body.
+    """
     
-    results_path = os.path.join(settings.RESULTS_DIR, session_id, "analysis_result.json")
+    stored = result_store.get(session_id)
+    if stored is None:
+        stored = await run_in_threadpool(result_store.load, session_id)
     
-    if not os.path.exists(results_path):
+    if stored is None:
         raise HTTPException(status_code=404, detail="Results not found")
     
-    with open(results_path, "r") as f:
-        result = json.load(f)
+    if stored.is_not_modified(
+        request.headers.get("if-none-match"),
+        request.headers.get("if-modified-since")
+    ):
+        return Response(status_code=304, headers=stored.headers)
     
-    return JSONResponse(result)
+    return Response(stored.body, media_type="application/json", headers=stored.headers)
 
 @router.post("/export/{session_id}")
 async def export_results(
     session_id: str,
-    format: str = Form(...),  # pdf, obj, gltf, png
+    format: str = Form(...),  # pdf, obj, gltf, glb, png
 ):
-    """Export results in various formats"""
+    """Export results in various formats, reusing artifacts already rendered for this result"""
     
-    results_path = os.path.join(settings.RESULTS_DIR, session_id, "analysis_result.json")
+    stored = result_store.get(session_id)
+    if stored is None:
+        stored = await run_in_threadpool(result_store.load, session_id)
     
-    if not os.path.exists(results_path):
+    if stored is None:
         raise HTTPException(status_code=404, detail="Results not found")
     
-    with open(results_path, "r") as f:
-        result = json.load(f)
+    export_format = format.lower()
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported export format")
     
     try:
-        if format.lower() == "pdf":
-            file_path = report_generator.generate_pdf_report(session_id, result)
-        elif format.lower() == "obj":
-            file_path = report_generator.generate_3d_model(session_id, result, "obj")
-        elif format.lower() == "gltf":
-            file_path = report_generator.generate_3d_model(session_id, result, "gltf")
-        elif format.lower() == "png":
-            file_path = report_generator.generate_visualization(session_id, result)
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported export format")
+        file_path = await asyncio.wrap_future(export_cache.render(session_id, export_format, stored))
         
         return FileResponse(
             path=file_path,
@@ -203,22 +420,97 @@ async def export_results(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
 
+@router.get("/visualization/{session_id}")
+async def get_visualization(
+    session_id: str,
+    preview: bool = Query(False),
+    dpi: Optional[int] = Query(None, ge=36, le=600)
+):
+    """
+    Render the results visualization as PNG straight into the response.
+    
+    preview renders at VISUALIZATION_PREVIEW_DPI instead of the export
+    resolution; an explicit dpi overrides both.
+    """
+    
+    stored = result_store.get(session_id)
+    if stored is None:
+        stored = await run_in_threadpool(result_store.load, session_id)
+    
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Results not found")
+    
+    dpi = dpi or (settings.VISUALIZATION_PREVIEW_DPI if preview else settings.VISUALIZATION_DPI)
+    png = await run_in_threadpool(report_generator.render_visualization, json.loads(stored.body), dpi)
+    
+    return Response(png, media_type="image/png")
+
+@router.get("/foliage/{session_id}")
+async def get_foliage(
+    session_id: str,
+    lod: int = Query(0, ge=0),
+    format: str = Query("glb", pattern="^(glb|json)$")
+):
+    """
+    Get leaf card foliage at a level of detail (0 is the coarsest).
+    
+    Levels are prefixes of each other, so clients can load level 0 first
+    and refine with the higher levels.
+    """
+    
+    stored = result_store.get(session_id)
+    if stored is None:
+        stored = await run_in_threadpool(result_store.load, session_id)
+    
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Results not found")
+    
+    if lod >= len(foliage_geometry.lod_sizes):
+        raise HTTPException(
+            status_code=400, detail=f"lod must be below {len(foliage_geometry.lod_sizes)}"
+        )
+    
+    result = json.loads(stored.body)
+    lod_leaf_counts = foliage_geometry.lod_leaf_counts(result['leaf_analysis']['estimated_leaf_count'])
+    if lod_leaf_counts[lod] == 0:
+        raise HTTPException(status_code=404, detail="No leaves detected for this session")
+    
+    instances = await run_in_threadpool(foliage_geometry.instances, result, lod)
+    
+    if format == "json":
+        return JSONResponse(dict(
+            foliage_geometry.to_dict(instances), lod=lod, lod_leaf_counts=lod_leaf_counts
+        ))
+    
+    glb = await run_in_threadpool(foliage_geometry.to_glb, result, instances)
+    return Response(glb, media_type="model/gltf-binary")
+
 @router.get("/sessions")
-async def list_sessions():
-    """List all processing sessions"""
-    sessions = []
-    if os.path.exists(settings.UPLOAD_DIR):
-        for session_id in os.listdir(settings.UPLOAD_DIR):
-            session_dir = os.path.join(settings.UPLOAD_DIR, session_id)
-            if os.path.isdir(session_dir):
-                metadata_path = os.path.join(session_dir, "metadata.json")
-                if os.path.exists(metadata_path):
-                    with open(metadata_path, "r") as f:
-                        metadata = json.load(f)
-                    sessions.append({
-                        "session_id": session_id,
-                        "created_at": os.path.getctime(session_dir),
-                        "has_results": os.path.exists(os.path.join(settings.RESULTS_DIR, session_id))
-                    })
-    
-    return JSONResponse({"sessions": sessions})
+async def list_sessions(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    status: Optional[str] = Query(None),
+    order: str = Query("desc", pattern="^(asc|desc)$")
+):
+    """List processing sessions, newest first unless order=asc"""
+    if status is not None and status not in SESSION_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown status '{status}', expected one of: {', '.join(SESSION_STATUSES)}"
+        )
+    
+    total, rows = await run_in_threadpool(
+        session_store.list, limit, offset, status, order == "desc"
+    )
+    sessions = [
+        {
+            "session_id": row["session_id"],
+            "created_at": row["created_at"],
+            "status": row["status"],
+            "has_results": row["status"] == "completed",
+            "tree_id": row["tree_id"]
+        }
+        for row in rows
+    ]
+    
+    return JSONResponse({"sessions": sessions, "total": total, "limit": limit, "offset": offset})
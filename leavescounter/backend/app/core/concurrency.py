@@ -0,0 +1,55 @@
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence, TypeVar
+from app.core.config import settings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+def _get_executor(prefix: str, max_workers: int) -> ThreadPoolExecutor:
+    """Create the shared thread pool for a kind of work (views, tiles) on first use"""
+    with _executors_lock:
+        if prefix not in _executors:
+            _executors[prefix] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=prefix)
+        return _executors[prefix]
+
+def _map_in_context(executor: ThreadPoolExecutor, func: Callable[[T], R], items: Sequence[T]) -> List[R]:
+    # Each item runs in a copy of the caller's context so that context
+    # variables, such as the active stage timer, carry over to the threads
+    futures = [executor.submit(contextvars.copy_context().run, func, item) for item in items]
+    return [future.result() for future in futures]
+
+def map_views(func: Callable[[T], R], views: Sequence[T]) -> List[R]:
+    """
+    Apply func to each view (front, side, ...) and return results in order.
+
+    OpenCV releases the GIL for most operations, so the views are processed
+    concurrently on a thread pool when PARALLEL_VIEWS is enabled.
+    """
+    if not settings.PARALLEL_VIEWS or len(views) < 2:
+        return [func(view) for view in views]
+
+    # Never block a pool thread on work queued to the same pool
+    if threading.current_thread().name.startswith("view"):
+        return [func(view) for view in views]
+
+    return _map_in_context(_get_executor("view", settings.VIEW_THREADS), func, views)
+
+def map_tiles(func: Callable[[T], R], tiles: Sequence[T]) -> List[R]:
+    """
+    Apply func to each image tile and return results in order.
+
+    Tiles use their own pool so that views processed on the view pool can
+    fan out to tiles without waiting on their own pool.
+    """
+    if settings.TILE_THREADS <= 1 or len(tiles) < 2:
+        return [func(tile) for tile in tiles]
+
+    if threading.current_thread().name.startswith("tile"):
+        return [func(tile) for tile in tiles]
+
+    return _map_in_context(_get_executor("tile", settings.TILE_THREADS), func, tiles)
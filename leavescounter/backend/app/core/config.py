@@ -8,6 +8,9 @@ class Settings(BaseSettings):
     
     # File Upload Settings
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1MB
+    MAX_BATCH_SIZE: int = 1024 * 1024 * 1024  # 1GB
+    MAX_BATCH_TREES: int = 1000
     ALLOWED_EXTENSIONS: list = [".jpg", ".jpeg", ".png", ".bmp", ".webp"]
     UPLOAD_DIR: str = "uploads"
     RESULTS_DIR: str = "results"
@@ -15,13 +18,54 @@ class Settings(BaseSettings):
     # ML Model Settings
     MODELS_DIR: str = "models"
     SEGMENTATION_MODEL_PATH: str = "models/tree_segmentation.pth"
+    SEGMENTATION_BACKEND: str = "hsv"  # "hsv" color thresholds, or "model" (falls back to hsv if it cannot load)
+    SEGMENTATION_THREADS: int = 1  # PyTorch CPU threads per worker process
+    SEGMENTATION_INPUT_SIZE: tuple = (512, 512)  # (width, height) the model is run at
+    SEGMENTATION_THRESHOLD: float = 0.5  # Tree probability above which a pixel is tree
+    SEGMENTATION_BATCH_SIZE: int = 2  # Views segmented together in one inference; a worker segments at most 2 at once
+    SEGMENTATION_BATCH_WAIT_MS: float = 10.0  # Longest wait for a batch to fill
     LEAF_CLASSIFIER_MODEL_PATH: str = "models/leaf_classifier.pth"
     
     # Processing Settings
     MAX_IMAGE_SIZE: tuple = (1024, 1024)
     MIN_IMAGE_SIZE: tuple = (256, 256)
+    FAST_DECODE: bool = True  # Decode large images at reduced resolution
+    DOMINANT_COLOR_MAX_SAMPLES: int = 50000
+    DOMINANT_COLOR_BINS: int = 16  # Histogram bins per RGB channel
+    FOLIAGE_LOD_LEAF_COUNTS: list = [1000, 10000, 50000]  # Leaf cards per level of detail
+    EDGE_SMOOTHING: str = "bilateral"  # Leaf edge smoothing: bilateral, bilateral_downscaled, guided or median
+    MMAP_INTERMEDIATES: bool = False  # Keep preprocessed views as memory-mapped .npy files for re-analysis
     
-    # Database Settings (if needed)
+    # High-Resolution Tiling Settings
+    HIGH_RES_MODE: bool = False  # Detect leaves on the original image, in tiles
+    TILE_SIZE: int = 1024
+    TILE_OVERLAP: int = 64  # Raised automatically to fit the largest leaf
+    TILE_THREADS: int = 2
+    HIGH_RES_MAX_PIXELS: int = 64 * 1000 * 1000  # Larger images are decoded at 1/2, 1/4 or 1/8 scale
+    
+    # Job Engine Settings
+    PROCESSING_WORKERS: int = os.cpu_count() or 1
+    MAX_TRACKED_JOBS: int = 1000
+    PARALLEL_VIEWS: bool = True  # Process front and side views concurrently
+    VIEW_THREADS: int = 2
+    WARM_UP_ON_STARTUP: bool = False  # Start workers and load analysis/export libraries before serving
+    
+    # Result Cache Settings
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_DIR: str = "cache/results"
+    RESULT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # 256MB
+    RESULT_MEMORY_CACHE_ENTRIES: int = 256  # Serialized results kept in memory for /results
+    
+    # Export Settings
+    EXPORT_RENDER_THREADS: int = 2
+    VISUALIZATION_DPI: int = 300  # Exported PNG visualization
+    VISUALIZATION_PREVIEW_DPI: int = 72  # In-app preview images
+    EXPORT_PRERENDER_FORMATS: list = []  # Formats rendered in the background after analysis, e.g. ["png", "pdf"]
+    
+    # Metrics Settings
+    METRICS_WINDOW: int = 1000  # Recent samples per stage used for quantiles
+    
+    # Database Settings (SQLite session index)
     DATABASE_URL: str = "sqlite:///./tree_calculator.db"
     
     class Config:
@@ -0,0 +1,127 @@
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+_active_timer: ContextVar[Optional["StageTimer"]] = ContextVar("active_stage_timer", default=None)
+
+class StageTimer:
+    """Accumulates the time spent in each pipeline stage during one analysis run"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Add time to a stage; stages run for both views are summed"""
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def activate(self):
+        """Make this the timer used by timed() in the current context"""
+        token = _active_timer.set(self)
+        try:
+            yield self
+        finally:
+            _active_timer.reset(token)
+
+@contextmanager
+def timed(stage: str):
+    """Time a block as the given stage of the active StageTimer, if there is one"""
+    timer = _active_timer.get()
+    if timer is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(stage, time.perf_counter() - start)
+
+class MetricsRegistry:
+    """
+    Process-wide aggregation of pipeline stage timings and counters, rendered
+    in the Prometheus text exposition format.
+
+    Quantiles are computed over the most recent METRICS_WINDOW samples of
+    each stage, while counts and sums cover the lifetime of the process.
+    """
+
+    def __init__(self, window: Optional[int] = None):
+        self.window = window or settings.METRICS_WINDOW
+        self._samples: Dict[str, Deque[float]] = {}
+        self._totals: Dict[str, Tuple[int, float]] = {}
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record one timing of a stage"""
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+            count, total = self._totals.get(stage, (0, 0.0))
+            self._totals[stage] = (count + 1, total + seconds)
+
+    def observe_run(self, timings: Dict[str, float]) -> None:
+        """Record every stage timing of an analysis run"""
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds)
+
+    def increment(self, name: str, status: str) -> None:
+        """Increment a counter labelled with a status"""
+        with self._lock:
+            self._counters[(name, status)] = self._counters.get((name, status), 0) + 1
+
+    @staticmethod
+    def _quantile(sorted_samples: List[float], q: float) -> float:
+        """Nearest-rank quantile of sorted samples"""
+        return sorted_samples[max(0, math.ceil(q * len(sorted_samples)) - 1)]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, sum and p50/p95/p99 of each stage"""
+        with self._lock:
+            snapshot = {stage: sorted(samples) for stage, samples in self._samples.items()}
+            totals = dict(self._totals)
+
+        return {
+            stage: {
+                "count": totals[stage][0],
+                "sum": totals[stage][1],
+                "p50": self._quantile(samples, 0.5),
+                "p95": self._quantile(samples, 0.95),
+                "p99": self._quantile(samples, 0.99)
+            }
+            for stage, samples in snapshot.items()
+        }
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text format"""
+        lines = [
+            "# HELP tree_pipeline_stage_seconds Time spent in each analysis pipeline stage",
+            "# TYPE tree_pipeline_stage_seconds summary"
+        ]
+        for stage, stats in sorted(self.summary().items()):
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+                lines.append(
+                    f'tree_pipeline_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {stats[key]:.6f}'
+                )
+            lines.append(f'tree_pipeline_stage_seconds_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+            lines.append(f'tree_pipeline_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (counter_name, status), value in counters:
+                if counter_name == name:
+                    lines.append(f'{name}{{status="{status}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
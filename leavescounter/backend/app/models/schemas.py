@@ -9,6 +9,14 @@ class TreeDimensions(BaseModel):
     confidence: float
     unit: str = "relative"  # or "meters" if calibrated
 
+class PixelMeasurements(BaseModel):
+    """Pixel-space tree extents the calibrated dimensions are scaled from"""
+    height: float  # Front view, pixels
+    width: float  # Front view, pixels
+    depth: float  # Side view width, pixels
+    image_height: int  # Front view height at the analysis resolution
+    confidence: float
+
 class LeafAnalysis(BaseModel):
     average_leaf_size: float
     estimated_leaf_count: int
@@ -23,13 +31,16 @@ class FoliageData(BaseModel):
     texture_map: Optional[str] = None
     vertex_count: int
     face_count: int
+    lod_leaf_counts: Optional[List[int]] = None  # Leaf cards at each level of detail
 
 class TreeAnalysisResult(BaseModel):
     session_id: str
     dimensions: TreeDimensions
     leaf_analysis: LeafAnalysis
     foliage_data: FoliageData
+    measurements: Optional[PixelMeasurements] = None
     processing_time: Optional[float] = None
+    stage_timings: Optional[Dict[str, float]] = None
     created_at: datetime = datetime.now()
 
 class UploadMetadata(BaseModel):
@@ -39,6 +50,7 @@ class UploadMetadata(BaseModel):
 
 class ProcessingStatus(BaseModel):
     session_id: str
-    status: str  # uploaded, processing, completed, failed
+    job_id: Optional[str] = None
+    status: str  # uploaded, queued, processing, completed, failed
     progress: Optional[float] = None
     message: Optional[str] = None
@@ -0,0 +1,105 @@
+import cv2
+import numpy as np
+from typing import Any, Callable, Dict, Tuple, Union
+from app.services.mask_statistics import MaskStatistics
+
+class AnalysisContext:
+    """
+    Per-view container for an image and the arrays derived from it.
+
+    Grayscale, HSV, masks and edge maps are computed on first access and
+    memoized, so the ImageProcessor and TreeAnalyzer stages share a single
+    copy instead of repeating full-frame conversions.
+    """
+
+    def __init__(self, image: np.ndarray):
+        self.image = image
+        self._cache: Dict[str, Any] = {}
+
+    @classmethod
+    def of(cls, image: Union[np.ndarray, "AnalysisContext"]) -> "AnalysisContext":
+        """Wrap a plain image in a context, passing existing contexts through"""
+        if isinstance(image, AnalysisContext):
+            return image
+        return cls(image)
+
+    def memoize(self, key: str, factory: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing it with factory on first use"""
+        if key not in self._cache:
+            self._cache[key] = factory()
+        return self._cache[key]
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value computed by a pipeline stage"""
+        self._cache[key] = value
+
+    def has(self, key: str) -> bool:
+        """Whether a value has been computed or stored for key"""
+        return key in self._cache
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Grayscale version of the image"""
+        return self.memoize("gray", lambda: cv2.cvtColor(self.image, cv2.COLOR_RGB2GRAY))
+
+    @property
+    def hsv(self) -> np.ndarray:
+        """HSV version of the image"""
+        return self.memoize("hsv", lambda: cv2.cvtColor(self.image, cv2.COLOR_RGB2HSV))
+
+    @property
+    def vegetation_mask(self) -> np.ndarray:
+        """Cleaned-up vegetation mask, available once segmentation has run"""
+        return self._cache["vegetation_mask"]
+
+    @property
+    def segmented(self) -> np.ndarray:
+        """
+        Image with the background removed; the image itself until segmented.
+        
+        When segmentation recorded only the tree mask, the masked image is
+        made on first use.
+        """
+        if "segmented" not in self._cache and "tree_bounds" in self._cache:
+            return self.memoize(
+                "segmented", lambda: cv2.bitwise_and(self.image, self.image, mask=self._cache["tree_mask"])
+            )
+        return self._cache.get("segmented", self.image)
+
+    @property
+    def segmented_gray(self) -> np.ndarray:
+        """Grayscale version of the segmented image"""
+        if "segmented" not in self._cache and "tree_bounds" not in self._cache:
+            return self.gray
+        return self.memoize(
+            "segmented_gray", lambda: cv2.cvtColor(self.segmented, cv2.COLOR_RGB2GRAY)
+        )
+
+    @property
+    def tree_bounds(self) -> Tuple[int, int, int, int]:
+        """(x, y, width, height) bounding box of the tree mask, available once segmentation found a tree"""
+        return self._cache["tree_bounds"]
+
+    @property
+    def tree_mask(self) -> np.ndarray:
+        """
+        Mask of tree pixels (255 inside the tree, 0 elsewhere).
+
+        Segmentation stores the mask it builds; for images that were segmented
+        elsewhere, the non-black pixels are treated as the tree.
+        """
+        return self.memoize(
+            "tree_mask",
+            lambda: cv2.threshold(self.segmented_gray, 0, 255, cv2.THRESH_BINARY)[1]
+        )
+
+    @property
+    def tree_statistics(self) -> MaskStatistics:
+        """Bounding box, area and occupancy profiles of the tree mask"""
+        return self.memoize(
+            "tree_statistics", lambda: MaskStatistics(self.tree_mask, self._cache.get("tree_bounds"))
+        )
@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import uuid
+import importlib.util
+import numpy as np
+from typing import TYPE_CHECKING, Dict, Any, Optional, Tuple
+from app.services.intermediate_store import IntermediateStore
+from app.services.result_cache import ResultCache
+from app.core.config import settings
+from app.core.concurrency import map_views
+from app.core.metrics import StageTimer, timed
+from app.models.schemas import TreeAnalysisResult, ProcessingStatus, PixelMeasurements, LeafAnalysis
+
+if TYPE_CHECKING:
+    from app.services.image_processor import ImageProcessor
+    from app.services.tree_analyzer import TreeAnalyzer
+    from app.services.analysis_context import AnalysisContext
+    from app.services.tiled_leaf_detector import TiledLeafDetector
+
+# Services are created lazily so that each worker process builds its own copy,
+# and the OpenCV analysis stack is only imported by processes that analyze
+_image_processor: Optional["ImageProcessor"] = None
+_tree_analyzer: Optional["TreeAnalyzer"] = None
+_tiled_detector: Optional["TiledLeafDetector"] = None
+_intermediate_store = IntermediateStore()
+
+STATUS_FILENAME = "status.json"
+RESULT_FILENAME = "analysis_result.json"
+
+# Bump whenever a change to the pipeline alters its results, so cached
+# results computed by older versions are no longer reused
+PIPELINE_VERSION = "6"
+
+def _get_services():
+    """Return the per-process image processor and tree analyzer"""
+    global _image_processor
+    if _image_processor is None:
+        from app.services.image_processor import ImageProcessor
+        _image_processor = ImageProcessor()
+    return _image_processor, _get_tree_analyzer()
+
+def _get_tree_analyzer() -> "TreeAnalyzer":
+    """Return the per-process tree analyzer, without the image processor and its segmentation model"""
+    global _tree_analyzer
+    if _tree_analyzer is None:
+        from app.services.tree_analyzer import TreeAnalyzer
+        _tree_analyzer = TreeAnalyzer()
+    return _tree_analyzer
+
+def _get_tiled_detector() -> "TiledLeafDetector":
+    """Return the per-process tiled leaf detector"""
+    global _tiled_detector
+    if _tiled_detector is None:
+        from app.services.tiled_leaf_detector import TiledLeafDetector
+        _tiled_detector = TiledLeafDetector(*_get_services())
+    return _tiled_detector
+
+def warm_up() -> None:
+    """Import the analysis stack and build the services ahead of the first analysis"""
+    _get_services()
+    if settings.HIGH_RES_MODE:
+        _get_tiled_detector()
+
+def get_status_path(session_id: str) -> str:
+    """Path of the progress file written while a session is being processed"""
+    return os.path.join(settings.RESULTS_DIR, session_id, STATUS_FILENAME)
+
+def write_status(
+    session_id: str,
+    status: str,
+    progress: Optional[float] = None,
+    message: Optional[str] = None
+) -> None:
+    """Persist processing progress so that other processes can report it"""
+    results_dir = os.path.join(settings.RESULTS_DIR, session_id)
+    os.makedirs(results_dir, exist_ok=True)
+
+    processing_status = ProcessingStatus(
+        session_id=session_id,
+        status=status,
+        progress=progress,
+        message=message
+    )
+
+    # Write to a temporary file first so readers never see a partial document
+    status_path = get_status_path(session_id)
+    tmp_path = f"{status_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(processing_status.dict(), f)
+    os.replace(tmp_path, status_path)
+
+def read_status(session_id: str) -> Optional[ProcessingStatus]:
+    """Read the last progress written for a session, if any"""
+    status_path = get_status_path(session_id)
+
+    try:
+        with open(status_path, "r") as f:
+            return ProcessingStatus(**json.load(f))
+    except (OSError, ValueError):
+        return None
+
+def get_segmentation_parameters() -> Optional[list]:
+    """
+    Identity of the segmentation model the workers use, None when they segment by color.
+
+    Checked without importing PyTorch: the model is used when it is configured,
+    its file exists and PyTorch is installed.
+    """
+    model_path = settings.SEGMENTATION_MODEL_PATH
+    if settings.SEGMENTATION_BACKEND != "model" or not os.path.exists(model_path):
+        return None
+    if importlib.util.find_spec("torch") is None:
+        return None
+
+    stat = os.stat(model_path)
+    return [
+        model_path, stat.st_size, stat.st_mtime_ns,
+        list(settings.SEGMENTATION_INPUT_SIZE), settings.SEGMENTATION_THRESHOLD
+    ]
+
+def _as_float(value: Optional[float]) -> Optional[float]:
+    """A camera parameter as a float, so 10 and 10.0 give the same cache key"""
+    return None if value is None else float(value)
+
+def get_pipeline_parameters(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Everything besides the images themselves that determines a result"""
+    return {
+        "pipeline_version": PIPELINE_VERSION,
+        "camera_height": _as_float(metadata.get("camera_height")),
+        "distance_from_tree": _as_float(metadata.get("distance_from_tree")),
+        "max_image_size": list(settings.MAX_IMAGE_SIZE),
+        "min_image_size": list(settings.MIN_IMAGE_SIZE),
+        "fast_decode": settings.FAST_DECODE,
+        "edge_smoothing": settings.EDGE_SMOOTHING,
+        "segmentation_model": get_segmentation_parameters(),
+        "high_res": [settings.TILE_SIZE, settings.TILE_OVERLAP, settings.HIGH_RES_MAX_PIXELS]
+        if settings.HIGH_RES_MODE else None
+    }
+
+def save_result(session_id: str, result_dict: Dict[str, Any]) -> str:
+    """Save an analysis result for a session and mark the session completed"""
+    results_dir = os.path.join(settings.RESULTS_DIR, session_id)
+    os.makedirs(results_dir, exist_ok=True)
+
+    # Readers poll the result while it is rewritten (recalibration, reprocessing),
+    # so write a uniquely named temporary file and swap it in
+    results_path = os.path.join(results_dir, RESULT_FILENAME)
+    tmp_path = f"{results_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(result_dict, f, indent=2)
+    os.replace(tmp_path, results_path)
+
+    write_status(session_id, "completed", 1.0, "Analysis completed successfully")
+
+    return results_path
+
+def get_preprocessing_parameters() -> Dict[str, Any]:
+    """Everything besides the image itself that determines a preprocessed and segmented view"""
+    return {
+        "pipeline_version": PIPELINE_VERSION,
+        "max_image_size": list(settings.MAX_IMAGE_SIZE),
+        "min_image_size": list(settings.MIN_IMAGE_SIZE),
+        "fast_decode": settings.FAST_DECODE,
+        "segmentation_model": get_segmentation_parameters()
+    }
+
+def _prepare_view(view: Tuple[str, str, str, Optional[str]]) -> "AnalysisContext":
+    """
+    Preprocess a single view and segment the tree from its background.
+
+    view is (session_id, view name, image path, image hash). The segmented
+    image is only made when a stage uses it. With MMAP_INTERMEDIATES, the
+    preprocessed image, segmented image and tree mask are kept as
+    memory-mapped files under the session's results, and a re-analysis of
+    the same image maps them instead of decoding again.
+    """
+    from app.services.analysis_context import AnalysisContext
+
+    session_id, name, image_path, image_hash = view
+    image_processor, _ = _get_services()
+
+    if not settings.MMAP_INTERMEDIATES:
+        return image_processor.segment(
+            AnalysisContext(image_processor.preprocess_image(image_path)), masked_copy=False
+        )
+
+    # Sessions uploaded before hashes were recorded are hashed on demand
+    fingerprint = IntermediateStore.fingerprint(
+        image_hash or ResultCache.hash_file(image_path), get_preprocessing_parameters()
+    )
+    arrays = _intermediate_store.load(session_id, name, fingerprint)
+    if arrays is None:
+        context = image_processor.segment(AnalysisContext(image_processor.preprocess_image(image_path)))
+        arrays = {"preprocessed": context.image}
+        # Absent when no vegetation was found
+        if context.has("tree_bounds"):
+            arrays.update(
+                segmented=context.segmented,
+                tree_mask=context.tree_mask,
+                tree_bounds=np.array(context.tree_bounds)
+            )
+        # Continue on the mapped copies, so the decoded frames can be freed
+        arrays = _intermediate_store.save(session_id, name, fingerprint, arrays)
+
+    context = AnalysisContext(arrays["preprocessed"])
+    for key in ("segmented", "tree_mask"):
+        if key in arrays:
+            context.set(key, arrays[key])
+    if "tree_bounds" in arrays:
+        context.set("tree_bounds", tuple(int(v) for v in arrays["tree_bounds"]))
+    return context
+
+def run_analysis(session_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the full analysis pipeline for a session and save the result.
+
+    This is a module-level function so it can be pickled and executed in a
+    worker process of the job engine.
+    """
+    _, tree_analyzer = _get_services()
+    timer = StageTimer()
+    start = time.perf_counter()
+
+    try:
+        with timer.activate():
+            result_dict = _analyze(session_id, metadata, tree_analyzer)
+
+        result_dict["processing_time"] = time.perf_counter() - start
+        result_dict["stage_timings"] = timer.timings
+        save_result(session_id, result_dict)
+        return result_dict
+
+    except Exception as e:
+        write_status(session_id, "failed", None, f"Processing failed: {str(e)}")
+        raise
+
+def _analyze(session_id: str, metadata: Dict[str, Any], tree_analyzer: "TreeAnalyzer") -> Dict[str, Any]:
+    """Pipeline stages of run_analysis, returning the result dict"""
+    # Steps 1-2: Preprocess and segment both views, concurrently if enabled
+    write_status(session_id, "processing", 0.0, "Preprocessing and segmenting images")
+    front_segmented, side_segmented = map_views(_prepare_view, [
+        (session_id, "front", metadata["front_image"], metadata.get("front_sha256")),
+        (session_id, "side", metadata["side_image"], metadata.get("side_sha256"))
+    ])
+
+    # Step 3: Extract dimensions
+    write_status(session_id, "processing", 0.4, "Extracting dimensions")
+    with timed("dimensions"):
+        measurements = tree_analyzer.measure_dimensions(front_segmented, side_segmented)
+        dimensions = tree_analyzer.scale_dimensions(
+            measurements,
+            metadata.get("camera_height"),
+            metadata.get("distance_from_tree")
+        )
+
+    # Step 4: Analyze leaf patterns, on the full-resolution images in high-res mode
+    write_status(session_id, "processing", 0.6, "Analyzing leaves")
+    if settings.HIGH_RES_MODE:
+        leaf_analysis = _get_tiled_detector().analyze_leaves(
+            metadata["front_image"], metadata["side_image"], front_segmented, side_segmented
+        )
+    else:
+        leaf_analysis = tree_analyzer.analyze_leaves(front_segmented, side_segmented)
+
+    # Step 5: Generate 3D foliage data
+    write_status(session_id, "processing", 0.8, "Generating foliage data")
+    with timed("foliage"):
+        foliage_data = tree_analyzer.generate_foliage_data(dimensions, leaf_analysis)
+
+    # Compile results
+    result = TreeAnalysisResult(
+        session_id=session_id,
+        dimensions=dimensions,
+        leaf_analysis=leaf_analysis,
+        foliage_data=foliage_data,
+        measurements=measurements
+    )
+
+    # Convert datetime objects to ISO format strings
+    result_dict = result.dict()
+    if 'created_at' in result_dict:
+        result_dict['created_at'] = result_dict['created_at'].isoformat()
+
+    return result_dict
+
+def recalibrate(
+    result_dict: Dict[str, Any],
+    camera_height: Optional[float],
+    distance_from_tree: Optional[float]
+) -> Dict[str, Any]:
+    """
+    Recompute the camera-dependent parts of a result for new camera parameters.
+
+    Dimensions are rescaled from the result's pixel measurements, and the
+    foliage volume and density follow from them; leaf analysis and everything
+    else is kept, so no image is read, and no image processor or
+    segmentation model is built.
+    """
+    tree_analyzer = _get_tree_analyzer()
+    measurements = PixelMeasurements(**result_dict["measurements"])
+    dimensions = tree_analyzer.scale_dimensions(measurements, camera_height, distance_from_tree)
+    foliage_data = tree_analyzer.generate_foliage_data(
+        dimensions, LeafAnalysis(**result_dict["leaf_analysis"])
+    )
+
+    return dict(
+        result_dict,
+        dimensions=dimensions.dict(),
+        foliage_data=dict(
+            result_dict["foliage_data"], volume=foliage_data.volume, density=foliage_data.density
+        )
+    )
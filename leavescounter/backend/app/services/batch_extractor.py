@@ -0,0 +1,139 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import zipfile
+from typing import Dict, Any, List, Optional
+from app.core.config import settings
+
+MANIFEST_FILENAME = "manifest.json"
+
+# Optional per-tree numbers, each positive when given
+NUMERIC_FIELDS = ("camera_height", "distance_from_tree", "image_dpi")
+
+class BatchExtractor:
+    """Unpacks a batch archive of tree image pairs into one upload session per tree"""
+
+    def __init__(self, upload_dir: Optional[str] = None):
+        self.upload_dir = upload_dir or settings.UPLOAD_DIR
+
+    def extract(self, archive_path: str, manifest_json: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Create a session for every tree listed in the manifest and return their
+        metadata, in manifest order.
+
+        The manifest is either given explicitly or read from manifest.json in
+        the archive. It is a list of trees (or {"trees": [...]}) with the
+        archive paths of the front and side images and optional camera
+        parameters:
+
+            {"tree_id": "t1", "front_image": "t1_front.jpg", "side_image": "t1_side.jpg",
+             "camera_height": 1.5, "distance_from_tree": 10.0}
+        """
+        try:
+            archive = zipfile.ZipFile(archive_path)
+        except zipfile.BadZipFile:
+            raise ValueError("Batch archive is not a valid zip file")
+
+        sessions = []
+        with archive:
+            trees = self._load_manifest(archive, manifest_json)
+            try:
+                for index, tree in enumerate(trees):
+                    sessions.append(self._create_session(archive, index, tree))
+            except Exception:
+                # Don't leave half of a batch behind
+                for metadata in sessions:
+                    shutil.rmtree(os.path.dirname(metadata["front_image"]), ignore_errors=True)
+                raise
+
+        return sessions
+
+    def _load_manifest(self, archive: zipfile.ZipFile, manifest_json: Optional[str]) -> List[Dict[str, Any]]:
+        """Parse and validate the manifest"""
+        if manifest_json is None:
+            try:
+                manifest_json = archive.read(MANIFEST_FILENAME).decode()
+            except KeyError:
+                raise ValueError(f"Batch archive has no {MANIFEST_FILENAME} and no manifest was given")
+
+        try:
+            manifest = json.loads(manifest_json)
+        except ValueError:
+            raise ValueError("Manifest is not valid JSON")
+
+        trees = manifest.get("trees") if isinstance(manifest, dict) else manifest
+        if not isinstance(trees, list) or not trees:
+            raise ValueError("Manifest must list at least one tree")
+        if len(trees) > settings.MAX_BATCH_TREES:
+            raise ValueError(f"Manifest lists more than {settings.MAX_BATCH_TREES} trees")
+
+        members = set(archive.namelist())
+        for index, tree in enumerate(trees):
+            if not isinstance(tree, dict):
+                raise ValueError(f"Manifest entry {index} is not an object")
+            for key in ("front_image", "side_image"):
+                name = tree.get(key)
+                if not isinstance(name, str):
+                    raise ValueError(f"Manifest entry {index}: {key} must be an archive path")
+                if name not in members:
+                    raise ValueError(f"Manifest entry {index}: {key} '{name}' not found in archive")
+                if not any(name.lower().endswith(ext) for ext in settings.ALLOWED_EXTENSIONS):
+                    raise ValueError(f"Manifest entry {index}: invalid file type for {name}")
+                if archive.getinfo(name).file_size > settings.MAX_FILE_SIZE:
+                    raise ValueError(f"Manifest entry {index}: {name} exceeds the maximum file size")
+            for key in NUMERIC_FIELDS:
+                value = tree.get(key)
+                if value is None:
+                    continue
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or not value > 0:
+                    raise ValueError(f"Manifest entry {index}: {key} must be a positive number or null")
+
+        return trees
+
+    def _create_session(self, archive: zipfile.ZipFile, index: int, tree: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract one tree's images into a new session and save its metadata"""
+        session_id = str(uuid.uuid4())
+        session_dir = os.path.join(self.upload_dir, session_id)
+        os.makedirs(session_dir, exist_ok=True)
+
+        metadata = {
+            "session_id": session_id,
+            "tree_id": str(tree.get("tree_id", index)),
+            "camera_height": tree.get("camera_height"),
+            "distance_from_tree": tree.get("distance_from_tree"),
+            "image_dpi": tree.get("image_dpi")
+        }
+
+        try:
+            for view in ("front", "side"):
+                name = tree[f"{view}_image"]
+                # Only the base name is used so archive paths can't escape the session dir
+                path = os.path.join(session_dir, f"{view}_{os.path.basename(name)}")
+                metadata[f"{view}_image"] = path
+                metadata[f"{view}_sha256"] = self._extract_member(archive, name, path)
+
+            with open(os.path.join(session_dir, "metadata.json"), "w") as f:
+                json.dump(metadata, f)
+        except Exception:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            raise
+
+        return metadata
+
+    def _extract_member(self, archive: zipfile.ZipFile, name: str, path: str) -> str:
+        """Copy an archive member to path in chunks and return its SHA-256"""
+        digest = hashlib.sha256()
+        size = 0
+
+        with archive.open(name) as src, open(path, "wb") as dst:
+            for chunk in iter(lambda: src.read(settings.UPLOAD_CHUNK_SIZE), b""):
+                # The declared size was checked already; guard against lying headers
+                size += len(chunk)
+                if size > settings.MAX_FILE_SIZE:
+                    raise ValueError(f"{name} exceeds the maximum file size")
+                digest.update(chunk)
+                dst.write(chunk)
+
+        return digest.hexdigest()
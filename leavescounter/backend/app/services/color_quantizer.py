@@ -0,0 +1,90 @@
+import numpy as np
+from typing import List, Optional, Tuple
+from app.core.config import settings
+
+class DominantColorExtractor:
+    """
+    Finds dominant colors in bounded time regardless of how many pixels are given.
+
+    Pixels are subsampled deterministically, quantized into a 3D color
+    histogram, and the populated histogram bins are clustered with a few
+    weighted k-means iterations. Colors are returned most populous first.
+    """
+
+    def __init__(
+        self,
+        n_clusters: int = 5,
+        max_samples: Optional[int] = None,
+        bins_per_channel: Optional[int] = None,
+        iterations: int = 10
+    ):
+        self.n_clusters = n_clusters
+        self.max_samples = max_samples or settings.DOMINANT_COLOR_MAX_SAMPLES
+        self.bins_per_channel = bins_per_channel or settings.DOMINANT_COLOR_BINS
+        self.iterations = iterations
+
+    def extract(self, pixels: np.ndarray, n_colors: int = 3) -> List[str]:
+        """Return the n_colors most dominant colors of an (N, 3) RGB array as hex strings"""
+        centers, _ = self.cluster(pixels)
+        return [
+            "#{:02x}{:02x}{:02x}".format(int(color[0]), int(color[1]), int(color[2]))
+            for color in centers[:n_colors]
+        ]
+
+    def cluster(self, pixels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return cluster centers and their pixel counts, ordered by population"""
+        pixels = pixels.reshape(-1, 3)
+        if len(pixels) == 0:
+            return np.empty((0, 3)), np.empty(0)
+
+        # Evenly strided subsample: deterministic and spread over the whole region
+        step = -(-len(pixels) // self.max_samples)
+        pixels = pixels[::step].astype(np.int64)
+
+        colors, weights = self._histogram(pixels)
+        return self._weighted_kmeans(colors, weights)
+
+    def _histogram(self, pixels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Quantize pixels into histogram bins; return each populated bin's mean color and count"""
+        bins = self.bins_per_channel
+        quantized = pixels * bins // 256
+        index = (quantized[:, 0] * bins + quantized[:, 1]) * bins + quantized[:, 2]
+
+        counts = np.bincount(index, minlength=bins ** 3)
+        populated = np.flatnonzero(counts)
+
+        sums = np.stack(
+            [np.bincount(index, weights=pixels[:, channel], minlength=bins ** 3) for channel in range(3)],
+            axis=1
+        )
+
+        return sums[populated] / counts[populated, None], counts[populated].astype(np.float64)
+
+    def _weighted_kmeans(self, colors: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cluster histogram bins, seeding with the most populated bins"""
+        k = min(self.n_clusters, len(colors))
+        centers = colors[np.argsort(-weights, kind="stable")[:k]].copy()
+
+        for _ in range(self.iterations):
+            distances = ((colors[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+            labels = distances.argmin(axis=1)
+
+            cluster_weights = np.bincount(labels, weights=weights, minlength=k)
+            updated = np.stack(
+                [np.bincount(labels, weights=weights * colors[:, channel], minlength=k) for channel in range(3)],
+                axis=1
+            )
+            nonempty = cluster_weights > 0
+            updated[nonempty] /= cluster_weights[nonempty, None]
+            updated[~nonempty] = centers[~nonempty]
+
+            if np.allclose(updated, centers):
+                break
+            centers = updated
+
+        distances = ((colors[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        cluster_weights = np.bincount(distances.argmin(axis=1), weights=weights, minlength=k)
+
+        order = np.argsort(-cluster_weights, kind="stable")
+        order = order[cluster_weights[order] > 0]
+        return centers[order], cluster_weights[order]
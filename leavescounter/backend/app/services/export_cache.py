@@ -0,0 +1,130 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.services.report_generator import ReportGenerator
+from app.services.result_store import ResultStore, StoredResult
+
+EXPORT_FORMATS = {"pdf": ".pdf", "png": ".png", "obj": ".obj", "gltf": ".gltf", "glb": ".glb"}
+
+class ExportCache:
+    """
+    On-disk cache of exported artifacts, keyed by session, format and result version.
+
+    Artifacts live in <results>/<session>/exports/<version>/, where the
+    version identifies the result contents, so a rewritten result is never
+    served a stale export. Each render writes into its own temporary
+    directory and is moved into place, so renders of different versions never
+    share a file. Once an artifact of the session's current result (as held
+    by result_store) is rendered, the other versions are removed, except
+    those still being rendered. Rendering runs on a small dedicated thread
+    pool, and concurrent requests for the same artifact share a single render.
+    """
+
+    def __init__(
+        self,
+        report_generator: ReportGenerator,
+        max_workers: Optional[int] = None,
+        result_store: Optional[ResultStore] = None
+    ):
+        self.report_generator = report_generator
+        self.result_store = result_store
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.EXPORT_RENDER_THREADS,
+            thread_name_prefix="export"
+        )
+        self._pending: Dict[Tuple[str, str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _exports_dir(session_id: str) -> str:
+        return os.path.join(settings.RESULTS_DIR, session_id, "exports")
+
+    def get(self, session_id: str, export_format: str, version: str) -> Optional[str]:
+        """Return the path of a cached artifact, or None"""
+        version_dir = os.path.join(self._exports_dir(session_id), version)
+        if not os.path.isdir(version_dir):
+            return None
+
+        extension = EXPORT_FORMATS[export_format]
+        for name in os.listdir(version_dir):
+            if name.endswith(extension):
+                return os.path.join(version_dir, name)
+        return None
+
+    def render(self, session_id: str, export_format: str, stored: StoredResult) -> Future:
+        """Return a future for the artifact's path, rendering it only if it isn't cached"""
+        key = (session_id, export_format, stored.version)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._get_or_render, session_id, export_format, stored)
+            self._pending[key] = future
+
+        # Registered outside the lock: it runs immediately if the render already finished
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def prerender(self, session_id: str, stored: StoredResult) -> None:
+        """Render the EXPORT_PRERENDER_FORMATS artifacts of a new result in the background"""
+        for export_format in settings.EXPORT_PRERENDER_FORMATS:
+            if export_format in EXPORT_FORMATS:
+                self.render(session_id, export_format, stored)
+
+    def _forget(self, key: Tuple[str, str, str]) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _get_or_render(self, session_id: str, export_format: str, stored: StoredResult) -> str:
+        cached_path = self.get(session_id, export_format, stored.version)
+        if cached_path is not None:
+            return cached_path
+
+        version_dir = os.path.join(self._exports_dir(session_id), stored.version)
+        os.makedirs(version_dir, exist_ok=True)
+        render_dir = tempfile.mkdtemp(prefix=".render-", dir=version_dir)
+        try:
+            result = json.loads(stored.body)
+            if export_format == "pdf":
+                file_path = self.report_generator.generate_pdf_report(session_id, result, output_dir=render_dir)
+            elif export_format == "png":
+                file_path = self.report_generator.generate_visualization(session_id, result, output_dir=render_dir)
+            else:
+                file_path = self.report_generator.generate_3d_model(
+                    session_id, result, export_format, output_dir=render_dir
+                )
+
+            cached_path = os.path.join(version_dir, os.path.basename(file_path))
+            os.replace(file_path, cached_path)
+        finally:
+            shutil.rmtree(render_dir, ignore_errors=True)
+
+        self._remove_stale_versions(session_id, stored.version)
+        return cached_path
+
+    def _remove_stale_versions(self, session_id: str, version: str) -> None:
+        """
+        Delete artifacts of other result versions, once version is the current one.
+
+        Whichever render finishes last must not prune: an older render finishing
+        after a newer one would delete the newer artifacts.
+        """
+        current = self.result_store.get(session_id) if self.result_store is not None else None
+        if current is None or current.version != version:
+            return
+
+        with self._lock:
+            rendering = {key[2] for key in self._pending if key[0] == session_id}
+
+        exports_dir = self._exports_dir(session_id)
+        for name in os.listdir(exports_dir):
+            if name != version and name not in rendering:
+                shutil.rmtree(os.path.join(exports_dir, name), ignore_errors=True)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
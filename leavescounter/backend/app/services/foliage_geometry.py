@@ -0,0 +1,213 @@
+import zlib
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import settings
+from app.services.mesh_builder import (
+    FLOAT, UNSIGNED_INT, ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER, CROWN_COLOR,
+    crown_ellipsoid, hex_to_linear_rgb, pack_glb
+)
+
+# Leaf card (width, length) in meters for each leaf type. Cards take the shape
+# of their type and, when the result has the pixel scale, the size of the
+# measured leaves
+LEAF_CARD_SHAPES = {
+    "elongated": (0.03, 0.10),
+    "rounded": (0.07, 0.07),
+    "serrated": (0.05, 0.08),
+    "general": (0.05, 0.08)
+}
+
+class FoliageInstances:
+    """Per-leaf transforms of one level of detail: translation, rotation quaternion (x, y, z, w) and scale"""
+
+    def __init__(self, translations: np.ndarray, rotations: np.ndarray, scales: np.ndarray):
+        self.translations = np.ascontiguousarray(translations, dtype=np.float32)
+        self.rotations = np.ascontiguousarray(rotations, dtype=np.float32)
+        self.scales = np.ascontiguousarray(scales, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.translations)
+
+class FoliageGeometry:
+    """
+    Leaf card foliage inside the crown ellipsoid, at several levels of detail.
+
+    Each level holds min(LOD size, estimated leaf count) cards, spread
+    uniformly through the crown volume. When a level has fewer cards than
+    the tree has leaves, each card stands for several leaves and is enlarged
+    to cover their area. Levels are prefixes of one random draw, so a client
+    can show a coarse level first and refine it with the next one. The geometry
+    is a single leaf card plus one transform per leaf, the layout GPU
+    instancing expects (EXT_mesh_gpu_instancing in glTF).
+    """
+
+    def __init__(self, lod_leaf_counts: Optional[List[int]] = None):
+        self.lod_sizes = sorted(lod_leaf_counts or settings.FOLIAGE_LOD_LEAF_COUNTS)
+
+    def lod_leaf_counts(self, estimated_leaf_count: int) -> List[int]:
+        """Number of leaf cards at each level of detail"""
+        return [min(size, max(estimated_leaf_count, 0)) for size in self.lod_sizes]
+
+    @staticmethod
+    def leaf_card_size(result: Dict[str, Any]) -> Tuple[float, float]:
+        """
+        Leaf card (width, length) in the units of the result's dimensions.
+
+        The card has the shape of the leaf type and the area of the average
+        leaf, which is measured in pixels and scaled to the dimensions the
+        way the tree itself is: by 1 for relative dimensions, and by the
+        ratio of the dimensions to the pixel measurements otherwise. Results
+        whose scale is unknown fall back to the typical size in meters.
+        """
+        leaf_analysis = result['leaf_analysis']
+        width, length = LEAF_CARD_SHAPES.get(leaf_analysis.get('leaf_type'), LEAF_CARD_SHAPES["general"])
+
+        dimensions = result['dimensions']
+        measurements = result.get('measurements')
+        if measurements and measurements.get('height'):
+            pixel_scale = dimensions['height'] / measurements['height']
+        elif dimensions.get('unit') == "relative":
+            pixel_scale = 1.0
+        else:
+            pixel_scale = None
+
+        leaf_size = leaf_analysis.get('average_leaf_size') or 0
+        if pixel_scale is None or leaf_size <= 0:
+            return width, length
+
+        # Side of a square with the average leaf area, stretched to the card's aspect ratio
+        side = np.sqrt(leaf_size) * pixel_scale
+        aspect = np.sqrt(length / width)
+        return float(side / aspect), float(side * aspect)
+
+    def instances(self, result: Dict[str, Any], lod: int) -> FoliageInstances:
+        """Leaf card transforms of a result at a level of detail"""
+        leaf_analysis = result['leaf_analysis']
+        estimated = leaf_analysis['estimated_leaf_count']
+        counts = self.lod_leaf_counts(estimated)
+        count = counts[lod]
+
+        # Seeded per session so every level (and every request) draws the same leaves
+        rng = np.random.default_rng(zlib.crc32(result['session_id'].encode()))
+        total = counts[-1]
+        center, radii = crown_ellipsoid(result['dimensions'])
+
+        # Uniform points in the unit ball, stretched onto the crown ellipsoid
+        directions = rng.standard_normal((total, 3))
+        directions /= np.maximum(np.linalg.norm(directions, axis=1, keepdims=True), 1e-12)
+        radius = rng.random(total) ** (1 / 3)
+        translations = center + directions * radius[:, None] * radii
+
+        # Random heading, tilted up to 60 degrees from vertical
+        yaw = rng.uniform(0, 2 * np.pi, total)
+        pitch = rng.uniform(-np.pi / 3, np.pi / 3, total)
+        # Quaternion product of the yaw (about y) and pitch (about x) rotations
+        rotations = np.stack([
+            np.cos(yaw / 2) * np.sin(pitch / 2),
+            np.sin(yaw / 2) * np.cos(pitch / 2),
+            -np.sin(yaw / 2) * np.sin(pitch / 2),
+            np.cos(yaw / 2) * np.cos(pitch / 2)
+        ], axis=1)
+
+        width, length = self.leaf_card_size(result)
+        jitter = rng.uniform(0.8, 1.2, total)
+
+        translations, rotations, jitter = translations[:count], rotations[:count], jitter[:count]
+
+        # Cards at coarse levels cover the area of the leaves they stand for
+        enlargement = np.sqrt(estimated / count) if count else 1.0
+        scales = np.stack([
+            width * enlargement * jitter,
+            length * enlargement * jitter,
+            np.ones(count)
+        ], axis=1)
+
+        return FoliageInstances(translations, rotations, scales)
+
+    @staticmethod
+    def leaf_card() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Unit quad in the XY plane facing +Z: positions, normals and triangle indices"""
+        positions = np.array([[-0.5, -0.5, 0], [0.5, -0.5, 0], [0.5, 0.5, 0], [-0.5, 0.5, 0]], dtype=np.float32)
+        normals = np.tile(np.array([0, 0, 1], dtype=np.float32), (4, 1))
+        indices = np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)
+        return positions, normals, indices
+
+    def to_glb(self, result: Dict[str, Any], instances: FoliageInstances) -> bytes:
+        """One leaf card mesh instanced with EXT_mesh_gpu_instancing"""
+        positions, normals, indices = self.leaf_card()
+        arrays = [
+            (positions, ARRAY_BUFFER, FLOAT, "VEC3"),
+            (normals, ARRAY_BUFFER, FLOAT, "VEC3"),
+            (indices, ELEMENT_ARRAY_BUFFER, UNSIGNED_INT, "SCALAR"),
+            (instances.translations, None, FLOAT, "VEC3"),
+            (instances.rotations, None, FLOAT, "VEC4"),
+            (instances.scales, None, FLOAT, "VEC3")
+        ]
+
+        buffer_views, accessors, chunks = [], [], []
+        byte_offset = 0
+        for data, target, component_type, accessor_type in arrays:
+            raw = data.tobytes()
+            view = {"buffer": 0, "byteOffset": byte_offset, "byteLength": len(raw)}
+            if target is not None:
+                view["target"] = target
+            buffer_views.append(view)
+            accessors.append({
+                "bufferView": len(buffer_views) - 1,
+                "componentType": component_type,
+                "count": len(data) if data.ndim > 1 else data.size,
+                "type": accessor_type
+            })
+            chunks.append(raw)
+            byte_offset += len(raw)
+
+        accessors[0]["min"] = positions.min(axis=0).tolist()
+        accessors[0]["max"] = positions.max(axis=0).tolist()
+
+        colors = result['leaf_analysis'].get('dominant_colors') or []
+        color = hex_to_linear_rgb(colors[0]) if colors else CROWN_COLOR
+
+        gltf = {
+            "asset": {"version": "2.0", "generator": "Tree Calculator"},
+            "extensionsUsed": ["EXT_mesh_gpu_instancing"],
+            "extensionsRequired": ["EXT_mesh_gpu_instancing"],
+            "scene": 0,
+            "scenes": [{"nodes": [0]}],
+            "nodes": [{
+                "name": "Foliage",
+                "mesh": 0,
+                "extensions": {
+                    "EXT_mesh_gpu_instancing": {
+                        "attributes": {"TRANSLATION": 3, "ROTATION": 4, "SCALE": 5}
+                    }
+                }
+            }],
+            "meshes": [{
+                "name": "LeafCard",
+                "primitives": [{"attributes": {"POSITION": 0, "NORMAL": 1}, "indices": 2, "material": 0}]
+            }],
+            "materials": [{
+                "name": "LeafMaterial",
+                "doubleSided": True,
+                "pbrMetallicRoughness": {
+                    "baseColorFactor": [*color, 1.0],
+                    "metallicFactor": 0.0,
+                    "roughnessFactor": 0.9
+                }
+            }],
+            "accessors": accessors,
+            "bufferViews": buffer_views,
+            "buffers": [{"byteLength": byte_offset}]
+        }
+        return pack_glb(gltf, b"".join(chunks))
+
+    def to_dict(self, instances: FoliageInstances) -> Dict[str, Any]:
+        """Flat arrays of the leaf card and its instance transforms, for JSON clients"""
+        positions, _, indices = self.leaf_card()
+        return {
+            "leaf_count": len(instances),
+            "card": {"positions": positions.ravel().tolist(), "indices": indices.tolist()},
+            "translations": instances.translations.ravel().round(4).tolist(),
+            "rotations": instances.rotations.ravel().round(4).tolist(),
+            "scales": instances.scales.ravel().round(4).tolist()
+        }
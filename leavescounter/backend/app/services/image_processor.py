@@ -1,52 +1,126 @@
 import cv2
+import logging
 import numpy as np
 from PIL import Image
 import os
-from typing import Tuple, Optional
+import threading
+from typing import Tuple, Optional, Union
 from app.core.config import settings
+from app.core.metrics import timed
+from app.services.analysis_context import AnalysisContext
+from app.services.segmentation_model import load_segmentation_model
+
+logger = logging.getLogger(__name__)
 
 class ImageProcessor:
     """Handles image preprocessing, normalization, and segmentation"""
     
+    # imread flags for decoding at 1/1, 1/2, 1/4 and 1/8 resolution. JPEGs are
+    # scaled in the DCT domain, which is much cheaper than a full decode.
+    REDUCED_DECODE_FLAGS = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8
+    }
+    
+    # HSV range of vegetation, from dark greens through lighter yellow-greens
+    VEGETATION_HSV_RANGE = (np.array([25, 30, 30], np.uint8), np.array([95, 255, 255], np.uint8))
+    
+    # Structuring element of the mask clean-up
+    MORPH_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+    
     def __init__(self):
         self.max_size = settings.MAX_IMAGE_SIZE
         self.min_size = settings.MIN_IMAGE_SIZE
+        # Per-thread scratch buffers, since views are segmented on parallel threads
+        self._scratch = threading.local()
+        # Batched segmentation model of this worker, None to segment by color
+        self.segmentation_model = load_segmentation_model()
     
     def preprocess_image(self, image_path: str) -> np.ndarray:
         """
         Preprocess image: resize, normalize, and prepare for analysis
         """
-        # Load image
-        image = cv2.imread(image_path)
-        if image is None:
-            raise ValueError(f"Could not load image: {image_path}")
-        
-        # Convert BGR to RGB
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        with timed("decode"):
+            # Load image, letting the decoder skip detail the resize would discard
+            reduction = self._decode_reduction(image_path) if settings.FAST_DECODE else 1
+            image = cv2.imread(image_path, self.REDUCED_DECODE_FLAGS[reduction])
+            if image is None:
+                raise ValueError(f"Could not load image: {image_path}")
+            
+            # Convert BGR to RGB
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         
         # Resize image while maintaining aspect ratio
-        image = self._resize_image(image)
+        with timed("resize"):
+            if settings.FAST_DECODE:
+                image = self._resize_image(image, downscale_interpolation=cv2.INTER_AREA)
+            else:
+                image = self._resize_image(image)
         
         # Normalize image
-        image = self._normalize_image(image)
+        with timed("clahe"):
+            image = self._normalize_image(image)
         
         return image
     
-    def segment_tree(self, image: np.ndarray) -> np.ndarray:
-        """
-        Segment tree from background using computer vision techniques
+    def segment_tree(
+        self,
+        image: Union[np.ndarray, AnalysisContext],
+        return_mask: bool = False
+    ) -> Union[np.ndarray, Tuple[Optional[np.ndarray], Optional[Tuple[int, int, int, int]]]]:
         """
-        # Convert to different color spaces for better segmentation
-        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
-        lab = cv2.cvtColor(image, cv2.COLOR_RGB2LAB)
+        Segment tree from background using computer vision techniques.
         
-        # Create mask for green vegetation
-        green_mask = self._create_vegetation_mask(hsv)
-        
-        # Apply morphological operations to clean up mask
-        kernel = np.ones((5, 5), np.uint8)
-        green_mask = cv2.morphologyEx(green_mask, cv2.MORPH_CLOSE, kernel)
-        green_mask = cv2.morphologyEx(green_mask, cv2.MORPH_OPEN, kernel)
+        Returns the image with the background set to black or, with
+        return_mask, the tree mask and its (x, y, width, height) bounding
+        box without making the masked copy ((None, None) if no tree is found).
+        """
+        context = self.segment(AnalysisContext.of(image), masked_copy=not return_mask)
+        if return_mask:
+            if not context.has("tree_bounds"):
+                return None, None
+            return context.tree_mask, context.tree_bounds
+        return context.segmented
+    
+    def segment(self, context: AnalysisContext, masked_copy: bool = True) -> AnalysisContext:
+        """
+        Segment the tree in an analysis context, recording the vegetation mask,
+        tree mask and its bounding box on it for the later analysis stages.
+        
+        Vegetation is predicted by the segmentation model when one is
+        configured and loaded, and found by its color otherwise or when
+        inference fails. The segmented image is made right away with
+        masked_copy, and otherwise on first use of context.segmented, which
+        stages that only need the mask never trigger.
+        """
+        with timed("segmentation"):
+            return self._segment(context, masked_copy)
+    
+    def _segment(self, context: AnalysisContext, masked_copy: bool = True) -> AnalysisContext:
+        """Segmentation stage of segment()"""
+        green_mask = None
+        if self.segmentation_model is not None:
+            # Tree pixels predicted by the model, batched with the views other threads segment
+            try:
+                green_mask = self.segmentation_model(context.image)
+            except Exception:
+                logger.exception("Segmentation model inference failed, segmenting by color")
+        
+        if green_mask is None:
+            # Create mask for green vegetation, converting to HSV in a reused buffer
+            # unless the context already has it
+            if context.has("hsv"):
+                hsv = context.hsv
+            else:
+                hsv = cv2.cvtColor(context.image, cv2.COLOR_RGB2HSV, dst=self._scratch_buffer("hsv", context.shape))
+            green_mask = self._create_vegetation_mask(hsv)
+        
+        # Apply morphological operations to clean up mask, in place
+        cv2.morphologyEx(green_mask, cv2.MORPH_CLOSE, self.MORPH_KERNEL, dst=green_mask)
+        cv2.morphologyEx(green_mask, cv2.MORPH_OPEN, self.MORPH_KERNEL, dst=green_mask)
+        context.set("vegetation_mask", green_mask)
         
         # Find largest contour (main tree)
         contours, _ = cv2.findContours(green_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -59,16 +133,52 @@ class ImageProcessor:
             mask = np.zeros(green_mask.shape, dtype=np.uint8)
             cv2.fillPoly(mask, [largest_contour], 255)
             
-            # Apply mask to original image
-            segmented = image.copy()
-            segmented[mask == 0] = [0, 0, 0]  # Set background to black
+            # Keep the mask so later stages don't re-derive it from the pixels
+            context.set("tree_mask", mask)
+            context.set("tree_bounds", cv2.boundingRect(largest_contour))
             
-            return segmented
-        else:
-            # If no vegetation detected, return original image
-            return image
+            if masked_copy:
+                # Background set to black in a single pass
+                context.set("segmented", cv2.bitwise_and(context.image, context.image, mask=mask))
+        
+        # If no vegetation detected, the original image is used as is
+        return context
+    
+    def _scratch_buffer(self, name: str, shape: Tuple[int, ...]) -> np.ndarray:
+        """A uint8 buffer of this thread, reallocated only when the shape changes"""
+        buffer = getattr(self._scratch, name, None)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+            setattr(self._scratch, name, buffer)
+        return buffer
+    
+    def _decode_reduction(self, image_path: str) -> int:
+        """
+        Pick the largest power-of-two decode reduction that still leaves the
+        image at least as large as the final resize target
+        """
+        try:
+            # Only the header is read here, the pixels are not decoded
+            with Image.open(image_path) as header:
+                width, height = header.size
+        except Exception:
+            return 1
+        
+        # Compare long sides so EXIF rotation applied by imread doesn't matter
+        long_side = max(width, height)
+        target = max(self.max_size)
+        
+        reduction = 1
+        while reduction < 8 and long_side // (reduction * 2) >= target:
+            reduction *= 2
+        
+        return reduction
     
-    def _resize_image(self, image: np.ndarray) -> np.ndarray:
+    def _resize_image(
+        self,
+        image: np.ndarray,
+        downscale_interpolation: int = cv2.INTER_LANCZOS4
+    ) -> np.ndarray:
         """Resize image while maintaining aspect ratio"""
         h, w = image.shape[:2]
         
@@ -86,9 +196,13 @@ class ImageProcessor:
             new_h = int(new_h * scale)
             new_w = int(new_w * scale)
         
-        return cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LANCZOS4)
+        if (new_w, new_h) == (w, h):
+            return image
+        
+        interpolation = downscale_interpolation if new_w < w else cv2.INTER_LANCZOS4
+        return cv2.resize(image, (new_w, new_h), interpolation=interpolation)
     
-    def _normalize_image(self, image: np.ndarray) -> np.ndarray:
+    def _normalize_image(self, image: np.ndarray, tile_grid_size: Tuple[int, int] = (8, 8)) -> np.ndarray:
         """Normalize image values"""
         # Convert to float and normalize to [0, 1]
         normalized = image.astype(np.float32) / 255.0
@@ -99,7 +213,7 @@ class ImageProcessor:
         
         # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
         lab = cv2.cvtColor(image_uint8, cv2.COLOR_RGB2LAB)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=tile_grid_size)
         lab[:, :, 0] = clahe.apply(lab[:, :, 0])
         enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
         
@@ -107,23 +221,8 @@ class ImageProcessor:
     
     def _create_vegetation_mask(self, hsv_image: np.ndarray) -> np.ndarray:
         """Create mask for green vegetation"""
-        # Define range for green colors in HSV
-        # Lower and upper bounds for green
-        lower_green1 = np.array([35, 40, 40])
-        upper_green1 = np.array([85, 255, 255])
-        
-        # Create mask for green areas
-        green_mask = cv2.inRange(hsv_image, lower_green1, upper_green1)
-        
-        # Additional mask for lighter greens
-        lower_green2 = np.array([25, 30, 30])
-        upper_green2 = np.array([95, 255, 255])
-        green_mask2 = cv2.inRange(hsv_image, lower_green2, upper_green2)
-        
-        # Combine masks
-        combined_mask = cv2.bitwise_or(green_mask, green_mask2)
-        
-        return combined_mask
+        lower_green, upper_green = self.VEGETATION_HSV_RANGE
+        return cv2.inRange(hsv_image, lower_green, upper_green)
     
     def extract_edges(self, image: np.ndarray) -> np.ndarray:
         """Extract edges for leaf analysis"""
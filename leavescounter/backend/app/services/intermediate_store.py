@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+import numpy as np
+from typing import Dict, Any, Optional
+from app.core.config import settings
+
+INTERMEDIATES_DIRNAME = "intermediates"
+
+class IntermediateStore:
+    """
+    Per-view intermediate arrays of a session, stored as .npy files under
+    the session's results directory and read back memory-mapped.
+
+    Memory-mapped arrays live in the OS page cache, so every worker process
+    that opens the same view shares one copy. A process also only holds the
+    pages it actually touches. Each view has a manifest recording the
+    fingerprint of the image and preprocessing parameters its arrays were
+    computed from. Arrays whose fingerprint no longer matches are ignored.
+    """
+
+    def __init__(self, results_dir: Optional[str] = None):
+        self.results_dir = results_dir
+
+    @staticmethod
+    def fingerprint(image_hash: str, parameters: Dict[str, Any]) -> str:
+        """Identify the input an intermediate was computed from"""
+        payload = json.dumps({"image": image_hash, "parameters": parameters}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _dir(self, session_id: str) -> str:
+        return os.path.join(self.results_dir or settings.RESULTS_DIR, session_id, INTERMEDIATES_DIRNAME)
+
+    def _manifest_path(self, session_id: str, view: str) -> str:
+        return os.path.join(self._dir(session_id), f"{view}.json")
+
+    def _array_path(self, session_id: str, view: str, name: str) -> str:
+        return os.path.join(self._dir(session_id), f"{view}_{name}.npy")
+
+    def load(self, session_id: str, view: str, fingerprint: str) -> Optional[Dict[str, np.ndarray]]:
+        """Return the view's arrays memory-mapped read-only, or None if missing or stale"""
+        try:
+            with open(self._manifest_path(session_id, view), "r") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if manifest.get("fingerprint") != fingerprint:
+            return None
+
+        try:
+            return {
+                name: np.load(self._array_path(session_id, view, name), mmap_mode="r")
+                for name in manifest["arrays"]
+            }
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(
+        self,
+        session_id: str,
+        view: str,
+        fingerprint: str,
+        arrays: Dict[str, np.ndarray]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Write the view's arrays and return them memory-mapped, so the caller
+        can drop its in-memory copies.
+        """
+        os.makedirs(self._dir(session_id), exist_ok=True)
+
+        for name, array in arrays.items():
+            path = self._array_path(session_id, view, name)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+
+        # The manifest goes last, so readers never see it ahead of its arrays
+        manifest_path = self._manifest_path(session_id, view)
+        with open(f"{manifest_path}.tmp", "w") as f:
+            json.dump({"fingerprint": fingerprint, "arrays": list(arrays)}, f)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+        return {
+            name: np.load(self._array_path(session_id, view, name), mmap_mode="r")
+            for name in arrays
+        }
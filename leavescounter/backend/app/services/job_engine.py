@@ -0,0 +1,156 @@
+import uuid
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Any, Optional
+from app.services.analysis_pipeline import run_analysis, write_status, read_status, warm_up as warm_up_analysis
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.schemas import ProcessingStatus
+
+class Job:
+    """A single analysis submitted to the job engine"""
+
+    def __init__(self, job_id: str, session_id: str, future: Future):
+        self.job_id = job_id
+        self.session_id = session_id
+        self.future = future
+
+class JobEngine:
+    """Runs tree analyses on a process pool so the API event loop stays responsive"""
+
+    def __init__(self, max_workers: Optional[int] = None, executor: Optional[Executor] = None):
+        self.max_workers = max_workers or settings.PROCESSING_WORKERS
+        self.max_tracked_jobs = settings.MAX_TRACKED_JOBS
+        self._executor = executor
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _create_executor(self) -> Executor:
+        """A new worker pool"""
+        # Spawn fresh interpreters instead of forking the multi-threaded server
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _get_executor(self) -> Executor:
+        """Create the worker pool on first use"""
+        if self._executor is None:
+            self._executor = self._create_executor()
+        return self._executor
+
+    def _submit(self, fn: Callable, *args: Any) -> Future:
+        """
+        Submit a call to the worker pool.
+
+        A pool whose worker died (killed for running out of memory, say) is
+        broken for good, so it is replaced with a new one and the call
+        resubmitted. Jobs that were running in the broken pool fail.
+        """
+        with self._lock:
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args)
+            except BrokenProcessPool:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._create_executor()
+                return self._executor.submit(fn, *args)
+
+    def warm_up(self) -> None:
+        """Start the worker processes and load the analysis stack in each, ahead of the first job"""
+        for future in [self._submit(warm_up_analysis) for _ in range(self.max_workers)]:
+            future.result()
+
+    def submit(
+        self,
+        session_id: str,
+        metadata: Dict[str, Any],
+        on_complete: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> str:
+        """
+        Queue a session for analysis and return the job id.
+
+        on_complete is called in this process with the result dict once the
+        analysis succeeds.
+        """
+        job_id = str(uuid.uuid4())
+        # Written before submitting so it cannot overwrite the worker's first update
+        write_status(session_id, "queued", 0.0, "Waiting for an available worker")
+        try:
+            future = self._submit(run_analysis, session_id, metadata)
+        except BaseException as error:
+            # Leave no session queued for a job that never started
+            write_status(session_id, "failed", None, f"Processing failed: {str(error)}")
+            raise
+
+        def notify(done: Future):
+            if done.cancelled() or done.exception() is not None:
+                metrics.increment("tree_analysis_jobs_total", "failed")
+                return
+            result = done.result()
+            metrics.increment("tree_analysis_jobs_total", "completed")
+            metrics.observe_run(result.get("stage_timings") or {})
+            metrics.observe("total", result.get("processing_time") or 0.0)
+            if on_complete is not None:
+                on_complete(result)
+        future.add_done_callback(notify)
+
+        with self._lock:
+            self._jobs[job_id] = Job(job_id, session_id, future)
+            self._prune_finished_jobs()
+
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Look up a tracked job"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_status(self, job_id: str) -> Optional[ProcessingStatus]:
+        """Report the current status of a job, or None if it is unknown"""
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+
+        if job.future.done():
+            error = job.future.exception()
+            if error is not None:
+                return ProcessingStatus(
+                    job_id=job_id,
+                    session_id=job.session_id,
+                    status="failed",
+                    message=f"Processing failed: {str(error)}"
+                )
+            return ProcessingStatus(
+                job_id=job_id,
+                session_id=job.session_id,
+                status="completed",
+                progress=1.0,
+                message="Analysis completed successfully"
+            )
+
+        # Progress is written by the worker process while the job runs
+        status = read_status(job.session_id)
+        if status is None:
+            status = ProcessingStatus(session_id=job.session_id, status="queued", progress=0.0)
+        status.job_id = job_id
+
+        return status
+
+    def _prune_finished_jobs(self) -> None:
+        """Forget the oldest finished jobs once too many are tracked"""
+        excess = len(self._jobs) - self.max_tracked_jobs
+        if excess <= 0:
+            return
+
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.future.done()][:excess]:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        """Stop the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+class MaskStatistics:
+    """
+    Bounding box, pixel area and occupancy profiles of a binary mask.
+
+    The statistics are read from the mask with OpenCV reductions: the area
+    with cv2.countNonZero, the bounding box with cv2.boundingRect, and the
+    row and column profiles with cv2.reduce over the bounding box only. No
+    full-size temporary is made, where np.where(mask > 0) would allocate two
+    int64 index arrays holding every set pixel. Masks hold 0 and 255, like
+    the tree masks built by segmentation.
+    """
+
+    def __init__(self, mask: np.ndarray, bounds: Optional[Tuple[int, int, int, int]] = None):
+        self.mask = mask
+        self.area = cv2.countNonZero(mask)
+
+        # (x, y, width, height); segmentation already knows it for the tree mask
+        if not self.area:
+            self.bounds = (0, 0, 0, 0)
+        elif bounds is not None:
+            self.bounds = tuple(int(value) for value in bounds)
+        else:
+            self.bounds = cv2.boundingRect(mask)
+
+        self._row_profile: Optional[np.ndarray] = None
+        self._column_profile: Optional[np.ndarray] = None
+
+    @property
+    def row_profile(self) -> np.ndarray:
+        """Set pixels in each row of the mask"""
+        if self._row_profile is None:
+            self._row_profile = self._profile(axis=0)
+        return self._row_profile
+
+    @property
+    def column_profile(self) -> np.ndarray:
+        """Set pixels in each column of the mask"""
+        if self._column_profile is None:
+            self._column_profile = self._profile(axis=1)
+        return self._column_profile
+
+    def boundaries(self) -> Dict[str, int]:
+        """
+        Extents as TreeAnalyzer reports them.
+
+        top, bottom, left and right are the outermost set rows and columns,
+        height is bottom - top and width is right - left. All are 0 for an
+        empty mask.
+        """
+        if not self.area:
+            return {'height': 0, 'width': 0, 'top': 0, 'bottom': 0, 'left': 0, 'right': 0}
+
+        x, y, width, height = self.bounds
+        return {
+            'height': height - 1,
+            'width': width - 1,
+            'top': y,
+            'bottom': y + height - 1,
+            'left': x,
+            'right': x + width - 1
+        }
+
+    def _profile(self, axis: int) -> np.ndarray:
+        """Per-row (axis 0) or per-column (axis 1) set pixel counts, reduced over the bounding box"""
+        profile = np.zeros(self.mask.shape[axis], dtype=np.int64)
+        if not self.area:
+            return profile
+
+        x, y, width, height = self.bounds
+        box = self.mask[y:y + height, x:x + width]
+        # cv2.reduce collapses dimension 1 to a column of row sums, dimension 0 to a row of column sums
+        sums = cv2.reduce(box, 1 - axis, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() // 255
+        if axis == 0:
+            profile[y:y + height] = sums
+        else:
+            profile[x:x + width] = sums
+        return profile
@@ -0,0 +1,290 @@
+import json
+import base64
+import struct
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+
+# glTF constants
+FLOAT = 5126
+UNSIGNED_INT = 5125
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+GLB_MAGIC = 0x46546C67
+GLB_JSON_CHUNK = 0x4E4F534A
+GLB_BIN_CHUNK = 0x004E4942
+
+TRUNK_COLOR = (0.40, 0.26, 0.13)
+CROWN_COLOR = (0.20, 0.80, 0.20)
+
+def pack_glb(gltf: Dict[str, Any], binary: bytes) -> bytes:
+    """Binary glTF: a 12-byte header, the JSON chunk and the packed buffer chunk"""
+    json_chunk = json.dumps(gltf, separators=(",", ":")).encode()
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    binary += b"\x00" * (-len(binary) % 4)
+
+    total_length = 12 + 8 + len(json_chunk) + 8 + len(binary)
+    return b"".join([
+        struct.pack("<III", GLB_MAGIC, 2, total_length),
+        struct.pack("<II", len(json_chunk), GLB_JSON_CHUNK),
+        json_chunk,
+        struct.pack("<II", len(binary), GLB_BIN_CHUNK),
+        binary
+    ])
+
+class MeshPart:
+    """A named triangle mesh with per-vertex normals and a base color"""
+
+    def __init__(
+        self,
+        name: str,
+        positions: np.ndarray,
+        normals: np.ndarray,
+        indices: np.ndarray,
+        color: Tuple[float, float, float]
+    ):
+        self.name = name
+        self.positions = np.ascontiguousarray(positions, dtype=np.float32)
+        self.normals = np.ascontiguousarray(normals, dtype=np.float32)
+        self.indices = np.ascontiguousarray(indices, dtype=np.uint32)
+        self.color = color
+
+    @property
+    def vertex_count(self) -> int:
+        return len(self.positions)
+
+    @property
+    def face_count(self) -> int:
+        return len(self.indices)
+
+def trunk_shape(dimensions: Dict[str, Any]) -> Tuple[float, float]:
+    """Trunk height and radius: 30% of the tree height and 5% of its width"""
+    return dimensions['height'] * 0.3, dimensions['width'] * 0.05
+
+def crown_ellipsoid(dimensions: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Center and semi-axes (x, y, z) of the crown ellipsoid, which sits on top of the trunk"""
+    trunk_height, _ = trunk_shape(dimensions)
+    radii = np.array([
+        dimensions['width'] / 2,
+        (dimensions['height'] - trunk_height) / 2,
+        dimensions['depth'] / 2
+    ])
+    center = np.array([0.0, trunk_height + radii[1], 0.0])
+    return center, radii
+
+def hex_to_linear_rgb(color: str) -> Tuple[float, float, float]:
+    """Convert a #rrggbb sRGB color to the linear RGB used by glTF material factors"""
+    srgb = np.array([int(color[i:i + 2], 16) for i in (1, 3, 5)]) / 255.0
+    return tuple(float(c) for c in srgb ** 2.2)
+
+class MeshBuilder:
+    """
+    Builds the trunk and crown meshes of a tree from its analysis result with
+    NumPy array operations, and serializes them as OBJ, glTF or binary GLB.
+
+    The crown is a UV ellipsoid whose resolution is the largest that keeps
+    the whole model within the result's foliage vertex_count/face_count.
+    """
+
+    def __init__(self, trunk_segments: int = 16, min_crown_rings: int = 4):
+        self.trunk_segments = trunk_segments
+        self.min_crown_rings = min_crown_rings
+
+    def build(self, result: Dict[str, Any]) -> List[MeshPart]:
+        """Return the trunk and crown parts of a tree"""
+        dimensions = result['dimensions']
+        foliage_data = result['foliage_data']
+
+        trunk = self._build_trunk(dimensions)
+
+        # Spend what the trunk leaves of the budget on the crown
+        vertex_budget = foliage_data['vertex_count'] - trunk.vertex_count
+        face_budget = foliage_data['face_count'] - trunk.face_count
+        rings = self._crown_rings(vertex_budget, face_budget)
+
+        colors = result['leaf_analysis'].get('dominant_colors') or []
+        crown_color = hex_to_linear_rgb(colors[0]) if colors else CROWN_COLOR
+
+        return [trunk, self._build_crown(dimensions, rings, crown_color)]
+
+    def _crown_rings(self, vertex_budget: int, face_budget: int) -> int:
+        """Largest ring count whose ellipsoid (2 segments per ring) fits the budgets"""
+        # With r rings and s = 2r segments: vertices = (r - 1) * s + 2, faces = 2 * s * (r - 1)
+        rings = int(np.sqrt(max(face_budget, 0) / 4)) + 1
+        while rings > self.min_crown_rings and (
+            (rings - 1) * 2 * rings + 2 > vertex_budget or 4 * rings * (rings - 1) > face_budget
+        ):
+            rings -= 1
+        return max(rings, self.min_crown_rings)
+
+    def _build_trunk(self, dimensions: Dict[str, Any]) -> MeshPart:
+        """Capped cylinder: a bottom ring, a top ring and the two cap centers"""
+        height, radius = trunk_shape(dimensions)
+        segments = self.trunk_segments
+
+        theta = 2 * np.pi * np.arange(segments) / segments
+        ring = np.stack([radius * np.cos(theta), np.zeros(segments), radius * np.sin(theta)], axis=1)
+        top = ring + [0.0, height, 0.0]
+        positions = np.concatenate([ring, top, [[0.0, 0.0, 0.0], [0.0, height, 0.0]]])
+
+        radial = np.stack([np.cos(theta), np.zeros(segments), np.sin(theta)], axis=1)
+        normals = np.concatenate([radial, radial, [[0.0, -1.0, 0.0], [0.0, 1.0, 0.0]]])
+
+        i = np.arange(segments)
+        j = (i + 1) % segments
+        bottom_center, top_center = 2 * segments, 2 * segments + 1
+        indices = np.concatenate([
+            np.stack([i, segments + j, j], axis=1),
+            np.stack([i, segments + i, segments + j], axis=1),
+            np.stack([np.full(segments, bottom_center), i, j], axis=1),
+            np.stack([np.full(segments, top_center), segments + j, segments + i], axis=1)
+        ])
+
+        return MeshPart("Trunk", positions, normals, indices, TRUNK_COLOR)
+
+    def _build_crown(
+        self,
+        dimensions: Dict[str, Any],
+        rings: int,
+        color: Tuple[float, float, float]
+    ) -> MeshPart:
+        """UV ellipsoid: rings - 1 latitude circles of 2 * rings vertices, plus the two poles"""
+        center, radii = crown_ellipsoid(dimensions)
+        segments = 2 * rings
+
+        phi = np.pi * np.arange(1, rings) / rings
+        theta = 2 * np.pi * np.arange(segments) / segments
+        phi_grid, theta_grid = np.meshgrid(phi, theta, indexing='ij')
+
+        # Unit sphere directions, top pole first
+        unit = np.stack([
+            np.sin(phi_grid) * np.cos(theta_grid),
+            np.cos(phi_grid),
+            np.sin(phi_grid) * np.sin(theta_grid)
+        ], axis=-1).reshape(-1, 3)
+        unit = np.concatenate([[[0.0, 1.0, 0.0]], unit, [[0.0, -1.0, 0.0]]])
+
+        positions = center + unit * radii
+        # Ellipsoid normals are the sphere normals scaled by the inverse radii
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normals = unit / np.where(radii > 0, radii, 1.0)
+        normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+
+        top, bottom = 0, len(positions) - 1
+        s = np.arange(segments)
+        s_next = (s + 1) % segments
+
+        # Quads between consecutive latitude circles, split into two triangles
+        r = np.arange(rings - 2)[:, None]
+        a = 1 + r * segments + s
+        b = 1 + r * segments + s_next
+        c = a + segments
+        d = b + segments
+        band = np.concatenate([
+            np.stack([a, b, d], axis=-1).reshape(-1, 3),
+            np.stack([a, d, c], axis=-1).reshape(-1, 3)
+        ])
+
+        last = 1 + (rings - 2) * segments
+        indices = np.concatenate([
+            np.stack([np.full(segments, top), 1 + s_next, 1 + s], axis=1),
+            band,
+            np.stack([np.full(segments, bottom), last + s, last + s_next], axis=1)
+        ])
+
+        return MeshPart("Crown", positions, normals, indices, color)
+
+    def to_obj(self, parts: List[MeshPart], header: Optional[str] = None) -> str:
+        """Serialize parts as Wavefront OBJ text with one formatting pass per array"""
+        lines = ["# Tree Model Generated by Tree Calculator"]
+        if header:
+            lines.append(f"# {header}")
+
+        offset = 1  # OBJ indices are 1-based and global across objects
+        for part in parts:
+            lines.append(f"o {part.name}")
+            lines.append(("v %.4f %.4f %.4f\n" * part.vertex_count % tuple(part.positions.ravel())).rstrip("\n"))
+            lines.append(("vn %.4f %.4f %.4f\n" * part.vertex_count % tuple(part.normals.ravel())).rstrip("\n"))
+
+            faces = np.repeat(part.indices.astype(np.int64) + offset, 2, axis=1)
+            lines.append(("f %d//%d %d//%d %d//%d\n" * part.face_count % tuple(faces.ravel())).rstrip("\n"))
+            offset += part.vertex_count
+
+        return "\n".join(line for line in lines if line) + "\n"
+
+    def to_gltf(self, parts: List[MeshPart]) -> Dict[str, Any]:
+        """glTF JSON with the mesh data embedded as a base64 buffer"""
+        gltf, binary = self._gltf_document(parts)
+        gltf["buffers"][0]["uri"] = (
+            "data:application/octet-stream;base64," + base64.b64encode(binary).decode()
+        )
+        return gltf
+
+    def to_glb(self, parts: List[MeshPart]) -> bytes:
+        """Binary glTF with packed float32/uint32 buffers"""
+        return pack_glb(*self._gltf_document(parts))
+
+    def _gltf_document(self, parts: List[MeshPart]) -> Tuple[Dict[str, Any], bytes]:
+        """Build the glTF JSON and the binary buffer its accessors point into"""
+        chunks = []
+        buffer_views = []
+        accessors = []
+        primitives = []
+        materials = []
+        byte_offset = 0
+
+        def add_view(data: np.ndarray, target: int) -> int:
+            nonlocal byte_offset
+            raw = data.tobytes()
+            chunks.append(raw)
+            buffer_views.append({
+                "buffer": 0, "byteOffset": byte_offset, "byteLength": len(raw), "target": target
+            })
+            byte_offset += len(raw)  # float32/uint32 data keeps every view 4-byte aligned
+            return len(buffer_views) - 1
+
+        for part in parts:
+            position_view = add_view(part.positions, ARRAY_BUFFER)
+            accessors.append({
+                "bufferView": position_view, "componentType": FLOAT, "count": part.vertex_count,
+                "type": "VEC3",
+                "min": part.positions.min(axis=0).tolist(),
+                "max": part.positions.max(axis=0).tolist()
+            })
+            normal_view = add_view(part.normals, ARRAY_BUFFER)
+            accessors.append({
+                "bufferView": normal_view, "componentType": FLOAT, "count": part.vertex_count,
+                "type": "VEC3"
+            })
+            index_view = add_view(part.indices, ELEMENT_ARRAY_BUFFER)
+            accessors.append({
+                "bufferView": index_view, "componentType": UNSIGNED_INT,
+                "count": part.indices.size, "type": "SCALAR"
+            })
+
+            materials.append({
+                "name": f"{part.name}Material",
+                "pbrMetallicRoughness": {
+                    "baseColorFactor": [*part.color, 1.0],
+                    "metallicFactor": 0.0,
+                    "roughnessFactor": 0.8
+                }
+            })
+            primitives.append({
+                "attributes": {"POSITION": len(accessors) - 3, "NORMAL": len(accessors) - 2},
+                "indices": len(accessors) - 1,
+                "material": len(materials) - 1
+            })
+
+        gltf = {
+            "asset": {"version": "2.0", "generator": "Tree Calculator"},
+            "scene": 0,
+            "scenes": [{"nodes": [0]}],
+            "nodes": [{"name": "Tree", "mesh": 0}],
+            "meshes": [{"name": "TreeMesh", "primitives": primitives}],
+            "materials": materials,
+            "accessors": accessors,
+            "bufferViews": buffer_views,
+            "buffers": [{"byteLength": byte_offset}]
+        }
+        return gltf, b"".join(chunks)
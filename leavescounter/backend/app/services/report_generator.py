@@ -1,30 +1,49 @@
 import os
 import json
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from typing import Dict, Any
+from io import BytesIO
+from typing import Dict, Any, Optional
 import tempfile
 from datetime import datetime
 from app.core.config import settings
+from app.services.mesh_builder import MeshBuilder
 
 class ReportGenerator:
-    """Generates reports and exports in various formats"""
+    """
+    Generates reports and exports in various formats.
+    
+    reportlab and matplotlib are imported on the first PDF and the first
+    visualization respectively, so processes that never export don't load
+    them; warm_up() loads both ahead of time.
+    """
     
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._create_custom_styles()
+        # Built on the first PDF report
+        self.styles = None
+        self.mesh_builder = MeshBuilder()
+    
+    def warm_up(self) -> None:
+        """Import the PDF and plotting libraries and build the PDF styles"""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        
+        if self.styles is None:
+            self._create_custom_styles()
+        
+        # A tiny render loads the font cache and the Agg renderer
+        fig = Figure(figsize=(1, 1))
+        FigureCanvasAgg(fig)
+        fig.text(0.5, 0.5, "Tree")
+        fig.savefig(BytesIO(), format='png', dpi=10)
     
     def _create_custom_styles(self):
         """Create custom paragraph styles"""
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib import colors
+        
+        styles = getSampleStyleSheet()
         self.title_style = ParagraphStyle(
             'CustomTitle',
-            parent=self.styles['Heading1'],
+            parent=styles['Heading1'],
             fontSize=24,
             spaceAfter=30,
             textColor=colors.darkgreen
@@ -32,16 +51,29 @@ class ReportGenerator:
         
         self.heading_style = ParagraphStyle(
             'CustomHeading',
-            parent=self.styles['Heading2'],
+            parent=styles['Heading2'],
             fontSize=16,
             spaceAfter=12,
             textColor=colors.darkblue
         )
+        self.styles = styles
     
-    def generate_pdf_report(self, session_id: str, result: Dict[str, Any]) -> str:
-        """Generate comprehensive PDF report"""
+    def generate_pdf_report(
+        self,
+        session_id: str,
+        result: Dict[str, Any],
+        output_dir: Optional[str] = None
+    ) -> str:
+        """Generate comprehensive PDF report, in the session's results unless output_dir is given"""
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+        from reportlab.lib.units import inch
+        from reportlab.lib import colors
         
-        results_dir = os.path.join(settings.RESULTS_DIR, session_id)
+        if self.styles is None:
+            self._create_custom_styles()
+        
+        results_dir = output_dir or os.path.join(settings.RESULTS_DIR, session_id)
         pdf_path = os.path.join(results_dir, f"tree_analysis_report_{session_id}.pdf")
         
         # Create PDF document
@@ -54,10 +86,11 @@ class ReportGenerator:
         
         # Session info
         story.append(Paragraph("Analysis Information", self.heading_style))
+        processing_time = result.get('processing_time')
         info_data = [
             ["Session ID", session_id],
             ["Analysis Date", datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-            ["Processing Time", f"{result.get('processing_time', 'N/A')} seconds"]
+            ["Processing Time", f"{processing_time:.2f} seconds" if processing_time is not None else "N/A"]
         ]
         info_table = Table(info_data, colWidths=[2*inch, 3*inch])
         info_table.setStyle(TableStyle([
@@ -104,8 +137,9 @@ class ReportGenerator:
             ["Property", "Value"],
             ["Average Leaf Size", f"{leaf_analysis['average_leaf_size']:.2f} pixels²"],
             ["Estimated Leaf Count", f"{leaf_analysis['estimated_leaf_count']:,}"],
-            ["Leaf Type", leaf_analysis.get('leaf_type', 'Unknown')],
-            ["Classification Confidence", f"{leaf_analysis.get('leaf_confidence', 0):.1%}"],
+            # Both are None when no leaves were detected
+            ["Leaf Type", leaf_analysis.get('leaf_type') or 'Unknown'],
+            ["Classification Confidence", f"{leaf_analysis.get('leaf_confidence') or 0:.1%}"],
             ["Edge Density", f"{leaf_analysis['edge_density']:.4f}"],
             ["Dominant Colors", ", ".join(leaf_analysis['dominant_colors'])]
         ]
@@ -151,14 +185,38 @@ class ReportGenerator:
         
         return pdf_path
     
-    def generate_visualization(self, session_id: str, result: Dict[str, Any]) -> str:
-        """Generate visualization image"""
+    def generate_visualization(
+        self,
+        session_id: str,
+        result: Dict[str, Any],
+        dpi: Optional[int] = None,
+        output_dir: Optional[str] = None
+    ) -> str:
+        """Generate visualization image, in the session's results unless output_dir is given"""
         
-        results_dir = os.path.join(settings.RESULTS_DIR, session_id)
+        results_dir = output_dir or os.path.join(settings.RESULTS_DIR, session_id)
         viz_path = os.path.join(results_dir, f"tree_visualization_{session_id}.png")
         
-        # Create figure with subplots
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 10))
+        with open(viz_path, 'wb') as f:
+            f.write(self.render_visualization(result, dpi))
+        
+        return viz_path
+    
+    def render_visualization(self, result: Dict[str, Any], dpi: Optional[int] = None) -> bytes:
+        """
+        Render the visualization to PNG bytes in memory.
+        
+        A standalone Figure drawn on its own Agg canvas shares no state with
+        other renders (unlike the pyplot interface), so this is safe to call
+        from concurrent threads, and no GUI backend is involved.
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        
+        # Create figure with subplots; the tight layout is solved once, at draw time
+        fig = Figure(figsize=(12, 10), layout='tight')
+        FigureCanvasAgg(fig)
+        ((ax1, ax2), (ax3, ax4)) = fig.subplots(2, 2)
         fig.suptitle('Tree Analysis Results', fontsize=16, fontweight='bold')
         
         # Dimensions visualization
@@ -203,16 +261,20 @@ class ReportGenerator:
         ax4.set_title('Analysis Summary')
         ax4.axis('off')
         
-        plt.tight_layout()
-        plt.savefig(viz_path, dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        return viz_path
+        buffer = BytesIO()
+        fig.savefig(buffer, format='png', dpi=dpi or settings.VISUALIZATION_DPI)
+        return buffer.getvalue()
     
-    def generate_3d_model(self, session_id: str, result: Dict[str, Any], format_type: str) -> str:
-        """Generate 3D model file (OBJ or GLTF)"""
+    def generate_3d_model(
+        self,
+        session_id: str,
+        result: Dict[str, Any],
+        format_type: str,
+        output_dir: Optional[str] = None
+    ) -> str:
+        """Generate 3D model file (OBJ, GLTF or binary GLB), in the session's results unless output_dir is given"""
         
-        results_dir = os.path.join(settings.RESULTS_DIR, session_id)
+        results_dir = output_dir or os.path.join(settings.RESULTS_DIR, session_id)
         
         if format_type.lower() == "obj":
             model_path = os.path.join(results_dir, f"tree_model_{session_id}.obj")
@@ -220,158 +282,34 @@ class ReportGenerator:
         elif format_type.lower() == "gltf":
             model_path = os.path.join(results_dir, f"tree_model_{session_id}.gltf")
             self._generate_gltf_model(model_path, result)
+        elif format_type.lower() == "glb":
+            model_path = os.path.join(results_dir, f"tree_model_{session_id}.glb")
+            self._generate_glb_model(model_path, result)
         else:
             raise ValueError(f"Unsupported 3D format: {format_type}")
         
         return model_path
     
     def _generate_obj_model(self, output_path: str, result: Dict[str, Any]) -> None:
-        """Generate simple OBJ model of the tree"""
-        
-        dimensions = result['dimensions']
-        foliage_data = result['foliage_data']
-        leaf_analysis = result['leaf_analysis']
-        
-        # Create a simple tree structure
-        # Trunk (cylinder) + Crown (ellipsoid)
+        """Generate OBJ model of the tree: trunk (cylinder) + crown (ellipsoid)"""
         
+        parts = self.mesh_builder.build(result)
         with open(output_path, 'w') as f:
-            f.write("# Tree Model Generated by Tree Calculator\n")
-            f.write(f"# Session ID: {result['session_id']}\n")
-            f.write("# \n")
-            
-            # Trunk vertices (simple cylinder)
-            trunk_height = dimensions['height'] * 0.3  # 30% of total height
-            trunk_radius = dimensions['width'] * 0.05   # 5% of width
-            
-            # Generate trunk vertices
-            trunk_segments = 8
-            for i in range(trunk_segments):
-                angle = 2 * np.pi * i / trunk_segments
-                x = trunk_radius * np.cos(angle)
-                z = trunk_radius * np.sin(angle)
-                
-                # Bottom circle
-                f.write(f"v {x:.4f} 0.0000 {z:.4f}\n")
-                # Top circle
-                f.write(f"v {x:.4f} {trunk_height:.4f} {z:.4f}\n")
-            
-            # Crown vertices (simplified ellipsoid)
-            crown_segments = 16
-            crown_rings = 8
-            
-            for ring in range(crown_rings + 1):
-                phi = np.pi * ring / crown_rings  # 0 to pi
-                y = trunk_height + (dimensions['height'] - trunk_height) * (1 - np.cos(phi))
-                ring_radius = np.sin(phi) * dimensions['width'] / 2
-                
-                if ring == 0 or ring == crown_rings:
-                    # Top and bottom points
-                    f.write(f"v 0.0000 {y:.4f} 0.0000\n")
-                else:
-                    for seg in range(crown_segments):
-                        theta = 2 * np.pi * seg / crown_segments
-                        x = ring_radius * np.cos(theta)
-                        z = ring_radius * np.sin(theta) * dimensions['depth'] / dimensions['width']
-                        f.write(f"v {x:.4f} {y:.4f} {z:.4f}\n")
-            
-            # Generate faces (simplified)
-            f.write("\n# Faces\n")
-            
-            # Trunk faces
-            for i in range(trunk_segments):
-                i1 = i * 2 + 1
-                i2 = i * 2 + 2
-                i3 = ((i + 1) % trunk_segments) * 2 + 1
-                i4 = ((i + 1) % trunk_segments) * 2 + 2
-                
-                f.write(f"f {i1} {i3} {i4}\n")
-                f.write(f"f {i1} {i4} {i2}\n")
-            
-            # Note: Crown faces would be more complex - simplified for demo
-            f.write("# Crown faces simplified for demonstration\n")
+            f.write(self.mesh_builder.to_obj(parts, header=f"Session ID: {result['session_id']}"))
     
     def _generate_gltf_model(self, output_path: str, result: Dict[str, Any]) -> None:
-        """Generate simple GLTF model of the tree"""
-        
-        # Basic GLTF structure (simplified)
-        gltf_data = {
-            "asset": {
-                "version": "2.0",
-                "generator": "Tree Calculator"
-            },
-            "scene": 0,
-            "scenes": [
-                {
-                    "nodes": [0]
-                }
-            ],
-            "nodes": [
-                {
-                    "name": "Tree",
-                    "mesh": 0
-                }
-            ],
-            "meshes": [
-                {
-                    "name": "TreeMesh",
-                    "primitives": [
-                        {
-                            "attributes": {
-                                "POSITION": 0
-                            },
-                            "indices": 1,
-                            "material": 0
-                        }
-                    ]
-                }
-            ],
-            "materials": [
-                {
-                    "name": "TreeMaterial",
-                    "pbrMetallicRoughness": {
-                        "baseColorFactor": [0.2, 0.8, 0.2, 1.0],
-                        "metallicFactor": 0.0,
-                        "roughnessFactor": 0.8
-                    }
-                }
-            ],
-            "accessors": [
-                {
-                    "bufferView": 0,
-                    "componentType": 5126,
-                    "count": 0,  # Will be updated
-                    "type": "VEC3"
-                },
-                {
-                    "bufferView": 1,
-                    "componentType": 5123,
-                    "count": 0,  # Will be updated
-                    "type": "SCALAR"
-                }
-            ],
-            "bufferViews": [
-                {
-                    "buffer": 0,
-                    "byteLength": 0,  # Will be updated
-                    "target": 34962
-                },
-                {
-                    "buffer": 0,
-                    "byteOffset": 0,  # Will be updated
-                    "byteLength": 0,  # Will be updated
-                    "target": 34963
-                }
-            ],
-            "buffers": [
-                {
-                    "byteLength": 0  # Will be updated
-                }
-            ]
-        }
+        """Generate GLTF model of the tree, with the mesh buffer embedded"""
         
+        parts = self.mesh_builder.build(result)
         with open(output_path, 'w') as f:
-            json.dump(gltf_data, f, indent=2)
+            json.dump(self.mesh_builder.to_gltf(parts), f)
+    
+    def _generate_glb_model(self, output_path: str, result: Dict[str, Any]) -> None:
+        """Generate binary GLTF (GLB) model of the tree"""
+        
+        parts = self.mesh_builder.build(result)
+        with open(output_path, 'wb') as f:
+            f.write(self.mesh_builder.to_glb(parts))
     
     def generate_summary_json(self, session_id: str, result: Dict[str, Any]) -> str:
         """Generate JSON summary for API consumption"""
@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Any, Optional
+from app.core.config import settings
+from app.services.analysis_pipeline import RESULT_FILENAME
+
+class StoredResult:
+    """A session's analysis result, serialized once, with its validators"""
+
+    def __init__(self, body: bytes, last_modified: float):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.last_modified = int(last_modified)
+
+    @property
+    def version(self) -> str:
+        """Identifies the result contents, e.g. to key artifacts derived from it"""
+        return self.etag.strip('"')[:16]
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Validator headers; no-cache makes clients revalidate instead of reusing blindly"""
+        return {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": "no-cache"
+        }
+
+    def is_not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """Evaluate conditional request headers; If-None-Match takes precedence"""
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            # Weak comparison, as required for GET
+            tags = [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+            return "*" in tags or self.etag in tags
+
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return self.last_modified <= since
+
+        return False
+
+class ResultStore:
+    """
+    In-memory LRU of serialized analysis results, in front of the result files.
+
+    Repeat reads of a result are served from memory without touching disk or
+    re-serializing. Entries must be replaced (put) or dropped (invalidate)
+    whenever a session's result file is rewritten.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.RESULT_MEMORY_CACHE_ENTRIES
+        self._entries: "OrderedDict[str, StoredResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _serialize(result: Dict[str, Any]) -> bytes:
+        return json.dumps(result, separators=(",", ":")).encode()
+
+    def get(self, session_id: str) -> Optional[StoredResult]:
+        """Return a cached result without any I/O, or None"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                self._entries.move_to_end(session_id)
+            return entry
+
+    def load(self, session_id: str) -> Optional[StoredResult]:
+        """Return a session's result, reading its result file on a cache miss (blocking)"""
+        entry = self.get(session_id)
+        if entry is not None:
+            return entry
+
+        results_path = os.path.join(settings.RESULTS_DIR, session_id, RESULT_FILENAME)
+        try:
+            with open(results_path, "r") as f:
+                last_modified = os.fstat(f.fileno()).st_mtime
+                result = json.load(f)
+        except (FileNotFoundError, ValueError):
+            # A partially written or corrupt file reads as a miss
+            return None
+
+        return self._store(session_id, StoredResult(self._serialize(result), last_modified))
+
+    def put(self, session_id: str, result: Dict[str, Any]) -> StoredResult:
+        """Cache a result that was just written to the session's result file"""
+        return self._store(session_id, StoredResult(self._serialize(result), time.time()))
+
+    def invalidate(self, session_id: str) -> None:
+        """Drop a session's cached result"""
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def _store(self, session_id: str, entry: StoredResult) -> StoredResult:
+        with self._lock:
+            self._entries[session_id] = entry
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
@@ -0,0 +1,193 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+import cv2
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+SEGMENTATION_BACKENDS = ("hsv", "model")
+
+class DynamicBatcher(Generic[T, R]):
+    """
+    Groups items submitted from concurrent threads into batches for one function.
+
+    A batch runs as soon as it holds max_batch_size items, or max_wait
+    seconds after its first item arrived, whichever comes first; items
+    already queued always join the batch. A single background thread runs
+    the batches, so the batch function is never called concurrently.
+    """
+
+    def __init__(self, process_batch: Callable[[List[T]], Sequence[R]], max_batch_size: int, max_wait: float):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._queue: "queue.SimpleQueue[Tuple[T, Future]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def __call__(self, item: T) -> R:
+        """Process an item in the next batch and wait for its result"""
+        return self.submit(item).result()
+
+    def submit(self, item: T) -> "Future[R]":
+        """Queue an item for the next batch"""
+        future: "Future[R]" = Future()
+        self._queue.put((item, future))
+
+        # Started on first use, so the thread belongs to the process that batches
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="segmentation-batcher", daemon=True)
+                self._thread.start()
+        return future
+
+    def _next_batch(self) -> List[Tuple[T, Future]]:
+        """Block for a first item, then gather more until the batch is full or its deadline passes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = [(item, future) for item, future in self._next_batch() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.process_batch([item for item, _ in batch])
+            except BaseException as error:
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            for _, future in batch[len(results):]:
+                future.set_exception(
+                    RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items")
+                )
+
+class SegmentationModel:
+    """
+    Tree segmentation network run on the CPU with PyTorch.
+
+    The model takes a float32 NCHW batch of RGB images scaled to [0, 1] at
+    input_size and returns tree logits, either N x 1 x H x W (sigmoid) or
+    N x C x H x W class scores with the tree as class 1. Torchvision
+    segmentation models, which return {"out": scores}, are accepted as is.
+    """
+
+    def __init__(self, model: Any, input_size: Tuple[int, int], threshold: float):
+        import torch
+
+        self._torch = torch
+        self.model = model.eval()
+        self.input_size = tuple(input_size)
+        self.threshold = threshold
+
+    @classmethod
+    def load(cls, model_path: str, input_size: Tuple[int, int], threshold: float) -> "SegmentationModel":
+        """Load a TorchScript model or a pickled module onto the CPU"""
+        import torch
+
+        try:
+            model = torch.jit.load(model_path, map_location="cpu")
+        except RuntimeError:
+            # Not TorchScript: a module saved with torch.save
+            model = torch.load(model_path, map_location="cpu", weights_only=False)
+        return cls(model, input_size, threshold)
+
+    def predict(self, images: List[np.ndarray]) -> List[np.ndarray]:
+        """Tree masks (255 inside the tree, 0 elsewhere) of RGB images of any size, inferred as one batch"""
+        torch = self._torch
+        width, height = self.input_size
+        batch = np.stack([cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA) for image in images])
+        inputs = torch.from_numpy(batch).permute(0, 3, 1, 2).float().div_(255)
+
+        with torch.inference_mode():
+            outputs = self.model(inputs)
+            if isinstance(outputs, dict):
+                outputs = outputs["out"]
+            if outputs.dim() == 3:
+                outputs = outputs.unsqueeze(1)
+            if outputs.shape[1] == 1:
+                probabilities = torch.sigmoid(outputs[:, 0])
+            else:
+                probabilities = torch.softmax(outputs, dim=1)[:, 1]
+            probabilities = probabilities.contiguous().numpy()
+
+        masks = []
+        for image, probability in zip(images, probabilities):
+            probability = cv2.resize(probability, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_LINEAR)
+            masks.append(cv2.threshold(probability, self.threshold, 255, cv2.THRESH_BINARY)[1].astype(np.uint8))
+        return masks
+
+# Batched models of this process, by configuration, so every ImageProcessor of a
+# worker shares one loaded model and one batch queue
+_models: Dict[Tuple[Any, ...], Optional[DynamicBatcher]] = {}
+_models_lock = threading.Lock()
+
+def load_segmentation_model() -> Optional[DynamicBatcher]:
+    """
+    The batched segmentation model of this process, or None to segment by color.
+
+    The model is loaded once per process, with SEGMENTATION_THREADS PyTorch
+    threads. None is returned when SEGMENTATION_BACKEND is "hsv", and when
+    PyTorch or the model file is unavailable or the model fails to load.
+    """
+    if settings.SEGMENTATION_BACKEND not in SEGMENTATION_BACKENDS:
+        raise ValueError(
+            f"Unknown segmentation backend '{settings.SEGMENTATION_BACKEND}', "
+            f"expected one of {', '.join(SEGMENTATION_BACKENDS)}"
+        )
+    if settings.SEGMENTATION_BACKEND == "hsv":
+        return None
+
+    key = (
+        settings.SEGMENTATION_MODEL_PATH, settings.SEGMENTATION_THREADS, tuple(settings.SEGMENTATION_INPUT_SIZE),
+        settings.SEGMENTATION_THRESHOLD, settings.SEGMENTATION_BATCH_SIZE, settings.SEGMENTATION_BATCH_WAIT_MS,
+        settings.PARALLEL_VIEWS
+    )
+    with _models_lock:
+        if key not in _models:
+            _models[key] = _create_batched_model()
+        return _models[key]
+
+def _create_batched_model() -> Optional[DynamicBatcher]:
+    """Load the configured model behind a dynamic batcher, or None if it cannot be loaded"""
+    model_path = settings.SEGMENTATION_MODEL_PATH
+    if not os.path.exists(model_path):
+        logger.warning("Segmentation model %s not found, segmenting by color", model_path)
+        return None
+
+    try:
+        import torch
+    except ImportError:
+        logger.warning("PyTorch is not installed, segmenting by color")
+        return None
+
+    torch.set_num_threads(settings.SEGMENTATION_THREADS)
+    try:
+        model = SegmentationModel.load(model_path, settings.SEGMENTATION_INPUT_SIZE, settings.SEGMENTATION_THRESHOLD)
+    except Exception:
+        logger.exception("Could not load segmentation model %s, segmenting by color", model_path)
+        return None
+
+    # Views are only segmented concurrently with PARALLEL_VIEWS; without it no
+    # other view can join a batch, so waiting for one only adds latency
+    max_wait = settings.SEGMENTATION_BATCH_WAIT_MS / 1000 if settings.PARALLEL_VIEWS else 0.0
+    return DynamicBatcher(model.predict, settings.SEGMENTATION_BATCH_SIZE, max_wait)
@@ -0,0 +1,161 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import settings
+
+SESSION_STATUSES = ("uploaded", "queued", "completed", "failed")
+
+class SessionStore:
+    """
+    SQLite index of upload sessions and their analysis status.
+
+    Listing sessions is an indexed query instead of a scan of the upload
+    directory. The index is kept up to date by the upload, process and batch
+    routes; when it is created empty it is populated once from the sessions
+    already on disk.
+    """
+
+    def __init__(self, database_url: Optional[str] = None, upload_dir: Optional[str] = None):
+        self.database_path = self._parse_database_url(database_url or settings.DATABASE_URL)
+        self.upload_dir = upload_dir or settings.UPLOAD_DIR
+        self._lock = threading.Lock()
+
+        if self.database_path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(self.database_path))
+            os.makedirs(directory, exist_ok=True)
+
+        # One connection shared by the API threads; access is serialized by the lock
+        self._connection = sqlite3.connect(self.database_path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._create_schema()
+
+        if self.count() == 0:
+            self.rebuild_from_disk()
+
+    @staticmethod
+    def _parse_database_url(database_url: str) -> str:
+        """Return the file path of a sqlite:/// URL"""
+        prefix = "sqlite:///"
+        if not database_url.startswith(prefix):
+            raise ValueError(f"Unsupported DATABASE_URL (only {prefix} is supported): {database_url}")
+        return database_url[len(prefix):] or ":memory:"
+
+    def _create_schema(self) -> None:
+        with self._lock, self._connection:
+            if self.database_path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    status TEXT NOT NULL,
+                    job_id TEXT,
+                    tree_id TEXT
+                )
+            """)
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (created_at)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sessions_status_created_at ON sessions (status, created_at)"
+            )
+
+    def add(
+        self,
+        session_id: str,
+        created_at: Optional[float] = None,
+        status: str = "uploaded",
+        tree_id: Optional[str] = None
+    ) -> None:
+        """Index a new session"""
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, created_at, updated_at, status, tree_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, created_at or now, now, status, tree_id)
+            )
+
+    def set_status(self, session_id: str, status: str, job_id: Optional[str] = None) -> None:
+        """Record the analysis status of a session (and the job analyzing it, if any)"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE sessions SET status = ?, job_id = COALESCE(?, job_id), updated_at = ? "
+                "WHERE session_id = ?",
+                (status, job_id, time.time(), session_id)
+            )
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return a session's index entry"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def count(self, status: Optional[str] = None) -> int:
+        """Number of indexed sessions, optionally with a given status"""
+        query, params = "SELECT COUNT(*) FROM sessions", ()
+        if status is not None:
+            query, params = query + " WHERE status = ?", (status,)
+        with self._lock:
+            return self._connection.execute(query, params).fetchone()[0]
+
+    def list(
+        self,
+        limit: int = 100,
+        offset: int = 0,
+        status: Optional[str] = None,
+        newest_first: bool = True
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Return the total number of matching sessions and one page of them"""
+        where, params = "", []
+        if status is not None:
+            where, params = " WHERE status = ?", [status]
+        order = "DESC" if newest_first else "ASC"
+
+        with self._lock:
+            total = self._connection.execute(
+                "SELECT COUNT(*) FROM sessions" + where, params
+            ).fetchone()[0]
+            rows = self._connection.execute(
+                f"SELECT * FROM sessions{where} ORDER BY created_at {order}, session_id {order} "
+                "LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+
+        return total, [dict(row) for row in rows]
+
+    def rebuild_from_disk(self) -> int:
+        """Index the sessions found in the upload directory; returns how many were found"""
+        if not os.path.isdir(self.upload_dir):
+            return 0
+
+        entries = []
+        for session_id in os.listdir(self.upload_dir):
+            session_dir = os.path.join(self.upload_dir, session_id)
+            if not os.path.exists(os.path.join(session_dir, "metadata.json")):
+                continue
+            has_results = os.path.exists(
+                os.path.join(settings.RESULTS_DIR, session_id, "analysis_result.json")
+            )
+            created_at = os.path.getctime(session_dir)
+            entries.append((
+                session_id, created_at, created_at, "completed" if has_results else "uploaded"
+            ))
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO sessions (session_id, created_at, updated_at, status) "
+                "VALUES (?, ?, ?, ?)",
+                entries
+            )
+
+        return len(entries)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,213 @@
+import cv2
+import math
+import numpy as np
+from PIL import Image
+from typing import List, Optional, Tuple
+from app.core.config import settings
+from app.core.concurrency import map_views, map_tiles
+from app.core.metrics import timed
+from app.models.schemas import LeafAnalysis
+from app.services.analysis_context import AnalysisContext
+from app.services.contour_features import ContourFeatures
+from app.services.image_processor import ImageProcessor
+from app.services.tree_analyzer import TreeAnalyzer
+
+class Tile:
+    """A core region of an image, owned by one tile, and the padded region the tile reads"""
+
+    def __init__(self, core: Tuple[int, int, int, int], padded: Tuple[int, int, int, int]):
+        self.core = core  # (x0, y0, x1, y1), end exclusive
+        self.padded = padded
+
+class ViewLeaves:
+    """
+    Leaf detections of one view, merged over its tiles.
+
+    Edge and total pixel counts are at the analysis resolution, like the
+    contour areas, so edge density compares with the standard analysis.
+    """
+
+    def __init__(self, contours: ContourFeatures, edge_pixels: float, total_pixels: int, color_sample: np.ndarray):
+        self.contours = contours
+        self.edge_pixels = edge_pixels
+        self.total_pixels = total_pixels
+        self.color_sample = color_sample
+
+class TiledLeafDetector:
+    """
+    Leaf detection on high-resolution images, in overlapping tiles.
+
+    The tree mask and dimensions still come from the analysis-resolution
+    image, but edges and leaf contours are found on the original image,
+    where leaf boundaries the downscale would merge are still visible. Tiles
+    are processed in parallel, and each contour is kept only by the tile
+    whose core contains its center. Tiles overlap by at least the size of
+    the largest leaf, so the owning tile always sees the whole leaf. Leaf
+    size thresholds scale with the resolution, and leaf areas are reported
+    at the analysis resolution. Memory stays bounded: the decode is capped
+    at HIGH_RES_MAX_PIXELS and every intermediate is tile-sized.
+    """
+
+    def __init__(
+        self,
+        image_processor: ImageProcessor,
+        tree_analyzer: TreeAnalyzer,
+        tile_size: Optional[int] = None,
+        overlap: Optional[int] = None,
+        max_pixels: Optional[int] = None
+    ):
+        self.image_processor = image_processor
+        self.tree_analyzer = tree_analyzer
+        self.tile_size = tile_size or settings.TILE_SIZE
+        self.overlap = overlap if overlap is not None else settings.TILE_OVERLAP
+        self.max_pixels = max_pixels or settings.HIGH_RES_MAX_PIXELS
+
+    def analyze_leaves(
+        self,
+        front_path: str,
+        side_path: str,
+        front_context: AnalysisContext,
+        side_context: AnalysisContext
+    ) -> LeafAnalysis:
+        """Leaf analysis of both views, detected on their full-resolution images"""
+        front, side = map_views(
+            lambda view: self.detect(*view),
+            [(front_path, front_context, True), (side_path, side_context, False)]
+        )
+
+        total_pixels = front.total_pixels + side.total_pixels
+        edge_density = (front.edge_pixels + side.edge_pixels) / total_pixels if total_pixels else 0.0
+
+        with timed("color_clustering"):
+            dominant_colors = self.tree_analyzer.color_extractor.extract(front.color_sample, n_colors=3)
+
+        return self.tree_analyzer._summarize_leaves(
+            ContourFeatures.concatenate([front.contours, side.contours]),
+            self.tree_analyzer._calculate_tree_area(front_context),
+            edge_density,
+            dominant_colors
+        )
+
+    def detect(self, image_path: str, context: AnalysisContext, sample_colors: bool = False) -> ViewLeaves:
+        """
+        Detect leaves of one view in tiles.
+
+        Contours are in full-resolution coordinates, but their areas and
+        perimeters, and the edge and total pixel counts, are scaled to the
+        analysis resolution of context.
+        """
+        with timed("highres_decode"):
+            image = self._load(image_path)
+
+        height, width = image.shape[:2]
+        reference_height, reference_width = context.shape[:2]
+        scale_x, scale_y = width / reference_width, height / reference_height
+        area_scale = scale_x * scale_y
+
+        # The owning tile must see the whole of the largest leaf around its center
+        largest_leaf = math.ceil(math.sqrt(self.tree_analyzer.LEAF_AREA_RANGE[1] * area_scale))
+        tiles = self.tiles(width, height, max(self.overlap, largest_leaf))
+        samples_per_tile = -(-settings.DOMINANT_COLOR_MAX_SAMPLES // len(tiles)) if sample_colors else 0
+
+        tree_mask = context.tree_mask
+        results = map_tiles(
+            lambda tile: self._detect_tile(image, tree_mask, tile, scale_x, scale_y, samples_per_tile),
+            tiles
+        )
+
+        contours = ContourFeatures.concatenate([result[0] for result in results])
+        contours.area = contours.area / area_scale
+        contours.perimeter = contours.perimeter / math.sqrt(area_scale)
+
+        # Edges are lines: their pixel count grows with the linear scale, the area with its square
+        return ViewLeaves(
+            contours,
+            sum(result[1] for result in results) / math.sqrt(area_scale),
+            reference_width * reference_height,
+            np.concatenate([result[2] for result in results])
+        )
+
+    def tiles(self, width: int, height: int, overlap: int) -> List[Tile]:
+        """Cover an image with tile_size cores, each padded by overlap within the image"""
+        tiles = []
+        for y0 in range(0, height, self.tile_size):
+            for x0 in range(0, width, self.tile_size):
+                x1, y1 = min(x0 + self.tile_size, width), min(y0 + self.tile_size, height)
+                padded = (max(x0 - overlap, 0), max(y0 - overlap, 0), min(x1 + overlap, width), min(y1 + overlap, height))
+                tiles.append(Tile((x0, y0, x1, y1), padded))
+        return tiles
+
+    def _load(self, image_path: str) -> np.ndarray:
+        """Decode an image as RGB, reduced by a power of two if it exceeds max_pixels"""
+        try:
+            # Only the header is read here, the pixels are not decoded
+            with Image.open(image_path) as header:
+                width, height = header.size
+        except Exception:
+            width = height = 0
+
+        reduction = 1
+        while reduction < 8 and (width // reduction) * (height // reduction) > self.max_pixels:
+            reduction *= 2
+
+        image = cv2.imread(image_path, ImageProcessor.REDUCED_DECODE_FLAGS[reduction])
+        if image is None:
+            raise ValueError(f"Could not load image: {image_path}")
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    def _detect_tile(
+        self,
+        image: np.ndarray,
+        tree_mask: np.ndarray,
+        tile: Tile,
+        scale_x: float,
+        scale_y: float,
+        color_samples: int
+    ) -> Tuple[ContourFeatures, int, np.ndarray]:
+        """Leaf contours owned by a tile, the edge pixels of its core and a sample of leaf colors"""
+        px0, py0, px1, py1 = tile.padded
+        x0, y0, x1, y1 = tile.core
+        tile_width, tile_height = px1 - px0, py1 - py0
+        height, width = image.shape[:2]
+
+        # Tree mask of the tile, sampled straight from the analysis-resolution mask
+        to_mask = np.float32([[1 / scale_x, 0, px0 / scale_x], [0, 1 / scale_y, py0 / scale_y]])
+        mask = cv2.warpAffine(
+            tree_mask, to_mask, (tile_width, tile_height),
+            flags=cv2.INTER_NEAREST | cv2.WARP_INVERSE_MAP
+        )
+
+        # Same contrast normalization as the analysis image: 8x8 CLAHE cells over the whole image
+        grid = (max(1, round(8 * tile_width / width)), max(1, round(8 * tile_height / height)))
+        normalized = self.image_processor._normalize_image(image[py0:py1, px0:px1], grid)
+        segmented = cv2.bitwise_and(normalized, normalized, mask=mask)
+
+        context = AnalysisContext(normalized)
+        context.set("segmented", segmented)
+
+        with timed("edges"):
+            edges = self.tree_analyzer._extract_edges(context)
+
+        with timed("contour_filtering"):
+            features = self.tree_analyzer._find_leaf_contours(edges, scale_x * scale_y)
+
+            # Keep contours centered in the core, and never ones cut off by the padding
+            bounds = features.bounds
+            center_x = (bounds[:, 0] + bounds[:, 2]) / 2 + px0
+            center_y = (bounds[:, 1] + bounds[:, 3]) / 2 + py0
+            owned = (center_x >= x0) & (center_x < x1) & (center_y >= y0) & (center_y < y1)
+            truncated = (
+                ((bounds[:, 0] <= 0) & (px0 > 0)) | ((bounds[:, 2] >= tile_width - 1) & (px1 < width)) |
+                ((bounds[:, 1] <= 0) & (py0 > 0)) | ((bounds[:, 3] >= tile_height - 1) & (py1 < height))
+            )
+            features = features.select(owned & ~truncated)
+
+        color_sample = np.empty((0, 3), dtype=np.uint8)
+        if color_samples and len(features):
+            leaf_mask = np.zeros(edges.shape, dtype=np.uint8)
+            cv2.fillPoly(leaf_mask, features.contours, 255)
+            pixels = segmented[leaf_mask > 0]
+            color_sample = pixels[::-(-len(pixels) // color_samples)] if len(pixels) else color_sample
+
+        core_edges = edges[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+        return features.offset(px0, py0), cv2.countNonZero(core_edges), color_sample
@@ -1,35 +1,70 @@
 import cv2
 import numpy as np
-from sklearn.cluster import DBSCAN, KMeans
-from scipy.spatial.distance import pdist, squareform
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
 import math
-from app.models.schemas import TreeDimensions, LeafAnalysis, FoliageData
+from app.models.schemas import TreeDimensions, PixelMeasurements, LeafAnalysis, FoliageData
+from app.core.concurrency import map_views
+from app.core.metrics import timed
+from app.services.analysis_context import AnalysisContext
+from app.services.color_quantizer import DominantColorExtractor
+from app.services.contour_features import ContourFeatures
+from app.services.edge_extractor import EdgeExtractor
+from app.services.foliage_geometry import FoliageGeometry
+
+ImageInput = Union[np.ndarray, AnalysisContext]
 
 class TreeAnalyzer:
     """Analyzes tree dimensions, leaf patterns, and generates foliage data"""
     
+    # Leaf contour area range in pixels at the analysis resolution (MAX_IMAGE_SIZE)
+    LEAF_AREA_RANGE = (20, 5000)
+    
     def __init__(self):
         self.reference_object_size = None  # Can be set if reference object is detected
+        self.color_extractor = DominantColorExtractor()
+        self.edge_extractor = EdgeExtractor()
+        self.foliage_geometry = FoliageGeometry()
     
     def extract_dimensions(
         self, 
-        front_image: np.ndarray, 
-        side_image: np.ndarray,
+        front_image: ImageInput, 
+        side_image: ImageInput,
         camera_height: Optional[float] = None,
         distance_from_tree: Optional[float] = None
     ) -> TreeDimensions:
         """Extract tree dimensions from front and side view images"""
+        return self.scale_dimensions(
+            self.measure_dimensions(front_image, side_image), camera_height, distance_from_tree
+        )
+    
+    def measure_dimensions(self, front_image: ImageInput, side_image: ImageInput) -> PixelMeasurements:
+        """Measure the tree's extents in pixels from front and side view images"""
+        front_image = AnalysisContext.of(front_image)
+        side_image = AnalysisContext.of(side_image)
         
         # Get tree boundaries from both views
         front_bounds = self._get_tree_boundaries(front_image)
         side_bounds = self._get_tree_boundaries(side_image)
         
-        # Calculate relative dimensions
-        height_pixels = front_bounds['height']
-        width_pixels = front_bounds['width']
-        depth_pixels = side_bounds['width']  # Depth comes from side view width
-        
+        return PixelMeasurements(
+            height=float(front_bounds['height']),
+            width=float(front_bounds['width']),
+            depth=float(side_bounds['width']),  # Depth comes from side view width
+            image_height=front_image.shape[0],
+            # Calculate confidence based on image quality and boundary detection
+            confidence=self._calculate_dimension_confidence(front_bounds, side_bounds)
+        )
+    
+    def scale_dimensions(
+        self,
+        measurements: PixelMeasurements,
+        camera_height: Optional[float] = None,
+        distance_from_tree: Optional[float] = None
+    ) -> TreeDimensions:
+        """
+        Convert pixel measurements to dimensions. Only this step depends on
+        the camera parameters, so recalibrating a session needs no images.
+        """
         # Calculate scale factor if camera parameters are provided
         scale_factor = 1.0
         unit = "relative"
@@ -37,36 +72,59 @@ class TreeAnalyzer:
         if camera_height and distance_from_tree:
             # Use camera parameters to estimate real-world scale
             scale_factor = self._calculate_scale_factor(
-                height_pixels, camera_height, distance_from_tree, front_image.shape
+                measurements.height, camera_height, distance_from_tree, (measurements.image_height,)
             )
             unit = "meters"
         
-        # Calculate confidence based on image quality and boundary detection
-        confidence = self._calculate_dimension_confidence(front_bounds, side_bounds)
-        
         return TreeDimensions(
-            height=height_pixels * scale_factor,
-            width=width_pixels * scale_factor,
-            depth=depth_pixels * scale_factor,
-            confidence=confidence,
+            height=measurements.height * scale_factor,
+            width=measurements.width * scale_factor,
+            depth=measurements.depth * scale_factor,
+            confidence=measurements.confidence,
             unit=unit
         )
     
-    def analyze_leaves(self, front_image: np.ndarray, side_image: np.ndarray) -> LeafAnalysis:
+    def analyze_leaves(self, front_image: ImageInput, side_image: ImageInput) -> LeafAnalysis:
         """Analyze leaf patterns and estimate leaf characteristics"""
+        front_image = AnalysisContext.of(front_image)
+        side_image = AnalysisContext.of(side_image)
+        
+        # Extract edges and leaf-like contours from both views
+        (front_edges, front_contours), (side_edges, side_contours) = map_views(
+            self._detect_leaves, [front_image, side_image]
+        )
         
-        # Extract edges from both images
-        front_edges = self._extract_edges(front_image)
-        side_edges = self._extract_edges(side_image)
+        # Combine contour features from both views
+        all_contours = ContourFeatures.concatenate([front_contours, side_contours])
         
-        # Find leaf-like contours
-        front_contours = self._find_leaf_contours(front_edges)
-        side_contours = self._find_leaf_contours(side_edges)
+        if not len(all_contours):
+            return self._summarize_leaves(all_contours, 0.0, 0.0, [])
         
-        # Combine contours from both views
-        all_contours = front_contours + side_contours
+        # Calculate edge density
+        edge_density = self._calculate_edge_density(front_edges, side_edges)
+        
+        # Extract dominant colors from leaf regions
+        with timed("color_clustering"):
+            dominant_colors = self._extract_dominant_colors(front_image.segmented, front_contours.contours)
         
-        if not all_contours:
+        return self._summarize_leaves(
+            all_contours, self._calculate_tree_area(front_image), edge_density, dominant_colors
+        )
+    
+    def _summarize_leaves(
+        self,
+        contours: ContourFeatures,
+        total_tree_area: float,
+        edge_density: float,
+        dominant_colors: List[str]
+    ) -> LeafAnalysis:
+        """
+        Build the leaf analysis from the detected leaf contours of both views.
+        
+        Contour areas are at the analysis resolution, at which total_tree_area
+        is measured.
+        """
+        if not len(contours):
             # Default values if no leaves detected
             return LeafAnalysis(
                 average_leaf_size=0.0,
@@ -75,22 +133,15 @@ class TreeAnalyzer:
                 dominant_colors=[]
             )
         
-        # Calculate average leaf size
-        leaf_areas = [cv2.contourArea(contour) for contour in all_contours]
-        average_leaf_size = np.mean(leaf_areas) if leaf_areas else 0.0
+        # Calculate average leaf size, at the analysis resolution
+        average_leaf_size = float(np.mean(contours.area))
         
         # Estimate total leaf count using density analysis
-        total_tree_area = self._calculate_tree_area(front_image)
         estimated_leaf_count = int(total_tree_area / average_leaf_size) if average_leaf_size > 0 else 0
         
-        # Calculate edge density
-        edge_density = self._calculate_edge_density(front_edges, side_edges)
-        
-        # Extract dominant colors from leaf regions
-        dominant_colors = self._extract_dominant_colors(front_image, front_contours)
-        
         # Classify leaf type (placeholder - would use trained ML model)
-        leaf_type, leaf_confidence = self._classify_leaf_type(all_contours)
+        with timed("leaf_classification"):
+            leaf_type, leaf_confidence = self._classify_leaf_type(contours)
         
         return LeafAnalysis(
             average_leaf_size=average_leaf_size,
@@ -119,44 +170,20 @@ class TreeAnalyzer:
             volume=volume,
             density=density,
             vertex_count=vertex_count,
-            face_count=face_count
+            face_count=face_count,
+            lod_leaf_counts=self.foliage_geometry.lod_leaf_counts(leaf_analysis.estimated_leaf_count)
         )
     
-    def _get_tree_boundaries(self, image: np.ndarray) -> Dict[str, float]:
+    def _get_tree_boundaries(self, image: ImageInput) -> Dict[str, float]:
         """Get tree boundaries from segmented image"""
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-        
-        # Find non-zero pixels (tree pixels)
-        tree_pixels = np.where(gray > 0)
-        
-        if len(tree_pixels[0]) == 0:
-            return {'height': 0, 'width': 0, 'top': 0, 'bottom': 0, 'left': 0, 'right': 0}
-        
-        # Get bounding box
-        top = np.min(tree_pixels[0])
-        bottom = np.max(tree_pixels[0])
-        left = np.min(tree_pixels[1])
-        right = np.max(tree_pixels[1])
-        
-        height = bottom - top
-        width = right - left
-        
-        return {
-            'height': height,
-            'width': width,
-            'top': top,
-            'bottom': bottom,
-            'left': left,
-            'right': right
-        }
+        return AnalysisContext.of(image).tree_statistics.boundaries()
     
     def _calculate_scale_factor(
         self, 
         height_pixels: float, 
         camera_height: float, 
         distance: float, 
-        image_shape: Tuple[int, int]
+        image_shape: Tuple[int, ...]
     ) -> float:
         """Calculate scale factor to convert pixels to real-world units"""
         # Simplified perspective calculation
@@ -188,56 +215,46 @@ class TreeAnalyzer:
         # Additional factors could include edge sharpness, contrast, etc.
         return max(0.1, min(1.0, area_confidence))
     
-    def _extract_edges(self, image: np.ndarray) -> np.ndarray:
+    def _extract_edges(self, image: ImageInput) -> np.ndarray:
         """Extract edges optimized for leaf detection"""
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-        
-        # Apply bilateral filter to preserve edges while reducing noise
-        filtered = cv2.bilateralFilter(gray, 9, 75, 75)
-        
-        # Multi-scale edge detection
-        edges1 = cv2.Canny(filtered, 30, 80)
-        edges2 = cv2.Canny(filtered, 50, 120)
-        
-        # Combine edge maps
-        edges = cv2.bitwise_or(edges1, edges2)
+        return self.edge_extractor.extract(AnalysisContext.of(image).segmented_gray)
+    
+    def _detect_leaves(self, context: AnalysisContext) -> Tuple[np.ndarray, ContourFeatures]:
+        """Extract the edge map and leaf-like contours of a single view"""
+        with timed("edges"):
+            edges = context.memoize("leaf_edges", lambda: self._extract_edges(context))
         
-        return edges
+        with timed("contour_filtering"):
+            return edges, self._find_leaf_contours(edges)
     
-    def _find_leaf_contours(self, edges: np.ndarray) -> List[np.ndarray]:
-        """Find contours that likely represent leaves"""
+    def _find_leaf_contours(self, edges: np.ndarray, area_scale: float = 1.0) -> ContourFeatures:
+        """
+        Find contours that likely represent leaves, with their shape features.
+        
+        area_scale is the pixel area of the edge map relative to the analysis
+        resolution, so leaves are held to the same size range at any resolution.
+        """
         # Find all contours
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        features = ContourFeatures(contours)
+        
+        # Filter by size (leaves should be within certain size range)
+        min_area, max_area = self.LEAF_AREA_RANGE
+        is_leaf_sized = (features.area > min_area * area_scale) & (features.area < max_area * area_scale)
         
-        # Filter contours by size and shape characteristics
-        leaf_contours = []
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            perimeter = cv2.arcLength(contour, True)
-            
-            # Filter by size (leaves should be within certain size range)
-            if 20 < area < 5000:  # Adjust based on image resolution
-                # Check if contour is roughly leaf-shaped
-                if perimeter > 0:
-                    circularity = 4 * math.pi * area / (perimeter * perimeter)
-                    
-                    # Leaves are typically not perfectly circular
-                    if 0.1 < circularity < 0.9:
-                        leaf_contours.append(contour)
-        
-        return leaf_contours
+        # Leaves are typically not perfectly circular
+        circularity = features.circularity
+        is_leaf_shaped = (features.perimeter > 0) & (circularity > 0.1) & (circularity < 0.9)
+        
+        return features.select(is_leaf_sized & is_leaf_shaped)
     
-    def _calculate_tree_area(self, image: np.ndarray) -> float:
+    def _calculate_tree_area(self, image: ImageInput) -> float:
         """Calculate total tree area in pixels"""
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-        tree_pixels = np.sum(gray > 0)
-        return float(tree_pixels)
+        return float(AnalysisContext.of(image).tree_statistics.area)
     
     def _calculate_edge_density(self, front_edges: np.ndarray, side_edges: np.ndarray) -> float:
         """Calculate edge density as a measure of foliage complexity"""
-        total_edges = np.sum(front_edges > 0) + np.sum(side_edges > 0)
+        total_edges = cv2.countNonZero(front_edges) + cv2.countNonZero(side_edges)
         total_pixels = front_edges.size + side_edges.size
         
         return total_edges / total_pixels if total_pixels > 0 else 0.0
@@ -257,69 +274,28 @@ class TreeAnalyzer:
         if len(leaf_pixels) == 0:
             return []
         
-        # Use K-means clustering to find dominant colors
-        leaf_pixels_reshaped = leaf_pixels.reshape(-1, 3)
-        
-        try:
-            kmeans = KMeans(n_clusters=min(5, len(leaf_pixels_reshaped)), random_state=42, n_init=10)
-            kmeans.fit(leaf_pixels_reshaped)
-            
-            # Convert RGB values to hex colors
-            dominant_colors = []
-            for color in kmeans.cluster_centers_:
-                hex_color = "#{:02x}{:02x}{:02x}".format(
-                    int(color[0]), int(color[1]), int(color[2])
-                )
-                dominant_colors.append(hex_color)
-            
-            return dominant_colors[:3]  # Return top 3 colors
-            
-        except Exception:
-            # Fallback: return average color
-            avg_color = np.mean(leaf_pixels_reshaped, axis=0)
-            hex_color = "#{:02x}{:02x}{:02x}".format(
-                int(avg_color[0]), int(avg_color[1]), int(avg_color[2])
-            )
-            return [hex_color]
+        # Cluster a bounded sample of the leaf pixels, most populous colors first
+        return self.color_extractor.extract(leaf_pixels, n_colors=3)
     
-    def _classify_leaf_type(self, contours: List[np.ndarray]) -> Tuple[Optional[str], Optional[float]]:
+    def _classify_leaf_type(self, contours: ContourFeatures) -> Tuple[Optional[str], Optional[float]]:
         """Classify leaf type based on shape characteristics"""
-        if not contours:
+        if not len(contours):
             return None, None
         
         # Simple shape-based classification (placeholder)
         # In a real implementation, this would use a trained CNN
         
-        # Calculate shape features for all contours
-        shape_features = []
-        
-        for contour in contours:
-            if len(contour) < 5:
-                continue
-                
-            # Fit ellipse to contour
-            try:
-                ellipse = cv2.fitEllipse(contour)
-                aspect_ratio = max(ellipse[1]) / min(ellipse[1])
-                
-                # Calculate solidity (convex hull ratio)
-                hull = cv2.convexHull(contour)
-                solidity = cv2.contourArea(contour) / cv2.contourArea(hull)
-                
-                shape_features.append({
-                    'aspect_ratio': aspect_ratio,
-                    'solidity': solidity
-                })
-                
-            except Exception:
-                continue
-        
-        if not shape_features:
+        # Use contours with enough points for a meaningful shape and a
+        # non-degenerate ellipse and convex hull
+        shaped = contours.select(contours.point_count >= 5)
+        valid = np.isfinite(shaped.aspect_ratio) & np.isfinite(shaped.solidity)
+        
+        if not valid.any():
             return None, None
         
         # Simple classification based on average features
-        avg_aspect_ratio = np.mean([f['aspect_ratio'] for f in shape_features])
-        avg_solidity = np.mean([f['solidity'] for f in shape_features])
+        avg_aspect_ratio = np.mean(shaped.aspect_ratio[valid])
+        avg_solidity = np.mean(shaped.solidity[valid])
         
         # Basic classification rules
         if avg_aspect_ratio > 2.5 and avg_solidity > 0.7:
@@ -0,0 +1,90 @@
+"""
+Benchmark the leaf edge engines against the previous edge extraction.
+
+The previous version ran a full-resolution bilateral filter and then two
+independent Canny passes, each recomputing the image gradients. For every
+corpus case and smoothing method this reports the edge extraction time, the
+speedup over the previous version, the leaf count of both views and its
+difference from the previous version's count. The bilateral engine must
+reproduce the previous edge maps exactly.
+
+Usage, from the backend directory:
+    python -m benchmarks.bench_edges [--resolutions small medium large]
+        [--corpus-dir DIR] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+from app.services.analysis_context import AnalysisContext
+from app.services.edge_extractor import EdgeExtractor
+from app.services.image_processor import ImageProcessor
+from app.services.tree_analyzer import TreeAnalyzer
+from benchmarks.corpus import DENSITIES, RESOLUTIONS, tree_pair
+
+def legacy_extract_edges(gray: np.ndarray) -> np.ndarray:
+    """Edge extraction as implemented before the edge engines"""
+    filtered = cv2.bilateralFilter(gray, 9, 75, 75)
+    edges1 = cv2.Canny(filtered, 30, 80)
+    edges2 = cv2.Canny(filtered, 50, 120)
+    return cv2.bitwise_or(edges1, edges2)
+
+def best_time(function, repeat: int) -> float:
+    """Best wall time over repeat runs, after one warm-up run"""
+    function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=["small", "medium"])
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "tree-calculator-corpus"))
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    processor = ImageProcessor()
+    analyzer = TreeAnalyzer()
+    engines = {method: EdgeExtractor(smoothing=method) for method in EdgeExtractor.SMOOTHING_METHODS}
+
+    def leaf_count(edge_maps) -> int:
+        return sum(len(analyzer._find_leaf_contours(edges)) for edges in edge_maps)
+
+    print(f"{'case':16s} {'engine':22s} {'ms':>8s} {'speedup':>8s} {'leaves':>7s} {'diff':>7s}")
+    for resolution in args.resolutions:
+        for density in DENSITIES:
+            grays = []
+            for path in tree_pair(args.corpus_dir, resolution, density):
+                context = AnalysisContext(processor.preprocess_image(path))
+                processor.segment(context)
+                grays.append(context.segmented_gray)
+
+            case = f"{resolution}/{density}"
+            reference = [legacy_extract_edges(gray) for gray in grays]
+            reference_seconds = best_time(lambda: [legacy_extract_edges(gray) for gray in grays], args.repeat)
+            reference_leaves = leaf_count(reference)
+            print(f"{case:16s} {'previous':22s} {reference_seconds * 1000:8.2f} {1:8.2f} {reference_leaves:7d}")
+
+            for method, engine in engines.items():
+                edge_maps = [engine.extract(gray) for gray in grays]
+                if method == "bilateral" and not all(map(np.array_equal, edge_maps, reference)):
+                    print("Bilateral edge maps differ from the previous implementation", file=sys.stderr)
+                    return 1
+
+                seconds = best_time(lambda: [engine.extract(gray) for gray in grays], args.repeat)
+                leaves = leaf_count(edge_maps)
+                difference = (leaves - reference_leaves) / reference_leaves if reference_leaves else 0.0
+                print(
+                    f"{case:16s} {method:22s} {seconds * 1000:8.2f} {reference_seconds / seconds:8.2f} "
+                    f"{leaves:7d} {difference:+7.1%}"
+                )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Benchmark tree segmentation against the previous implementation.
+
+The previous version built two inRange masks (the second range contains the
+first), allocated its structuring element on every call, and masked a full
+copy of the image with boolean indexing. Both versions are checked to give
+identical masks before timing.
+
+Usage, from the backend directory:
+    python -m benchmarks.bench_segmentation [image_path] [--repeat N]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from app.services.analysis_context import AnalysisContext
+from app.services.image_processor import ImageProcessor
+
+def legacy_segment_tree(image: np.ndarray) -> np.ndarray:
+    """Segmentation as implemented before the allocation-free rewrite"""
+    hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+    green_mask = cv2.bitwise_or(
+        cv2.inRange(hsv, np.array([35, 40, 40]), np.array([85, 255, 255])),
+        cv2.inRange(hsv, np.array([25, 30, 30]), np.array([95, 255, 255]))
+    )
+
+    kernel = np.ones((5, 5), np.uint8)
+    green_mask = cv2.morphologyEx(green_mask, cv2.MORPH_CLOSE, kernel)
+    green_mask = cv2.morphologyEx(green_mask, cv2.MORPH_OPEN, kernel)
+
+    contours, _ = cv2.findContours(green_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return image
+
+    mask = np.zeros(green_mask.shape, dtype=np.uint8)
+    cv2.fillPoly(mask, [max(contours, key=cv2.contourArea)], 255)
+    segmented = image.copy()
+    segmented[mask == 0] = [0, 0, 0]
+    return segmented
+
+def synthetic_image(height: int = 1024, width: int = 768, seed: int = 0) -> np.ndarray:
+    """RGB tree over sky: a green crown scattered with leaf blobs, on a trunk"""
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), (135, 206, 235), dtype=np.uint8)
+    cv2.rectangle(image, (width // 2 - 20, height // 2), (width // 2 + 20, height - 20), (100, 60, 30), -1)
+    cv2.ellipse(image, (width // 2, height // 2 - 30), (width // 3, height // 3), 0, 0, 360, (40, 140, 40), -1)
+    for _ in range(2000):
+        center = (int(width // 2 + rng.normal(0, width / 8)), int(height // 2 - 30 + rng.normal(0, height / 8)))
+        axes = (int(rng.integers(3, 10)), int(rng.integers(2, 6)))
+        shade = (int(rng.integers(10, 80)), int(rng.integers(90, 220)), int(rng.integers(10, 80)))
+        cv2.ellipse(image, center, axes, float(rng.integers(0, 180)), 0, 360, shade, -1)
+    return image
+
+def measure(function, repeat: int):
+    """Best wall time over repeat runs and the peak traced allocation of one run"""
+    function()  # Warm up caches and scratch buffers
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image_path", nargs="?", help="Image to segment (a synthetic tree by default)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    processor = ImageProcessor()
+    image = processor.preprocess_image(args.image_path) if args.image_path else synthetic_image()
+
+    expected = legacy_segment_tree(image)
+    if not np.array_equal(processor.segment_tree(image), expected):
+        print("Segmented images differ from the previous implementation", file=sys.stderr)
+        return 1
+
+    candidates = {
+        "previous": lambda: legacy_segment_tree(image),
+        "segment_tree": lambda: processor.segment_tree(image),
+        "segment_tree(return_mask)": lambda: processor.segment_tree(image, return_mask=True),
+        "segment(masked_copy=False)": lambda: processor.segment(AnalysisContext(image), masked_copy=False)
+    }
+
+    print(f"image {image.shape[1]}x{image.shape[0]}, best of {args.repeat}")
+    baseline = None
+    for name, function in candidates.items():
+        seconds, peak = measure(function, args.repeat)
+        baseline = baseline or seconds
+        print(f"{name:28s} {seconds * 1000:8.2f} ms  {baseline / seconds:5.2f}x  peak {peak / 2**20:7.2f} MiB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Benchmark CPU segmentation model throughput at different batch sizes.
+
+Runs the model at SEGMENTATION_MODEL_PATH or, when there is no model file,
+an untrained torchvision LR-ASPP MobileNetV3 of comparable cost, on
+preprocessed corpus views. For each batch size it reports:
+  - direct: images per second and latency per batch when the model is
+    called on batches of that size
+  - batched: images per second when --clients threads segment one view
+    each through a DynamicBatcher with that maximum batch size
+  - agreement: the share of mask pixels equal to those of batch size 1
+
+Usage, from the backend directory:
+    python -m benchmarks.bench_segmentation_model [--model PATH] [--batch-sizes 1 2 8]
+        [--images N] [--clients N] [--threads N] [--max-wait-ms MS]
+"""
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.core.config import settings
+from app.services.image_processor import ImageProcessor
+from app.services.segmentation_model import DynamicBatcher, SegmentationModel
+from benchmarks.corpus import tree_pair
+
+def stand_in_model():
+    """Untrained two-class segmentation network, for timing when no model is available"""
+    from torchvision.models.segmentation import lraspp_mobilenet_v3_large
+    return lraspp_mobilenet_v3_large(weights=None, weights_backbone=None, num_classes=2)
+
+def corpus_views(corpus_dir: str, count: int):
+    """count preprocessed views, cycling through the small and medium corpus photos"""
+    processor = ImageProcessor()
+    paths = [
+        path for resolution, density in (("small", "sparse"), ("medium", "dense"))
+        for path in tree_pair(corpus_dir, resolution, density)
+    ]
+    views = [processor.preprocess_image(path) for path in paths]
+    return list(itertools.islice(itertools.cycle(views), count))
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.SEGMENTATION_MODEL_PATH)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 8])
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--clients", type=int, default=8, help="Threads submitting views to the batcher")
+    parser.add_argument("--threads", type=int, default=settings.SEGMENTATION_THREADS, help="PyTorch CPU threads")
+    parser.add_argument("--max-wait-ms", type=float, default=settings.SEGMENTATION_BATCH_WAIT_MS)
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "tree-calculator-corpus"))
+    args = parser.parse_args(argv)
+
+    try:
+        import torch
+    except ImportError:
+        print("PyTorch is not installed", file=sys.stderr)
+        return 1
+    torch.set_num_threads(args.threads)
+
+    input_size, threshold = settings.SEGMENTATION_INPUT_SIZE, settings.SEGMENTATION_THRESHOLD
+    if os.path.exists(args.model):
+        model = SegmentationModel.load(args.model, input_size, threshold)
+    else:
+        print(f"No model at {args.model}, timing an untrained stand-in", file=sys.stderr)
+        model = SegmentationModel(stand_in_model(), input_size, threshold)
+
+    images = corpus_views(args.corpus_dir, args.images)
+    reference = [model.predict([image])[0] for image in images]
+
+    print(f"{len(images)} views at {input_size[0]}x{input_size[1]}, {args.threads} thread(s), "
+          f"{args.clients} batcher clients")
+    print(f"{'batch':>5s} {'direct img/s':>13s} {'ms/batch':>9s} {'batched img/s':>14s} {'agreement':>10s}")
+    for batch_size in args.batch_sizes:
+        model.predict(images[:batch_size])  # Warm up allocations for this batch shape
+
+        masks = []
+        start = time.perf_counter()
+        for index in range(0, len(images), batch_size):
+            masks.extend(model.predict(images[index:index + batch_size]))
+        direct_seconds = time.perf_counter() - start
+        batches = -(-len(images) // batch_size)
+
+        batcher = DynamicBatcher(model.predict, batch_size, args.max_wait_ms / 1000)
+        with ThreadPoolExecutor(max_workers=args.clients) as executor:
+            start = time.perf_counter()
+            list(executor.map(batcher, images))
+            batched_seconds = time.perf_counter() - start
+
+        agreement = np.mean([np.mean(mask == expected) for mask, expected in zip(masks, reference)])
+        print(
+            f"{batch_size:5d} {len(images) / direct_seconds:13.2f} {direct_seconds / batches * 1000:9.1f} "
+            f"{len(images) / batched_seconds:14.2f} {agreement:10.2%}"
+        )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Benchmark API cold start: the time to import main and the resulting RSS.
+
+Each sample runs in a fresh interpreter. Heavy libraries that the import
+loaded are listed, since analysis (OpenCV), PDF (reportlab) and plotting
+(matplotlib) libraries should only load on first use. With --warm-up, the
+cost of the startup warm-up hook is measured too (in-process, without
+starting worker processes).
+
+Usage, from the backend directory:
+    python -m benchmarks.bench_startup [--samples N] [--warm-up]
+        [--max-import-seconds S] [--max-rss-mib M]
+
+Exits with status 1 when a budget is exceeded or a lazily loaded library
+is imported at startup.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that importing the API must not load
+LAZY_MODULES = ("cv2", "sklearn", "scipy", "matplotlib", "reportlab", "torch")
+
+SAMPLE_SCRIPT = """
+import json, resource, sys, time
+
+def rss_mib():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+start = time.perf_counter()
+import main
+sample = {{
+    "import_seconds": time.perf_counter() - start,
+    "rss_mib": rss_mib(),
+    "loaded": [name for name in {lazy_modules!r} if name in sys.modules]
+}}
+
+if {warm_up!r}:
+    from app.services import analysis_pipeline
+    start = time.perf_counter()
+    main.report_generator.warm_up()
+    analysis_pipeline.warm_up()
+    sample["warm_up_seconds"] = time.perf_counter() - start
+    sample["warm_rss_mib"] = rss_mib()
+
+print(json.dumps(sample))
+"""
+
+def run_sample(warm_up: bool) -> dict:
+    """Import main in a fresh interpreter and return its measurements"""
+    script = SAMPLE_SCRIPT.format(lazy_modules=LAZY_MODULES, warm_up=warm_up)
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--warm-up", action="store_true", help="Also measure the startup warm-up hook")
+    parser.add_argument("--max-import-seconds", type=float)
+    parser.add_argument("--max-rss-mib", type=float)
+    args = parser.parse_args(argv)
+
+    samples = [run_sample(args.warm_up) for _ in range(args.samples)]
+    import_seconds = min(sample["import_seconds"] for sample in samples)
+    rss_mib = max(sample["rss_mib"] for sample in samples)
+    loaded = sorted({name for sample in samples for name in sample["loaded"]})
+
+    print(f"import main   {import_seconds * 1000:8.1f} ms (best of {args.samples})")
+    print(f"RSS           {rss_mib:8.1f} MiB")
+    if args.warm_up:
+        warm_up_seconds = min(sample["warm_up_seconds"] for sample in samples)
+        warm_rss_mib = max(sample["warm_rss_mib"] for sample in samples)
+        print(f"warm-up       {warm_up_seconds * 1000:8.1f} ms")
+        print(f"RSS warmed    {warm_rss_mib:8.1f} MiB")
+
+    failures = []
+    if loaded:
+        failures.append(f"imported at startup: {', '.join(loaded)}")
+    if args.max_import_seconds is not None and import_seconds > args.max_import_seconds:
+        failures.append(f"import took {import_seconds:.3f}s, budget {args.max_import_seconds}s")
+    if args.max_rss_mib is not None and rss_mib > args.max_rss_mib:
+        failures.append(f"RSS {rss_mib:.1f}MiB, budget {args.max_rss_mib}MiB")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Procedural corpus of front/side tree photos for benchmarks.
+
+Images are generated from fixed seeds, so every machine benchmarks the same
+pixels. Leaves scale with the resolution, so each density presents leaves of
+the same size at the analysis resolution; denser foliage means more leaves,
+not smaller ones.
+"""
+import os
+import cv2
+import numpy as np
+from typing import Dict, Tuple
+
+# Bump when the generator changes, so stale cached images are not reused
+CORPUS_VERSION = 1
+
+# (width, height) of the front and side photos
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "small": (640, 480),
+    "medium": (1600, 1200),
+    "large": (4000, 3000)
+}
+
+# Leaf blobs scattered over the crown
+DENSITIES: Dict[str, int] = {
+    "sparse": 800,
+    "dense": 5000
+}
+
+def tree_image(width: int, height: int, leaf_count: int, crown_scale: float = 1.0, seed: int = 0) -> np.ndarray:
+    """A BGR tree photo: textured green crown on a brown trunk, over sky and ground"""
+    rng = np.random.default_rng(seed)
+    scale = width / RESOLUTIONS["small"][0]
+
+    image = np.full((height, width, 3), (235, 206, 135), dtype=np.uint8)  # Sky
+    ground = height - height // 10
+    image[ground:] = (34, 139, 34)
+
+    trunk = max(4, int(15 * scale))
+    crown_center = (width // 2, int(height * 0.4))
+    crown_axes = (int(width / 3 * crown_scale), int(height / 3))
+    cv2.rectangle(image, (width // 2 - trunk, crown_center[1]), (width // 2 + trunk, ground), (30, 60, 100), -1)
+    cv2.ellipse(image, crown_center, crown_axes, 0, 0, 360, (40, 140, 40), -1)
+
+    # Leaves spread uniformly over the crown and overhanging its edge, so the
+    # silhouette is ragged like real foliage rather than one smooth outline
+    radius = 1.15 * np.sqrt(rng.random(leaf_count))
+    theta = rng.uniform(0, 2 * np.pi, leaf_count)
+    centers = np.stack([np.cos(theta), np.sin(theta)], axis=1) * radius[:, None] * crown_axes + crown_center
+    axes = rng.integers((3, 2), (8, 5), (leaf_count, 2)) * scale
+    angles = rng.integers(0, 180, leaf_count)
+    shades = rng.integers((10, 90, 10), (60, 200, 60), (leaf_count, 3))
+    for center, axis, angle, shade in zip(centers.astype(int), axes.astype(int), angles, shades):
+        cv2.ellipse(
+            image, tuple(int(v) for v in center), tuple(int(max(v, 1)) for v in axis),
+            float(angle), 0, 360, tuple(int(v) for v in shade), -1
+        )
+    return image
+
+def tree_pair(corpus_dir: str, resolution: str, density: str) -> Tuple[str, str]:
+    """Paths of the front and side JPEGs of a corpus case, generating them on first use"""
+    width, height = RESOLUTIONS[resolution]
+    leaf_count = DENSITIES[density]
+    os.makedirs(corpus_dir, exist_ok=True)
+
+    paths = []
+    for view, crown_scale, seed in (("front", 1.0, 0), ("side", 0.8, 1)):
+        path = os.path.join(corpus_dir, f"v{CORPUS_VERSION}_{resolution}_{density}_{view}.jpg")
+        if not os.path.exists(path):
+            image = tree_image(width, height, leaf_count, crown_scale, seed)
+            tmp_path = f"{path}.tmp.jpg"
+            cv2.imwrite(tmp_path, image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            os.replace(tmp_path, path)
+        paths.append(path)
+    return paths[0], paths[1]
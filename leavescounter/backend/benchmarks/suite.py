@@ -0,0 +1,283 @@
+"""
+Performance benchmark suite over a synthetic tree-image corpus.
+
+Measures, for every corpus case (resolution x foliage density):
+  - the latency of each pipeline stage of ImageProcessor and TreeAnalyzer, as
+    recorded by the pipeline's stage timer (summed over both views), and the
+    end-to-end analysis time
+  - the peak memory allocated by one analysis
+and, through the API with real worker processes:
+  - /process latency (request to completed job) and throughput
+  - /export latency of each format, rendered cold
+
+Results are written as JSON and compared with a stored baseline: a metric
+regresses when it is worse than the baseline by more than --threshold
+(relative), ignoring latency changes smaller than --min-delta-ms.
+
+Usage, from the backend directory:
+    python -m benchmarks.suite [--profile quick|full] [--output results.json]
+        [--baseline benchmarks/baseline.json] [--save-baseline] [--threshold 0.25]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.corpus import CORPUS_VERSION, tree_pair
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+
+# (corpus cases, repeats, sessions in the throughput run)
+PROFILES = {
+    "quick": ([("small", "sparse"), ("medium", "dense")], 3, 4),
+    "full": (
+        [(resolution, density) for resolution in ("small", "medium", "large") for density in ("sparse", "dense")],
+        5, 8
+    )
+}
+
+EXPORT_FORMATS = ("pdf", "png", "glb", "obj")
+
+def configure_environment(work_dir: str) -> None:
+    """
+    Point the app at scratch directories and disable the result cache.
+
+    Must run before the app is imported: settings are read at import, and
+    the analysis worker processes inherit this environment.
+    """
+    os.environ.update({
+        "UPLOAD_DIR": os.path.join(work_dir, "uploads"),
+        "RESULTS_DIR": os.path.join(work_dir, "results"),
+        "RESULT_CACHE_ENABLED": "False",
+        "RESULT_CACHE_DIR": os.path.join(work_dir, "cache"),
+        "DATABASE_URL": f"sqlite:///{os.path.join(work_dir, 'sessions.db')}",
+        "EXPORT_PRERENDER_FORMATS": "[]",
+        "MMAP_INTERMEDIATES": "False"
+    })
+    for name in ("UPLOAD_DIR", "RESULTS_DIR"):
+        os.makedirs(os.environ[name], exist_ok=True)
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * q / 100) - 1)] if ordered else 0.0
+
+def bench_stages(cases: List[Tuple[str, str]], corpus_dir: str, repeats: int) -> Dict[str, Dict[str, float]]:
+    """Per-stage latency and peak allocation of in-process analyses"""
+    from app.services.analysis_pipeline import run_analysis
+
+    results = {}
+    for resolution, density in cases:
+        front_path, side_path = tree_pair(corpus_dir, resolution, density)
+        metadata = {"front_image": front_path, "side_image": side_path}
+        run = lambda: run_analysis(f"bench-{resolution}-{density}", metadata)
+
+        run()  # Warm up imports and caches
+        runs = [run() for _ in range(repeats)]
+
+        tracemalloc.start()
+        result = run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        case = {
+            f"stage_{stage}_ms": statistics.median(r["stage_timings"].get(stage, 0.0) for r in runs) * 1000
+            for stage in runs[0]["stage_timings"]
+        }
+        case["total_ms"] = statistics.median(r["processing_time"] for r in runs) * 1000
+        case["peak_mib"] = peak / 2**20
+        case["leaf_count"] = result["leaf_analysis"]["estimated_leaf_count"]
+        results[f"stages/{resolution}/{density}"] = case
+    return results
+
+def bench_routes(case: Tuple[str, str], corpus_dir: str, repeats: int, sessions: int) -> Dict[str, Dict[str, float]]:
+    """End-to-end /process and /export through the API, with real worker processes"""
+    from fastapi.testclient import TestClient
+    from main import app, job_engine
+
+    client = TestClient(app)
+    front_path, side_path = tree_pair(corpus_dir, *case)
+
+    def upload() -> str:
+        with open(front_path, "rb") as front, open(side_path, "rb") as side:
+            response = client.post("/api/upload", files={
+                "front_image": ("front.jpg", front, "image/jpeg"),
+                "side_image": ("side.jpg", side, "image/jpeg")
+            })
+        response.raise_for_status()
+        return response.json()["session_id"]
+
+    def wait(job_id: str) -> None:
+        while True:
+            status = client.get(f"/api/jobs/{job_id}").json()
+            if status["status"] == "completed":
+                return
+            if status["status"] == "failed":
+                raise RuntimeError(status.get("message"))
+            time.sleep(0.005)
+
+    def process(session_id: str) -> str:
+        response = client.post(f"/api/process/{session_id}")
+        response.raise_for_status()
+        return response.json()["job_id"]
+
+    job_engine.warm_up()
+    wait(process(upload()))  # Prime the workers' caches
+
+    latencies = []
+    session_ids = []
+    for _ in range(repeats):
+        session_id = upload()
+        start = time.perf_counter()
+        wait(process(session_id))
+        latencies.append(time.perf_counter() - start)
+        session_ids.append(session_id)
+
+    # Throughput: queue a burst of sessions at once and wait for all of them
+    burst = [upload() for _ in range(sessions)]
+    start = time.perf_counter()
+    for job_id in [process(session_id) for session_id in burst]:
+        wait(job_id)
+    elapsed = time.perf_counter() - start
+
+    results = {
+        "routes/process": {
+            "latency_ms": statistics.median(latencies) * 1000,
+            "latency_p95_ms": percentile(latencies, 95) * 1000,
+            "sessions_per_second": sessions / elapsed
+        }
+    }
+
+    # Every session renders each format once, so each export is a cold render
+    for export_format in EXPORT_FORMATS:
+        export_latencies = []
+        for session_id in session_ids:
+            start = time.perf_counter()
+            client.post(f"/api/export/{session_id}", data={"format": export_format}).raise_for_status()
+            export_latencies.append(time.perf_counter() - start)
+        results[f"routes/export/{export_format}"] = {"latency_ms": statistics.median(export_latencies) * 1000}
+
+    return results
+
+def environment() -> Dict[str, Any]:
+    """Machine and library versions the results were measured with"""
+    import cv2
+    import numpy
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "opencv": cv2.__version__
+    }
+
+def is_regression(metric: str, baseline: float, current: float, threshold: float, min_delta_ms: float) -> bool:
+    """Whether current is worse than baseline by more than the threshold"""
+    if metric.endswith("_per_second"):
+        return current < baseline / (1 + threshold)
+    if metric.endswith("_ms"):
+        return current - baseline > max(baseline * threshold, min_delta_ms)
+    if metric.endswith("_mib"):
+        return current > baseline * (1 + threshold)
+    return False  # Counts such as leaf_count are informational
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float,
+    min_delta_ms: float
+) -> List[Tuple[str, str, float, float]]:
+    """(case, metric, baseline, current) of every regressed metric measured in both runs"""
+    regressions = []
+    for case, metrics in current["cases"].items():
+        for metric, value in metrics.items():
+            reference = baseline["cases"].get(case, {}).get(metric)
+            if reference is not None and is_regression(metric, reference, value, threshold, min_delta_ms):
+                regressions.append((case, metric, reference, value))
+    return regressions
+
+def report(results: Dict[str, Any], baseline: Dict[str, Any] = None) -> None:
+    """Print every metric, with its change from the baseline when there is one"""
+    for case, metrics in results["cases"].items():
+        print(case)
+        for metric, value in metrics.items():
+            line = f"  {metric:32s} {value:12.2f}"
+            reference = (baseline or {}).get("cases", {}).get(case, {}).get(metric)
+            if reference:
+                line += f"  ({(value - reference) / reference:+.1%} vs baseline)"
+            print(line)
+
+def run_suite(profile: str, corpus_dir: str) -> Dict[str, Any]:
+    """Run every benchmark of a profile and return the results document"""
+    cases, repeats, sessions = PROFILES[profile]
+    started = time.perf_counter()
+
+    results = {}
+    results.update(bench_stages(cases, corpus_dir, repeats))
+    results.update(bench_routes(cases[-1], corpus_dir, repeats, sessions))
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "profile": profile,
+        "corpus_version": CORPUS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "duration_seconds": time.perf_counter() - started,
+        "peak_rss_mib": peak_rss / 2**20 if sys.platform == "darwin" else peak_rss / 2**10,
+        "environment": environment(),
+        "cases": results
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "tree-calculator-corpus"))
+    parser.add_argument("--output", help="Write the results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Ignore smaller latency changes")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        configure_environment(work_dir)
+        results = run_suite(args.profile, args.corpus_dir)
+
+        from main import job_engine
+        job_engine.shutdown()
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("profile") != args.profile or baseline.get("corpus_version") != CORPUS_VERSION:
+            print("Baseline is for another profile or corpus, not comparing", file=sys.stderr)
+            baseline = None
+
+    report(results, baseline)
+
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if baseline is None:
+        return 0
+
+    regressions = compare(baseline, results, args.threshold, args.min_delta_ms)
+    for case, metric, reference, value in regressions:
+        print(f"REGRESSION {case} {metric}: {reference:.2f} -> {value:.2f}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
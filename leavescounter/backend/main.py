@@ -1,10 +1,14 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 import os
-from app.api.routes import router as api_router
+from app.api.routes import (
+    router as api_router, job_engine, result_cache, session_store, export_cache, report_generator
+)
 from app.core.config import settings
+from app.core.metrics import metrics
 
 # Create FastAPI instance
 app = FastAPI(
@@ -13,7 +17,21 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Configure CORS
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject oversized uploads before their body is read"""
+    if request.url.path == "/api/upload":
+        content_length = request.headers.get("content-length")
+        # Two images plus a little room for the multipart framing and form fields
+        max_request_size = 2 * settings.MAX_FILE_SIZE + 64 * 1024
+        if content_length and content_length.isdigit() and int(content_length) > max_request_size:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Upload exceeds the maximum size of {max_request_size} bytes"}
+            )
+    return await call_next(request)
+
+# Configure CORS (added last so it also wraps responses from the middleware above)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -34,10 +52,43 @@ app.include_router(api_router, prefix="/api")
 async def root():
     return {"message": "Tree Calculator API", "version": "1.0.0"}
 
+@app.on_event("startup")
+async def warm_up():
+    """
+    With WARM_UP_ON_STARTUP, load the export libraries and start the analysis
+    workers before serving, so the first requests don't pay for them
+    """
+    if settings.WARM_UP_ON_STARTUP:
+        await run_in_threadpool(report_generator.warm_up)
+        await run_in_threadpool(job_engine.warm_up)
+
+@app.on_event("shutdown")
+async def shutdown_job_engine():
+    job_engine.shutdown()
+    export_cache.shutdown()
+    session_store.close()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Pipeline stage latencies and job counters in the Prometheus text format"""
+    cache_stats = result_cache.stats()
+    cache_lines = [
+        "# TYPE tree_result_cache_hits_total counter",
+        f"tree_result_cache_hits_total {cache_stats['hits']}",
+        "# TYPE tree_result_cache_misses_total counter",
+        f"tree_result_cache_misses_total {cache_stats['misses']}",
+        "# TYPE tree_result_cache_size_bytes gauge",
+        f"tree_result_cache_size_bytes {cache_stats['size_bytes']}"
+    ]
+    return PlainTextResponse(
+        metrics.render_prometheus() + "\n".join(cache_lines) + "\n",
+        media_type="text/plain; version=0.0.4"
+    )
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
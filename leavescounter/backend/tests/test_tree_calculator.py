@@ -10,8 +10,32 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.services.image_processor import ImageProcessor
 from app.services.tree_analyzer import TreeAnalyzer
+from app.services.job_engine import JobEngine
+from app.core.config import settings
 from app.models.schemas import TreeDimensions, LeafAnalysis, FoliageData
 
+def create_tree_image(path, size=(600, 480), seed=0):
+    """Write a synthetic tree photo: a textured green crown on a brown trunk over sky"""
+    import numpy as np
+    import cv2
+    
+    rng = np.random.default_rng(seed)
+    h, w = size
+    image = np.full((h, w, 3), (235, 206, 135), dtype=np.uint8)  # Sky (BGR)
+    cv2.rectangle(image, (w // 2 - 15, h // 2), (w // 2 + 15, h - 20), (30, 60, 100), -1)
+    cv2.ellipse(image, (w // 2, h // 2 - 20), (w // 3, h // 3), 0, 0, 360, (40, 140, 40), -1)
+    
+    # Scatter small leaf-shaped blobs so edge and contour analysis has work to do
+    for _ in range(300):
+        cx = int(w // 2 + rng.normal(0, w / 8))
+        cy = int(h // 2 - 20 + rng.normal(0, h / 8))
+        axes = (int(rng.integers(3, 8)), int(rng.integers(2, 5)))
+        shade = (int(rng.integers(10, 60)), int(rng.integers(90, 200)), int(rng.integers(10, 60)))
+        cv2.ellipse(image, (cx, cy), axes, float(rng.integers(0, 180)), 0, 360, shade, -1)
+    
+    cv2.imwrite(path, image)
+    return path
+
 class TestImageProcessor(unittest.TestCase):
     def setUp(self):
         self.processor = ImageProcessor()
@@ -34,6 +58,17 @@ class TestImageProcessor(unittest.TestCase):
         self.assertLessEqual(max(resized.shape[:2]), max(self.processor.max_size))
         self.assertGreaterEqual(min(resized.shape[:2]), min(self.processor.min_size))
     
+    def test_decode_reduction(self):
+        """Test that decoding is reduced only while the image stays above the target size"""
+        large_path = create_tree_image(os.path.join(self.test_dir, "large.jpg"), size=(3000, 4100))
+        small_path = create_tree_image(os.path.join(self.test_dir, "small.jpg"), size=(600, 800))
+        
+        self.assertEqual(self.processor._decode_reduction(large_path), 4)
+        self.assertEqual(self.processor._decode_reduction(small_path), 1)
+        
+        processed = self.processor.preprocess_image(large_path)
+        self.assertEqual(max(processed.shape[:2]), max(self.processor.max_size))
+    
     def test_normalize_image(self):
         """Test image normalization"""
         import numpy as np
@@ -51,6 +86,101 @@ class TestImageProcessor(unittest.TestCase):
         self.assertGreaterEqual(normalized.min(), 0)
         self.assertLessEqual(normalized.max(), 255)
 
+    def test_segment_records_tree_mask(self):
+        """Test that segmentation stores its mask on the analysis context"""
+        import numpy as np
+        from app.services.analysis_context import AnalysisContext
+        
+        test_image = np.full((300, 300, 3), (135, 206, 235), dtype=np.uint8)  # Sky (RGB)
+        test_image[50:250, 100:200] = (40, 140, 40)  # Green tree
+        
+        context = self.processor.segment(AnalysisContext(test_image))
+        
+        self.assertEqual(context.tree_mask.shape, (300, 300))
+        self.assertEqual(context.tree_mask[150, 150], 255)
+        self.assertEqual(context.tree_mask[10, 10], 0)
+        self.assertTrue((context.segmented[10, 10] == 0).all())
+        self.assertIs(context.hsv, context.hsv)  # Memoized
+
+    def test_segment_mask_only(self):
+        """Test that mask-only segmentation defers the masked copy until it is used"""
+        import numpy as np
+        import cv2
+        from app.services.analysis_context import AnalysisContext
+        
+        test_image = np.full((300, 300, 3), (135, 206, 235), dtype=np.uint8)
+        test_image[50:250, 100:200] = (40, 140, 40)
+        
+        mask, bounds = self.processor.segment_tree(test_image, return_mask=True)
+        self.assertEqual(bounds, (100, 50, 100, 200))
+        rows, columns = np.nonzero(mask)
+        self.assertEqual((columns.min(), rows.min(), columns.max(), rows.max()), (100, 50, 199, 249))
+        
+        context = self.processor.segment(AnalysisContext(test_image), masked_copy=False)
+        self.assertFalse(context.has("segmented"))
+        np.testing.assert_array_equal(context.segmented, self.processor.segment_tree(test_image))
+        np.testing.assert_array_equal(context.segmented, cv2.bitwise_and(test_image, test_image, mask=mask))
+        
+        sky = np.full((100, 100, 3), (135, 206, 235), dtype=np.uint8)
+        self.assertEqual(self.processor.segment_tree(sky, return_mask=True), (None, None))
+        self.assertIs(self.processor.segment_tree(sky), sky)
+
+    def test_segment_with_model(self):
+        """Test that a configured segmentation model's mask replaces the color mask"""
+        import numpy as np
+        from app.services.analysis_context import AnalysisContext
+        from app.services.segmentation_model import DynamicBatcher
+        
+        def predict(images):
+            masks = []
+            for image in images:
+                mask = np.zeros(image.shape[:2], dtype=np.uint8)
+                mask[20:120, 30:90] = 255
+                masks.append(mask)
+            return masks
+        
+        self.processor.segmentation_model = DynamicBatcher(predict, max_batch_size=2, max_wait=0.0)
+        sky = np.full((200, 200, 3), (135, 206, 235), dtype=np.uint8)  # No green for the color mask
+        
+        context = self.processor.segment(AnalysisContext(sky))
+        
+        self.assertEqual(context.tree_bounds, (30, 20, 60, 100))
+        self.assertFalse(context.has("hsv"))
+    
+    def test_segmentation_model_inference_failure(self):
+        """Test that a view whose model inference fails is segmented by color"""
+        import numpy as np
+        from app.services.analysis_context import AnalysisContext
+        from app.services.segmentation_model import DynamicBatcher
+        
+        def predict(images):
+            raise RuntimeError("inference failed")
+        
+        image = np.zeros((200, 200, 3), dtype=np.uint8)
+        image[20:120, 30:90] = (34, 139, 34)  # Forest green
+        expected = self.processor.segment(AnalysisContext(image.copy()))
+        
+        self.processor.segmentation_model = DynamicBatcher(predict, max_batch_size=2, max_wait=0.0)
+        with self.assertLogs("app.services.image_processor", level="ERROR"):
+            context = self.processor.segment(AnalysisContext(image.copy()))
+        
+        self.assertEqual(context.tree_bounds, expected.tree_bounds)
+        np.testing.assert_array_equal(context.tree_mask, expected.tree_mask)
+    
+    def test_segmentation_model_fallback(self):
+        """Test that color segmentation is used when the model cannot be loaded"""
+        from app.services.segmentation_model import load_segmentation_model
+        
+        missing_model = os.path.join(self.test_dir, "missing.pth")
+        with patch.object(settings, "SEGMENTATION_BACKEND", "model"), \
+                patch.object(settings, "SEGMENTATION_MODEL_PATH", missing_model):
+            self.assertIsNone(load_segmentation_model())
+            self.assertIsNone(ImageProcessor().segmentation_model)
+        
+        with patch.object(settings, "SEGMENTATION_BACKEND", "unet"):
+            with self.assertRaises(ValueError):
+                load_segmentation_model()
+
 class TestTreeAnalyzer(unittest.TestCase):
     def setUp(self):
         self.analyzer = TreeAnalyzer()
@@ -104,6 +234,1389 @@ class TestTreeAnalyzer(unittest.TestCase):
         self.assertGreaterEqual(dimensions.confidence, 0)
         self.assertLessEqual(dimensions.confidence, 1)
 
+class TestContourFeatures(unittest.TestCase):
+    def test_features_match_opencv(self):
+        """Test that vectorized area and perimeter match OpenCV per-contour results"""
+        import numpy as np
+        import cv2
+        from app.services.contour_features import ContourFeatures
+        
+        mask = np.zeros((200, 200), dtype=np.uint8)
+        cv2.rectangle(mask, (10, 10), (60, 30), 255, -1)
+        cv2.ellipse(mask, (130, 100), (40, 10), 30, 0, 360, 255, -1)
+        cv2.circle(mask, (60, 150), 25, 255, -1)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        features = ContourFeatures(contours)
+        
+        np.testing.assert_allclose(features.area, [cv2.contourArea(c) for c in contours])
+        np.testing.assert_allclose(features.perimeter, [cv2.arcLength(c, True) for c in contours])
+        
+        # The rectangle is 51x21 pixels, the ellipse about 4:1 and the circle round
+        by_area = np.argsort(features.area)
+        self.assertAlmostEqual(features.aspect_ratio[by_area[0]], 51 / 21, delta=0.2)
+        self.assertAlmostEqual(features.aspect_ratio[by_area[1]], 4.0, delta=0.4)
+        self.assertAlmostEqual(features.aspect_ratio[by_area[2]], 1.0, delta=0.1)
+        self.assertTrue((features.solidity > 0.9).all())
+    
+    def test_select_and_concatenate(self):
+        """Test filtering and combining feature tables"""
+        import numpy as np
+        from app.services.contour_features import ContourFeatures
+        
+        square = np.array([[[0, 0]], [[10, 0]], [[10, 10]], [[0, 10]]], dtype=np.int32)
+        features = ContourFeatures([square, square * 2])
+        
+        selected = features.select(features.area > 200)
+        combined = ContourFeatures.concatenate([features, selected, ContourFeatures([])])
+        
+        self.assertEqual(len(selected), 1)
+        self.assertEqual(selected.area.tolist(), [400.0])
+        self.assertEqual(combined.area.tolist(), [100.0, 400.0, 400.0])
+
+class TestMaskStatistics(unittest.TestCase):
+    def test_statistics_match_numpy(self):
+        """Test that bounds, area and profiles match direct NumPy computations"""
+        import numpy as np
+        import cv2
+        from app.services.mask_statistics import MaskStatistics
+        
+        mask = np.zeros((120, 160), dtype=np.uint8)
+        cv2.ellipse(mask, (70, 60), (40, 25), 20, 0, 360, 255, -1)
+        cv2.rectangle(mask, (120, 90), (130, 110), 255, -1)
+        rows, columns = np.where(mask > 0)
+        
+        statistics = MaskStatistics(mask)
+        
+        self.assertEqual(statistics.area, len(rows))
+        self.assertEqual(statistics.boundaries(), {
+            'height': rows.max() - rows.min(), 'width': columns.max() - columns.min(),
+            'top': rows.min(), 'bottom': rows.max(), 'left': columns.min(), 'right': columns.max()
+        })
+        np.testing.assert_array_equal(statistics.row_profile, (mask > 0).sum(axis=1))
+        np.testing.assert_array_equal(statistics.column_profile, (mask > 0).sum(axis=0))
+    
+    def test_empty_mask(self):
+        """Test that an empty mask has zero extents, area and profiles"""
+        import numpy as np
+        from app.services.mask_statistics import MaskStatistics
+        
+        statistics = MaskStatistics(np.zeros((20, 30), dtype=np.uint8))
+        
+        self.assertEqual(statistics.area, 0)
+        self.assertEqual(set(statistics.boundaries().values()), {0})
+        self.assertEqual(statistics.row_profile.tolist(), [0] * 20)
+        self.assertEqual(statistics.column_profile.tolist(), [0] * 30)
+
+class TestDynamicBatcher(unittest.TestCase):
+    def test_concurrent_items_batched(self):
+        """Test that items submitted together run as one batch and get their own results"""
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from app.services.segmentation_model import DynamicBatcher
+        
+        batches = []
+        started = threading.Event()
+        release = threading.Event()
+        
+        def process(items):
+            started.set()
+            self.assertTrue(release.wait(timeout=5))
+            batches.append(list(items))
+            return [item * 10 for item in items]
+        
+        batcher = DynamicBatcher(process, max_batch_size=3, max_wait=0.2)
+        first = batcher.submit(0)
+        self.assertTrue(started.wait(timeout=5))  # The first batch is held while the others queue up
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(batcher, item) for item in range(1, 5)]
+            deadline = time.monotonic() + 5
+            while batcher._queue.qsize() < 4 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            release.set()
+            results = [future.result(timeout=5) for future in futures]
+        
+        self.assertEqual(first.result(timeout=5), 0)
+        self.assertEqual(results, [10, 20, 30, 40])
+        self.assertEqual([len(batch) for batch in batches], [1, 3, 1])
+    
+    def test_errors_reach_every_caller(self):
+        """Test that a failed batch fails each of its items"""
+        from app.services.segmentation_model import DynamicBatcher
+        
+        def process(items):
+            raise RuntimeError("inference failed")
+        
+        batcher = DynamicBatcher(process, max_batch_size=2, max_wait=0.0)
+        
+        with self.assertRaises(RuntimeError):
+            batcher(1)
+        with self.assertRaises(RuntimeError):
+            batcher(2)
+    
+    def test_missing_results_fail_their_items(self):
+        """Test that items left without a result by the batch function fail instead of hanging"""
+        from app.services.segmentation_model import DynamicBatcher
+        
+        batcher = DynamicBatcher(lambda items: [item * 10 for item in items[:1]], max_batch_size=2, max_wait=1.0)
+        first, second = batcher.submit(1), batcher.submit(2)
+        
+        self.assertEqual(first.result(timeout=5), 10)
+        with self.assertRaises(RuntimeError):
+            second.result(timeout=5)
+
+class TestEdgeExtractor(unittest.TestCase):
+    def setUp(self):
+        import numpy as np
+        import cv2
+        
+        self.temp_dir = tempfile.mkdtemp()
+        image_path = create_tree_image(os.path.join(self.temp_dir, "tree.jpg"))
+        self.gray = cv2.cvtColor(cv2.imread(image_path), cv2.COLOR_BGR2GRAY)
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def test_bilateral_matches_separate_canny_passes(self):
+        """Test that shared gradients reproduce the OR of two full Canny passes"""
+        import numpy as np
+        import cv2
+        from app.services.edge_extractor import EdgeExtractor
+        
+        filtered = cv2.bilateralFilter(self.gray, 9, 75, 75)
+        expected = cv2.bitwise_or(cv2.Canny(filtered, 30, 80), cv2.Canny(filtered, 50, 120))
+        
+        np.testing.assert_array_equal(EdgeExtractor(smoothing="bilateral").extract(self.gray), expected)
+    
+    def test_dominated_thresholds_skipped(self):
+        """Test that only threshold pairs not implied by a looser pair are applied"""
+        from app.services.edge_extractor import EdgeExtractor
+        
+        extractor = EdgeExtractor(thresholds=[(50, 120), (30, 80), (20, 150), (30, 80)])
+        
+        self.assertEqual(extractor.thresholds, ((20, 150), (30, 80)))
+    
+    def test_smoothing_methods(self):
+        """Test that every smoothing method yields a binary edge map of the image size"""
+        import numpy as np
+        from app.services.edge_extractor import EdgeExtractor
+        
+        for method in EdgeExtractor.SMOOTHING_METHODS:
+            edges = EdgeExtractor(smoothing=method).extract(self.gray)
+            self.assertEqual(edges.shape, self.gray.shape)
+            self.assertEqual(set(np.unique(edges)) - {0, 255}, set())
+            self.assertGreater(np.count_nonzero(edges), 0)
+        
+        with self.assertRaises(ValueError):
+            EdgeExtractor(smoothing="gaussian")
+
+class TestDominantColorExtractor(unittest.TestCase):
+    def test_colors_ordered_by_population(self):
+        """Test that the most common color comes first and results are stable"""
+        import numpy as np
+        from app.services.color_quantizer import DominantColorExtractor
+        
+        pixels = np.concatenate([
+            np.tile([[200, 30, 30]], (100, 1)),
+            np.tile([[30, 160, 30]], (5000, 1)),
+            np.tile([[30, 30, 200]], (1000, 1)),
+        ]).astype(np.uint8)
+        
+        extractor = DominantColorExtractor(max_samples=2000)
+        colors = extractor.extract(pixels)
+        
+        self.assertEqual(colors, ["#1ea01e", "#1e1ec8", "#c81e1e"])
+        self.assertEqual(colors, extractor.extract(pixels))
+    
+    def test_empty_pixels(self):
+        """Test that no colors are returned for an empty region"""
+        import numpy as np
+        from app.services.color_quantizer import DominantColorExtractor
+        
+        self.assertEqual(DominantColorExtractor().extract(np.empty((0, 3), dtype=np.uint8)), [])
+
+class TestJobEngine(unittest.TestCase):
+    def setUp(self):
+        from concurrent.futures import ThreadPoolExecutor
+        
+        self.test_dir = tempfile.mkdtemp()
+        self.results_patch = patch.object(settings, "RESULTS_DIR", self.test_dir)
+        self.results_patch.start()
+        self.engine = JobEngine(executor=ThreadPoolExecutor(max_workers=1))
+    
+    def tearDown(self):
+        self.engine.shutdown()
+        self.results_patch.stop()
+        shutil.rmtree(self.test_dir)
+    
+    def test_submit_and_complete(self):
+        """Test that a queued job runs the pipeline and reports completion"""
+        metadata = {
+            "front_image": create_tree_image(os.path.join(self.test_dir, "front.jpg")),
+            "side_image": create_tree_image(os.path.join(self.test_dir, "side.jpg"), seed=1),
+        }
+        
+        job_id = self.engine.submit("session-1", metadata)
+        result = self.engine.get_job(job_id).future.result(timeout=60)
+        
+        status = self.engine.get_status(job_id)
+        self.assertEqual(status.status, "completed")
+        self.assertEqual(status.job_id, job_id)
+        self.assertEqual(result["session_id"], "session-1")
+        self.assertGreater(result["processing_time"], 0)
+        self.assertIn("segmentation", result["stage_timings"])
+        self.assertIn("edges", result["stage_timings"])
+        self.assertTrue(os.path.exists(
+            os.path.join(self.test_dir, "session-1", "analysis_result.json")
+        ))
+    
+    def test_failed_job(self):
+        """Test that pipeline errors are reported as a failed status"""
+        metadata = {"front_image": "missing.jpg", "side_image": "missing.jpg"}
+        
+        job_id = self.engine.submit("session-2", metadata)
+        with self.assertRaises(ValueError):
+            self.engine.get_job(job_id).future.result(timeout=60)
+        
+        status = self.engine.get_status(job_id)
+        self.assertEqual(status.status, "failed")
+        self.assertIn("Could not load image", status.message)
+    
+    def test_broken_pool_replaced(self):
+        """Test that a pool broken by a dead worker is replaced instead of failing every later job"""
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        
+        broken = ProcessPoolExecutor(max_workers=1)
+        with self.assertRaises(BrokenProcessPool):
+            broken.submit(os._exit, 1).result(timeout=60)
+        
+        engine = JobEngine(executor=broken)
+        metadata = {
+            "front_image": create_tree_image(os.path.join(self.test_dir, "front.jpg")),
+            "side_image": create_tree_image(os.path.join(self.test_dir, "side.jpg"), seed=1),
+        }
+        with patch.object(engine, "_create_executor", lambda: ThreadPoolExecutor(max_workers=1)):
+            job_id = engine.submit("session-3", metadata)
+        
+        try:
+            self.assertEqual(engine.get_job(job_id).future.result(timeout=60)["session_id"], "session-3")
+            self.assertEqual(engine.get_status(job_id).status, "completed")
+        finally:
+            engine.shutdown()
+    
+    def test_failed_submit_not_left_queued(self):
+        """Test that a job the pool refuses is recorded as failed, not queued"""
+        from concurrent.futures import ThreadPoolExecutor
+        from app.services.analysis_pipeline import read_status
+        
+        executor = ThreadPoolExecutor(max_workers=1)
+        executor.shutdown()
+        engine = JobEngine(executor=executor)
+        
+        with self.assertRaises(RuntimeError):
+            engine.submit("session-4", {"front_image": "missing.jpg", "side_image": "missing.jpg"})
+        self.assertEqual(read_status("session-4").status, "failed")
+    
+    def test_unknown_job(self):
+        """Test that unknown job ids have no status"""
+        self.assertIsNone(self.engine.get_status("does-not-exist"))
+
+    def test_warm_up_builds_services(self):
+        """Test that warming up loads the analysis services in the workers"""
+        from app.services import analysis_pipeline
+
+        with patch.object(analysis_pipeline, "_image_processor", None), \
+             patch.object(analysis_pipeline, "_tree_analyzer", None):
+            self.engine.warm_up()
+            self.assertIsNotNone(analysis_pipeline._image_processor)
+            self.assertIsNotNone(analysis_pipeline._tree_analyzer)
+
+class TestStartup(unittest.TestCase):
+    def test_heavy_libraries_load_on_first_use(self):
+        """Test that importing the API loads no analysis, PDF or plotting library"""
+        from benchmarks.bench_startup import run_sample
+
+        sample = run_sample(warm_up=True)
+        self.assertEqual(sample["loaded"], [])
+        self.assertIn("warm_up_seconds", sample)
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def test_corpus_is_reproducible(self):
+        """Test that corpus images are generated identically from their seeds"""
+        import numpy as np
+        from benchmarks.corpus import tree_image
+        
+        np.testing.assert_array_equal(tree_image(320, 240, 100), tree_image(320, 240, 100))
+        self.assertFalse(np.array_equal(tree_image(320, 240, 100), tree_image(320, 240, 100, seed=1)))
+    
+    def test_regressions_against_baseline(self):
+        """Test that only metrics worse than the baseline beyond the threshold regress"""
+        from benchmarks.suite import compare
+        
+        baseline = {"cases": {
+            "stages/small/sparse": {"total_ms": 100.0, "stage_edges_ms": 1.0, "peak_mib": 10.0, "leaf_count": 50},
+            "routes/process": {"sessions_per_second": 4.0}
+        }}
+        current = {"cases": {
+            "stages/small/sparse": {"total_ms": 130.0, "stage_edges_ms": 2.0, "peak_mib": 12.0, "leaf_count": 10},
+            "routes/process": {"sessions_per_second": 3.0},
+            "routes/export/pdf": {"latency_ms": 50.0}
+        }}
+        
+        regressions = compare(baseline, current, threshold=0.25, min_delta_ms=2.0)
+        self.assertEqual(
+            [(case, metric) for case, metric, _, _ in regressions],
+            [("stages/small/sparse", "total_ms"), ("routes/process", "sessions_per_second")]
+        )
+
+class TestConcurrency(unittest.TestCase):
+    def test_map_views_preserves_order(self):
+        """Test that per-view results come back in input order with and without threads"""
+        from app.core.concurrency import map_views
+        
+        for parallel in (True, False):
+            with patch.object(settings, "PARALLEL_VIEWS", parallel):
+                self.assertEqual(map_views(lambda x: x * 2, [1, 2]), [2, 4])
+
+class TestMetrics(unittest.TestCase):
+    def test_stage_timer_sums_nested_and_threaded_stages(self):
+        """Test that timed() records into the active timer, including from view threads"""
+        from app.core.concurrency import map_views
+        from app.core.metrics import StageTimer, timed
+        
+        def work(_):
+            with timed("view_stage"):
+                pass
+        
+        with timed("ignored"):
+            pass  # No active timer, nothing recorded
+        
+        timer = StageTimer()
+        with timer.activate():
+            with timed("outer"):
+                with patch.object(settings, "PARALLEL_VIEWS", True):
+                    map_views(work, [1, 2])
+        
+        self.assertEqual(set(timer.timings), {"outer", "view_stage"})
+        self.assertGreaterEqual(timer.timings["outer"], 0)
+    
+    def test_quantiles_and_prometheus_output(self):
+        """Test nearest-rank quantiles over the window and the exposition format"""
+        from app.core.metrics import MetricsRegistry
+        
+        registry = MetricsRegistry(window=100)
+        for value in range(1, 201):
+            registry.observe("edges", value / 100)
+        registry.increment("tree_analysis_jobs_total", "completed")
+        
+        summary = registry.summary()["edges"]
+        self.assertEqual(summary["count"], 200)
+        self.assertAlmostEqual(summary["sum"], 201.0)
+        # Only the last 100 samples (1.01 .. 2.00) count towards quantiles
+        self.assertAlmostEqual(summary["p50"], 1.50)
+        self.assertAlmostEqual(summary["p95"], 1.95)
+        self.assertAlmostEqual(summary["p99"], 1.99)
+        
+        text = registry.render_prometheus()
+        self.assertIn('tree_pipeline_stage_seconds{stage="edges",quantile="0.99"} 1.990000', text)
+        self.assertIn('tree_pipeline_stage_seconds_count{stage="edges"} 200', text)
+        self.assertIn('tree_analysis_jobs_total{status="completed"} 1', text)
+    
+    def test_metrics_endpoint_after_analysis(self):
+        """Test that /metrics serves the stage timings of a finished analysis in the Prometheus format"""
+        from concurrent.futures import ThreadPoolExecutor
+        from fastapi.testclient import TestClient
+        import main
+        from app.core.metrics import MetricsRegistry
+        from app.services import job_engine
+        
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir)
+        registry = MetricsRegistry()
+        engine = JobEngine(executor=ThreadPoolExecutor(max_workers=1))
+        self.addCleanup(engine.shutdown)
+        metadata = {
+            "front_image": create_tree_image(os.path.join(test_dir, "front.jpg")),
+            "side_image": create_tree_image(os.path.join(test_dir, "side.jpg"), seed=1),
+        }
+        
+        with patch.object(settings, "RESULTS_DIR", test_dir), \
+             patch.object(job_engine, "metrics", registry), \
+             patch.object(main, "metrics", registry):
+            engine.get_job(engine.submit("session-1", metadata)).future.result(timeout=60)
+            response = TestClient(main.app).get("/metrics")
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        text = response.text
+        self.assertIn("# TYPE tree_pipeline_stage_seconds summary", text)
+        for stage in ("segmentation", "edges", "total"):
+            self.assertIn(f'tree_pipeline_stage_seconds_count{{stage="{stage}"}} 1', text)
+            self.assertIn(f'tree_pipeline_stage_seconds{{stage="{stage}",quantile="0.5"}}', text)
+        self.assertIn('tree_analysis_jobs_total{status="completed"} 1', text)
+        self.assertIn("tree_result_cache_hits_total", text)
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        from app.services.result_cache import ResultCache
+        
+        self.test_dir = tempfile.mkdtemp()
+        self.cache = ResultCache(cache_dir=self.test_dir, max_bytes=1024)
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+    
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted and stored results are returned"""
+        key = self.cache.make_key("front", "side", {"camera_height": 1.5})
+        
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, {"session_id": "a"})
+        self.assertEqual(self.cache.get(key), {"session_id": "a"})
+        
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+    
+    def test_key_depends_on_parameters(self):
+        """Test that different camera parameters produce different keys"""
+        key1 = self.cache.make_key("front", "side", {"camera_height": 1.5})
+        key2 = self.cache.make_key("front", "side", {"camera_height": 1.6})
+        self.assertNotEqual(key1, key2)
+    
+    def test_integer_camera_parameters_share_key(self):
+        """Test that a manifest's 10 and a form's 10.0 address the same cached result"""
+        from app.services.analysis_pipeline import get_pipeline_parameters
+        
+        manifest = get_pipeline_parameters({"camera_height": 2, "distance_from_tree": 10})
+        form = get_pipeline_parameters({"camera_height": 2.0, "distance_from_tree": 10.0})
+        self.assertEqual(self.cache.make_key("front", "side", manifest), self.cache.make_key("front", "side", form))
+        self.assertIsNone(get_pipeline_parameters({})["camera_height"])
+    
+    def test_concurrent_puts_of_one_key(self):
+        """Test that concurrent writers of one entry do not race on a shared temporary file"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        key = "e" * 64
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda index: self.cache.put(key, {"index": index}), range(32)))
+        
+        self.assertIn(self.cache.get(key)["index"], range(32))
+        self.assertEqual(os.listdir(os.path.join(self.test_dir, key[:2])), [f"{key}.json"])
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full"""
+        payload = {"data": "x" * 400}
+        self.cache.put("a" * 64, payload)
+        self.cache.put("b" * 64, payload)
+        self.cache.get("a" * 64)  # "b" is now least recently used
+        self.cache.put("c" * 64, payload)
+        
+        self.assertIsNotNone(self.cache.get("a" * 64))
+        self.assertIsNone(self.cache.get("b" * 64))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+    
+    def test_entry_evicted_during_hit(self):
+        """Test that a hit is returned when its entry is removed before the recency bump"""
+        key = "d" * 64
+        self.cache.put(key, {"session_id": "a"})
+        
+        with patch("app.services.result_cache.os.utime", side_effect=FileNotFoundError):
+            self.assertEqual(self.cache.get(key), {"session_id": "a"})
+
+class TestUploadRoutes(unittest.TestCase):
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        from main import app
+        
+        from app.api import routes
+        from app.services.session_store import SessionStore
+        
+        self.test_dir = tempfile.mkdtemp()
+        self.upload_patch = patch.object(settings, "UPLOAD_DIR", self.test_dir)
+        self.upload_patch.start()
+        self.store = SessionStore("sqlite:///:memory:", upload_dir=self.test_dir)
+        self.store_patch = patch.object(routes, "session_store", self.store)
+        self.store_patch.start()
+        self.client = TestClient(app)
+        self.image_path = create_tree_image(os.path.join(self.test_dir, "tree.jpg"))
+    
+    def tearDown(self):
+        self.store_patch.stop()
+        self.upload_patch.stop()
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+    
+    def _upload(self):
+        with open(self.image_path, "rb") as front, open(self.image_path, "rb") as side:
+            return self.client.post("/api/upload", files={
+                "front_image": ("front.jpg", front, "image/jpeg"),
+                "side_image": ("side.jpg", side, "image/jpeg"),
+            })
+    
+    def test_upload_streams_files_and_records_hashes(self):
+        """Test that uploaded files are written in chunks and hashed"""
+        import json
+        from app.services.result_cache import ResultCache
+        
+        with patch.object(settings, "UPLOAD_CHUNK_SIZE", 1024):
+            response = self._upload()
+        
+        self.assertEqual(response.status_code, 200)
+        session_dir = os.path.join(self.test_dir, response.json()["session_id"])
+        with open(os.path.join(session_dir, "metadata.json")) as f:
+            metadata = json.load(f)
+        
+        self.assertEqual(metadata["front_sha256"], ResultCache.hash_file(self.image_path))
+        self.assertEqual(os.path.getsize(metadata["front_image"]), os.path.getsize(self.image_path))
+    
+    def test_oversized_upload_rejected(self):
+        """Test that files over MAX_FILE_SIZE are rejected and not kept"""
+        with patch.object(settings, "MAX_FILE_SIZE", 1024), \
+             patch.object(settings, "UPLOAD_CHUNK_SIZE", 256):
+            response = self._upload()
+        
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(
+            [name for name in os.listdir(self.test_dir) if name != "tree.jpg"], []
+        )
+    
+    def test_process_and_poll_job(self):
+        """Test that /process queues an analysis that /jobs reports through to completion"""
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from app.api import routes
+        from app.services.result_store import ResultStore
+        
+        session_id = self._upload().json()["session_id"]
+        engine = JobEngine(executor=ThreadPoolExecutor(max_workers=1))
+        with patch.object(settings, "RESULTS_DIR", self.test_dir), \
+             patch.object(settings, "RESULT_CACHE_ENABLED", False), \
+             patch.object(routes, "job_engine", engine), \
+             patch.object(routes, "result_store", ResultStore()):
+            response = self.client.post(f"/api/process/{session_id}")
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["job_id"]
+            
+            engine.get_job(job_id).future.result(timeout=60)
+            deadline = time.monotonic() + 5
+            while self.store.get(session_id)["status"] != "completed" and time.monotonic() < deadline:
+                time.sleep(0.01)
+            status = self.client.get(f"/api/jobs/{job_id}").json()
+            results = self.client.get(f"/api/results/{session_id}")
+            
+            self.assertEqual(self.client.post("/api/process/missing").status_code, 404)
+            self.assertEqual(self.client.get("/api/jobs/missing").status_code, 404)
+        engine.shutdown()
+        
+        self.assertEqual((status["status"], status["job_id"], status["session_id"]), ("completed", job_id, session_id))
+        self.assertEqual(status["progress"], 1.0)
+        self.assertEqual(self.store.get(session_id)["status"], "completed")
+        self.assertEqual(results.status_code, 200)
+        self.assertEqual(results.json()["session_id"], session_id)
+    
+    def test_batch_streams_line_per_tree(self):
+        """Test that /batch streams one NDJSON line per tree: analyzed, failed and cached"""
+        import json
+        import zipfile
+        from concurrent.futures import ThreadPoolExecutor
+        from app.api import routes
+        from app.services.result_cache import ResultCache
+        from app.services.result_store import ResultStore
+        
+        cached_image = create_tree_image(os.path.join(self.test_dir, "cached.jpg"), seed=2)
+        archive_path = os.path.join(self.test_dir, "batch.zip")
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            archive.write(self.image_path, "valid.jpg")
+            archive.writestr("broken.jpg", b"not an image")
+            archive.write(cached_image, "cached.jpg")
+            archive.writestr("manifest.json", json.dumps([
+                {"tree_id": "valid", "front_image": "valid.jpg", "side_image": "valid.jpg"},
+                {"tree_id": "broken", "front_image": "broken.jpg", "side_image": "valid.jpg"},
+                # Integer camera parameters, cached below from a form's floats
+                {"tree_id": "cached", "front_image": "cached.jpg", "side_image": "cached.jpg",
+                 "camera_height": 2, "distance_from_tree": 10}
+            ]))
+        
+        result_cache = ResultCache(cache_dir=os.path.join(self.test_dir, "cache"))
+        cached_hash = ResultCache.hash_file(cached_image)
+        result_cache.put(routes.get_result_cache_key({
+            "front_sha256": cached_hash, "side_sha256": cached_hash,
+            "camera_height": 2.0, "distance_from_tree": 10.0
+        }), {"session_id": "earlier", "dimensions": {"unit": "meters"}})
+        
+        engine = JobEngine(executor=ThreadPoolExecutor(max_workers=2))
+        with patch.object(settings, "RESULTS_DIR", self.test_dir), \
+             patch.object(settings, "RESULT_CACHE_ENABLED", True), \
+             patch.object(routes, "result_cache", result_cache), \
+             patch.object(routes, "job_engine", engine), \
+             patch.object(routes, "result_store", ResultStore()):
+            with open(archive_path, "rb") as f:
+                response = self.client.post(
+                    "/api/batch", files={"archive": ("batch.zip", f, "application/zip")}
+                )
+        engine.shutdown()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = {line["tree_id"]: line for line in map(json.loads, response.text.splitlines())}
+        self.assertEqual(len(response.text.splitlines()), 3)
+        
+        self.assertEqual(lines["valid"]["status"], "completed")
+        self.assertNotIn("cached", lines["valid"])
+        self.assertEqual(lines["valid"]["result"]["session_id"], lines["valid"]["session_id"])
+        
+        self.assertEqual(lines["broken"]["status"], "failed")
+        self.assertIn("Processing failed", lines["broken"]["message"])
+        
+        self.assertEqual(lines["cached"]["status"], "completed")
+        self.assertTrue(lines["cached"]["cached"])
+        self.assertEqual(lines["cached"]["result"]["session_id"], lines["cached"]["session_id"])
+        self.assertEqual(lines["cached"]["result"]["dimensions"], {"unit": "meters"})
+    
+    def test_sessions_listed_from_index(self):
+        """Test that uploads are indexed and listed with pagination and status filters"""
+        session_ids = [self._upload().json()["session_id"] for _ in range(3)]
+        self.store.set_status(session_ids[0], "completed")
+        
+        page = self.client.get("/api/sessions", params={"limit": 2}).json()
+        self.assertEqual(page["total"], 3)
+        self.assertEqual(len(page["sessions"]), 2)
+        
+        oldest_first = self.client.get("/api/sessions", params={"order": "asc"}).json()
+        self.assertEqual([s["session_id"] for s in oldest_first["sessions"]], session_ids)
+        
+        completed = self.client.get("/api/sessions", params={"status": "completed"}).json()
+        self.assertEqual([s["session_id"] for s in completed["sessions"]], [session_ids[0]])
+        self.assertTrue(completed["sessions"][0]["has_results"])
+        
+        self.assertEqual(self.client.get("/api/sessions", params={"status": "bogus"}).status_code, 400)
+
+class TestResultRoutes(unittest.TestCase):
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        from main import app
+        from app.api import routes
+        from app.services.result_store import ResultStore
+        
+        self.test_dir = tempfile.mkdtemp()
+        self.results_patch = patch.object(settings, "RESULTS_DIR", self.test_dir)
+        self.results_patch.start()
+        self.store = ResultStore(max_entries=2)
+        self.store_patch = patch.object(routes, "result_store", self.store)
+        self.store_patch.start()
+        self.client = TestClient(app)
+    
+    def tearDown(self):
+        self.store_patch.stop()
+        self.results_patch.stop()
+        shutil.rmtree(self.test_dir)
+    
+    def test_partial_result_file(self):
+        """Test that a half-written result reads as missing and results are written atomically"""
+        from app.services.analysis_pipeline import save_result
+        
+        os.makedirs(os.path.join(self.test_dir, "s1"))
+        with open(os.path.join(self.test_dir, "s1", "analysis_result.json"), "w") as f:
+            f.write('{"session_id": "s1", "val')
+        self.assertEqual(self.client.get("/api/results/s1").status_code, 404)
+        
+        save_result("s1", {"session_id": "s1", "value": 1})
+        self.assertEqual(self.client.get("/api/results/s1").json()["value"], 1)
+        self.assertFalse([name for name in os.listdir(os.path.join(self.test_dir, "s1")) if name.endswith(".tmp")])
+    
+    def test_conditional_get(self):
+        """Test that results carry validators and repeat polls get 304 from memory"""
+        from app.services.analysis_pipeline import save_result
+        
+        self.assertEqual(self.client.get("/api/results/s1").status_code, 404)
+        
+        save_result("s1", {"session_id": "s1", "value": 1})
+        response = self.client.get("/api/results/s1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"session_id": "s1", "value": 1})
+        etag = response.headers["etag"]
+        
+        # Served from memory: the file is not read again
+        with patch("builtins.open", side_effect=AssertionError("disk read")):
+            not_modified = self.client.get("/api/results/s1", headers={"If-None-Match": etag})
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified.content, b"")
+            
+            by_date = self.client.get(
+                "/api/results/s1", headers={"If-Modified-Since": response.headers["last-modified"]}
+            )
+            self.assertEqual(by_date.status_code, 304)
+        
+        # Rewriting the result replaces the cached body and its ETag
+        self.store.put("s1", {"session_id": "s1", "value": 2})
+        changed = self.client.get("/api/results/s1", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["value"], 2)
+        self.assertNotEqual(changed.headers["etag"], etag)
+    
+    def test_lru_bound(self):
+        """Test that only the most recently used results stay in memory"""
+        from app.services.analysis_pipeline import save_result
+        
+        for session_id in ("a", "b", "c"):
+            save_result(session_id, {"session_id": session_id})
+            self.store.load(session_id)
+        
+        self.assertIsNone(self.store.get("a"))
+        self.assertIsNotNone(self.store.get("c"))
+
+    def _save_measured_result(self, front_image, side_image, leaf_analysis):
+        """Save a result of session s1 with its pixel measurements, and the session's metadata"""
+        import json
+        from app.services.analysis_pipeline import save_result
+        from app.models.schemas import TreeAnalysisResult
+
+        analyzer = TreeAnalyzer()
+        measurements = analyzer.measure_dimensions(front_image, side_image)
+        dimensions = analyzer.scale_dimensions(measurements)
+        result = TreeAnalysisResult(
+            session_id="s1",
+            dimensions=dimensions,
+            leaf_analysis=leaf_analysis,
+            foliage_data=analyzer.generate_foliage_data(dimensions, leaf_analysis),
+            measurements=measurements
+        ).dict()
+        result["created_at"] = result["created_at"].isoformat()
+        save_result("s1", result)
+
+        os.makedirs(os.path.join(self.test_dir, "s1"), exist_ok=True)
+        with open(os.path.join(self.test_dir, "s1", "metadata.json"), "w") as f:
+            json.dump({"session_id": "s1", "front_image": "missing.jpg", "side_image": "missing.jpg"}, f)
+        return result
+
+    def _tree_views(self):
+        import numpy as np
+
+        front_image = np.zeros((500, 400, 3), dtype=np.uint8)
+        front_image[50:450, 100:300] = 255
+        side_image = np.zeros((500, 300, 3), dtype=np.uint8)
+        side_image[50:450, 50:250] = 255
+        return front_image, side_image
+
+    def test_calibration_rescales_stored_measurements(self):
+        """Test that new camera parameters rescale dimensions and foliage without the images"""
+        import json
+        from app.services import analysis_pipeline
+
+        front_image, side_image = self._tree_views()
+        analyzer = TreeAnalyzer()
+        leaf_analysis = LeafAnalysis(
+            average_leaf_size=50.0, estimated_leaf_count=400, edge_density=0.1, dominant_colors=[]
+        )
+        result = self._save_measured_result(front_image, side_image, leaf_analysis)
+
+        with patch.object(settings, "UPLOAD_DIR", self.test_dir), \
+             patch.object(settings, "RESULT_CACHE_ENABLED", False), \
+             patch.object(analysis_pipeline, "_image_processor", None):
+            response = self.client.post(
+                "/api/calibrate/s1", data={"camera_height": 1.6, "distance_from_tree": 12.0}
+            )
+            # Recalibration needs no image processor, nor the segmentation model it loads
+            self.assertIsNone(analysis_pipeline._image_processor)
+
+        self.assertEqual(response.status_code, 200)
+        calibrated = response.json()["result"]
+        expected = analyzer.extract_dimensions(front_image, side_image, 1.6, 12.0)
+        self.assertEqual(calibrated["dimensions"], expected.dict())
+        self.assertEqual(calibrated["dimensions"]["unit"], "meters")
+        foliage_data = analyzer.generate_foliage_data(expected, leaf_analysis)
+        self.assertEqual(
+            calibrated["foliage_data"],
+            dict(result["foliage_data"], volume=foliage_data.volume, density=foliage_data.density)
+        )
+        self.assertEqual(calibrated["leaf_analysis"], result["leaf_analysis"])
+        self.assertEqual(self.client.get("/api/results/s1").json(), calibrated)
+        with open(os.path.join(self.test_dir, "s1", "metadata.json")) as f:
+            self.assertEqual(json.load(f)["distance_from_tree"], 12.0)
+
+        # An omitted parameter keeps the value of the previous calibration
+        with patch.object(settings, "UPLOAD_DIR", self.test_dir), \
+             patch.object(settings, "RESULT_CACHE_ENABLED", False):
+            response = self.client.post("/api/calibrate/s1", data={"camera_height": 2.0})
+
+        self.assertEqual(response.status_code, 200)
+        expected = analyzer.extract_dimensions(front_image, side_image, 2.0, 12.0)
+        self.assertEqual(response.json()["result"]["dimensions"], expected.dict())
+        with open(os.path.join(self.test_dir, "s1", "metadata.json")) as f:
+            metadata = json.load(f)
+        self.assertEqual((metadata["camera_height"], metadata["distance_from_tree"]), (2.0, 12.0))
+
+    def test_export_and_visualization_routes(self):
+        """Test every export format, repeat exports from cache, and re-rendering after recalibration"""
+        from app.api import routes
+        from app.services.export_cache import ExportCache, EXPORT_FORMATS
+
+        front_image, side_image = self._tree_views()
+        self._save_measured_result(front_image, side_image, LeafAnalysis(
+            average_leaf_size=50.0, estimated_leaf_count=400, edge_density=0.1, dominant_colors=["#228b22"]
+        ))
+        export_cache = ExportCache(routes.report_generator, result_store=self.store)
+        self.addCleanup(export_cache.shutdown)
+        signatures = {"pdf": b"%PDF", "png": b"\x89PNG", "obj": b"#", "gltf": b"{", "glb": b"glTF"}
+
+        with patch.object(routes, "export_cache", export_cache), \
+             patch.object(settings, "UPLOAD_DIR", self.test_dir), \
+             patch.object(settings, "RESULT_CACHE_ENABLED", False):
+            exports = {}
+            for export_format in EXPORT_FORMATS:
+                response = self.client.post("/api/export/s1", data={"format": export_format.upper()})
+                self.assertEqual(response.status_code, 200, export_format)
+                self.assertEqual(response.headers["content-type"], "application/octet-stream")
+                self.assertIn(EXPORT_FORMATS[export_format], response.headers["content-disposition"])
+                self.assertTrue(response.content.startswith(signatures[export_format]), export_format)
+                exports[export_format] = response.content
+
+            self.assertEqual(self.client.post("/api/export/s1", data={"format": "bmp"}).status_code, 400)
+            self.assertEqual(self.client.post("/api/export/missing", data={"format": "pdf"}).status_code, 404)
+
+            generator = routes.report_generator
+            with patch.object(generator, "generate_3d_model", wraps=generator.generate_3d_model) as render:
+                repeat = self.client.post("/api/export/s1", data={"format": "obj"})
+                self.assertEqual(render.call_count, 0)
+                self.assertEqual(repeat.content, exports["obj"])
+
+                calibrated = self.client.post(
+                    "/api/calibrate/s1", data={"camera_height": 1.6, "distance_from_tree": 12.0}
+                )
+                self.assertEqual(calibrated.status_code, 200)
+                regenerated = self.client.post("/api/export/s1", data={"format": "obj"})
+                self.assertEqual(render.call_count, 1)
+                self.assertNotEqual(regenerated.content, exports["obj"])
+
+            # Only the exports of the current result version are kept
+            exports_dir = os.path.join(self.test_dir, "s1", "exports")
+            self.assertEqual(len(os.listdir(exports_dir)), 1)
+
+            visualization = self.client.get("/api/visualization/s1")
+            preview = self.client.get("/api/visualization/s1", params={"preview": "true"})
+            self.assertEqual(self.client.get("/api/visualization/s1", params={"dpi": 10}).status_code, 422)
+            self.assertEqual(self.client.get("/api/visualization/missing").status_code, 404)
+
+        for response in (visualization, preview):
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["content-type"], "image/png")
+            self.assertTrue(response.content.startswith(b"\x89PNG"))
+        self.assertLess(len(preview.content), len(visualization.content))
+
+    def test_calibration_requires_measurements(self):
+        """Test that results saved without pixel measurements cannot be recalibrated"""
+        import json
+        from app.services.analysis_pipeline import save_result
+
+        save_result("s1", {"session_id": "s1"})
+        os.makedirs(os.path.join(self.test_dir, "s1"), exist_ok=True)
+        with open(os.path.join(self.test_dir, "s1", "metadata.json"), "w") as f:
+            json.dump({"session_id": "s1"}, f)
+
+        with patch.object(settings, "UPLOAD_DIR", self.test_dir):
+            self.assertEqual(self.client.post("/api/calibrate/s1").status_code, 409)
+            self.assertEqual(self.client.post("/api/calibrate/missing").status_code, 404)
+
+    def test_calibration_rejects_non_positive_parameters(self):
+        """Test that zero or negative camera parameters are rejected"""
+        for data in ({"camera_height": 0}, {"distance_from_tree": -5.0}):
+            self.assertEqual(self.client.post("/api/calibrate/s1", data=data).status_code, 400)
+
+class TestExportCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.results_patch = patch.object(settings, "RESULTS_DIR", self.test_dir)
+        self.results_patch.start()
+    
+    def tearDown(self):
+        self.results_patch.stop()
+        shutil.rmtree(self.test_dir)
+    
+    def _result(self, height):
+        return {
+            "session_id": "s1",
+            "dimensions": {"height": height, "width": 4.0, "depth": 3.5, "confidence": 0.8, "unit": "meters"},
+            "leaf_analysis": {
+                "average_leaf_size": 120.0, "estimated_leaf_count": 500, "leaf_type": "elliptical",
+                "leaf_type_confidence": 0.7, "edge_density": 0.1, "dominant_colors": ["#228b22"]
+            },
+            "foliage_data": {"volume": 20.0, "density": 25.0, "vertex_count": 2000, "face_count": 1000}
+        }
+    
+    def test_artifacts_cached_per_result_version(self):
+        """Test that repeat exports are served from cache and result changes invalidate them"""
+        from app.services.export_cache import ExportCache
+        from app.services.report_generator import ReportGenerator
+        from app.services.result_store import ResultStore
+        
+        os.makedirs(os.path.join(self.test_dir, "s1"))
+        generator = ReportGenerator()
+        store = ResultStore()
+        cache = ExportCache(generator, result_store=store)
+        self.addCleanup(cache.shutdown)
+        
+        stored = store.put("s1", self._result(10.0))
+        with patch.object(generator, "generate_3d_model", wraps=generator.generate_3d_model) as render:
+            first = cache.render("s1", "obj", stored).result(timeout=30)
+            second = cache.render("s1", "obj", stored).result(timeout=30)
+            self.assertEqual(first, second)
+            self.assertEqual(render.call_count, 1)
+            
+            updated = store.put("s1", self._result(12.0))
+            third = cache.render("s1", "obj", updated).result(timeout=30)
+            self.assertEqual(render.call_count, 2)
+        
+        self.assertNotEqual(third, first)
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(os.path.exists(third))
+    
+    def test_older_render_finishing_last(self):
+        """Test that renders of two result versions don't share files or prune the newer one"""
+        from app.services.export_cache import ExportCache
+        from app.services.report_generator import ReportGenerator
+        from app.services.result_store import ResultStore
+        
+        os.makedirs(os.path.join(self.test_dir, "s1"))
+        store = ResultStore()
+        cache = ExportCache(ReportGenerator(), max_workers=2, result_store=store)
+        self.addCleanup(cache.shutdown)
+        
+        old = store.put("s1", self._result(10.0))
+        new = store.put("s1", self._result(12.0))
+        new_path = cache.render("s1", "obj", new).result(timeout=30)
+        old_path = cache.render("s1", "obj", old).result(timeout=30)
+        
+        self.assertNotEqual(os.path.dirname(old_path), os.path.dirname(new_path))
+        self.assertTrue(os.path.exists(new_path))
+        self.assertTrue(os.path.exists(old_path))  # Not current, so it prunes nothing
+        
+        # The next render of the current version removes the stale one
+        os.remove(new_path)
+        cache.render("s1", "obj", new).result(timeout=30)
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(os.listdir(os.path.join(self.test_dir, "s1", "exports")), [new.version])
+    
+    def test_visualization_rendered_in_memory(self):
+        """Test that the visualization renders to PNG bytes at the requested DPI, from any thread"""
+        import cv2
+        import numpy as np
+        from concurrent.futures import ThreadPoolExecutor
+        from app.services.report_generator import ReportGenerator
+        
+        generator = ReportGenerator()
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            renders = list(executor.map(lambda _: generator.render_visualization(self._result(10.0), 50), range(3)))
+        
+        self.assertEqual(len(set(renders)), 1)
+        image = cv2.imdecode(np.frombuffer(renders[0], np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(image.shape[:2], (10 * 50, 12 * 50))
+    
+    def test_prerender_configured_formats(self):
+        """Test that new results are rendered in the background in the configured formats"""
+        from app.services.export_cache import ExportCache
+        from app.services.report_generator import ReportGenerator
+        from app.services.result_store import ResultStore
+        
+        os.makedirs(os.path.join(self.test_dir, "s1"))
+        cache = ExportCache(ReportGenerator())
+        self.addCleanup(cache.shutdown)
+        stored = ResultStore().put("s1", self._result(10.0))
+        
+        with patch.object(settings, "EXPORT_PRERENDER_FORMATS", ["gltf"]):
+            cache.prerender("s1", stored)
+        
+        cache.render("s1", "gltf", stored).result(timeout=30)
+        self.assertIsNotNone(cache.get("s1", "gltf", stored.version))
+        self.assertIsNone(cache.get("s1", "obj", stored.version))
+
+class TestMeshBuilder(unittest.TestCase):
+    def setUp(self):
+        self.result = {
+            "session_id": "s1",
+            "dimensions": {"height": 10.0, "width": 4.0, "depth": 3.0},
+            "leaf_analysis": {"dominant_colors": ["#228b22"]},
+            "foliage_data": {"vertex_count": 2000, "face_count": 1000}
+        }
+    
+    def test_meshes_are_closed_and_within_caps(self):
+        """Test that trunk and crown are watertight, face outwards and fit the foliage caps"""
+        import numpy as np
+        from app.services.mesh_builder import MeshBuilder
+        
+        parts = MeshBuilder().build(self.result)
+        self.assertLessEqual(sum(part.vertex_count for part in parts), 2000)
+        self.assertLessEqual(sum(part.face_count for part in parts), 1000)
+        
+        for part in parts:
+            triangles = part.positions[part.indices]
+            face_normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+            vertex_normals = part.normals[part.indices].mean(axis=1)
+            self.assertTrue((np.einsum("ij,ij->i", face_normals, vertex_normals) > 0).all())
+            
+            edges = np.sort(np.concatenate([part.indices[:, [0, 1]], part.indices[:, [1, 2]], part.indices[:, [2, 0]]]), axis=1)
+            _, counts = np.unique(edges, axis=0, return_counts=True)
+            self.assertTrue((counts == 2).all())
+        
+        crown = parts[1]
+        self.assertAlmostEqual(float(crown.positions[:, 1].max()), 10.0, places=4)
+        self.assertAlmostEqual(float(crown.positions[:, 2].max()), 1.5, places=1)
+    
+    def test_glb_layout(self):
+        """Test the GLB header, chunk alignment and that accessors address the packed buffer"""
+        import json
+        import struct
+        import numpy as np
+        from app.services.mesh_builder import MeshBuilder
+        
+        builder = MeshBuilder()
+        parts = builder.build(self.result)
+        glb = builder.to_glb(parts)
+        
+        magic, version, length = struct.unpack("<III", glb[:12])
+        self.assertEqual((magic, version, length), (0x46546C67, 2, len(glb)))
+        json_length, _ = struct.unpack("<II", glb[12:20])
+        self.assertEqual(json_length % 4, 0)
+        gltf = json.loads(glb[20:20 + json_length])
+        binary = glb[28 + json_length:]
+        
+        view = gltf["bufferViews"][gltf["accessors"][2]["bufferView"]]
+        indices = np.frombuffer(binary, np.uint32, view["byteLength"] // 4, view["byteOffset"])
+        np.testing.assert_array_equal(indices, parts[0].indices.ravel())
+        
+        obj = builder.to_obj(parts)
+        self.assertEqual(obj.count("\nv "), sum(part.vertex_count for part in parts))
+        self.assertEqual(obj.count("\nf "), sum(part.face_count for part in parts))
+
+class TestFoliageGeometry(unittest.TestCase):
+    def setUp(self):
+        self.result = {
+            "session_id": "s1",
+            "dimensions": {"height": 10.0, "width": 4.0, "depth": 3.0},
+            "leaf_analysis": {"estimated_leaf_count": 20000, "leaf_type": "rounded", "dominant_colors": []}
+        }
+    
+    def test_levels_are_nested_and_inside_crown(self):
+        """Test LOD sizes, that coarse levels prefix finer ones, and cards stay in the crown"""
+        import numpy as np
+        from app.services.foliage_geometry import FoliageGeometry
+        from app.services.mesh_builder import crown_ellipsoid
+        
+        geometry = FoliageGeometry([100, 1000, 50000])
+        self.assertEqual(geometry.lod_leaf_counts(20000), [100, 1000, 20000])
+        
+        coarse = geometry.instances(self.result, 0)
+        fine = geometry.instances(self.result, 2)
+        self.assertEqual((len(coarse), len(fine)), (100, 20000))
+        np.testing.assert_array_equal(coarse.translations, fine.translations[:100])
+        
+        center, radii = crown_ellipsoid(self.result["dimensions"])
+        self.assertLessEqual(np.linalg.norm((fine.translations - center) / radii, axis=1).max(), 1.0 + 1e-5)
+        np.testing.assert_allclose(np.linalg.norm(fine.rotations, axis=1), 1.0, atol=1e-5)
+        
+        # Coarse cards cover the same total leaf area as the fine ones
+        coarse_area = (coarse.scales[:, 0] * coarse.scales[:, 1]).sum()
+        fine_area = (fine.scales[:, 0] * fine.scales[:, 1]).sum()
+        self.assertAlmostEqual(coarse_area / fine_area, 1.0, delta=0.15)
+    
+    def test_card_size_follows_dimension_units(self):
+        """Test that cards match the measured leaf size in relative and in calibrated dimensions"""
+        import numpy as np
+        from app.services.foliage_geometry import FoliageGeometry
+        
+        geometry = FoliageGeometry([100])
+        leaf_analysis = dict(self.result["leaf_analysis"], estimated_leaf_count=100, average_leaf_size=400.0)
+        measurements = {"height": 800.0, "width": 320.0, "depth": 240.0, "image_height": 1024, "confidence": 0.9}
+        relative = dict(
+            self.result, leaf_analysis=leaf_analysis, measurements=measurements,
+            dimensions={"height": 800.0, "width": 320.0, "depth": 240.0, "unit": "relative"}
+        )
+        calibrated = dict(
+            relative, dimensions={"height": 10.0, "width": 4.0, "depth": 3.0, "unit": "meters"}
+        )
+        
+        for result, side in ((relative, 20.0), (calibrated, 20.0 * 10.0 / 800.0)):
+            scales = geometry.instances(result, 0).scales
+            card_sides = np.sqrt(scales[:, 0] * scales[:, 1])
+            self.assertTrue(np.all((card_sides >= side * 0.8 - 1e-4) & (card_sides <= side * 1.2 + 1e-4)))
+        
+        # Cards of an unknown scale keep the typical size; relative ones are always in pixels
+        self.assertEqual(FoliageGeometry.leaf_card_size(self.result), (0.07, 0.07))
+        no_measurements = dict(relative, measurements=None)
+        self.assertAlmostEqual(float(np.prod(FoliageGeometry.leaf_card_size(no_measurements))), 400.0, places=3)
+    
+    def test_instanced_glb(self):
+        """Test that the GLB instances one leaf card with one transform per leaf"""
+        import json
+        import struct
+        from app.services.foliage_geometry import FoliageGeometry
+        
+        geometry = FoliageGeometry([100])
+        glb = geometry.to_glb(self.result, geometry.instances(self.result, 0))
+        
+        json_length, _ = struct.unpack("<II", glb[12:20])
+        gltf = json.loads(glb[20:20 + json_length])
+        attributes = gltf["nodes"][0]["extensions"]["EXT_mesh_gpu_instancing"]["attributes"]
+        self.assertEqual(gltf["accessors"][attributes["TRANSLATION"]]["count"], 100)
+        self.assertEqual(gltf["accessors"][attributes["ROTATION"]]["type"], "VEC4")
+        self.assertEqual(gltf["accessors"][0]["count"], 4)
+
+class TestTiledLeafDetector(unittest.TestCase):
+    def setUp(self):
+        import numpy as np
+        import cv2
+        from app.services.analysis_context import AnalysisContext
+        
+        self.test_dir = tempfile.mkdtemp()
+        self.image_processor = ImageProcessor()
+        self.tree_analyzer = TreeAnalyzer()
+        
+        # Leafy texture: blurred noise thresholded into blobs, inside an elliptical crown
+        h, w = 1200, 1600
+        rng = np.random.default_rng(0)
+        noise = cv2.GaussianBlur((rng.random((h, w)) * 255).astype(np.float32), (0, 0), 5)
+        blobs = np.where(noise > np.median(noise) + 3, 200, 30).astype(np.uint8)
+        image = np.full((h, w, 3), (235, 206, 135), dtype=np.uint8)
+        crown = np.zeros((h, w), dtype=np.uint8)
+        cv2.ellipse(crown, (w // 2, h // 2), (w // 3, h // 3), 0, 0, 360, 255, -1)
+        leaves = np.dstack([blobs // 4, blobs, blobs // 3])
+        image[crown > 0] = leaves[crown > 0]
+        
+        self.image_path = os.path.join(self.test_dir, "leafy.png")
+        cv2.imwrite(self.image_path, image)
+        self.context = self.image_processor.segment(
+            AnalysisContext(self.image_processor.preprocess_image(self.image_path))
+        )
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+    
+    def test_tiles_partition_image(self):
+        """Test that tile cores cover every pixel exactly once"""
+        import numpy as np
+        from app.services.tiled_leaf_detector import TiledLeafDetector
+        
+        detector = TiledLeafDetector(self.image_processor, self.tree_analyzer, tile_size=300)
+        coverage = np.zeros((700, 1000), dtype=np.int32)
+        for tile in detector.tiles(1000, 700, 50):
+            x0, y0, x1, y1 = tile.core
+            coverage[y0:y1, x0:x1] += 1
+            self.assertLessEqual(tile.padded[0], x0)
+            self.assertGreaterEqual(tile.padded[2], x1)
+        self.assertTrue((coverage == 1).all())
+    
+    def test_overlapping_tiles_deduplicated(self):
+        """Test that, on identical pixels, small overlapping tiles detect exactly what a single tile does"""
+        from app.services.tiled_leaf_detector import TiledLeafDetector
+        
+        # Without per-tile contrast normalization the tiles see identical pixels
+        with patch.object(self.image_processor, "_normalize_image", lambda image, grid=(8, 8): image):
+            single = TiledLeafDetector(self.image_processor, self.tree_analyzer, tile_size=4096).detect(
+                self.image_path, self.context
+            )
+            tiled = TiledLeafDetector(self.image_processor, self.tree_analyzer, tile_size=400).detect(
+                self.image_path, self.context
+            )
+        
+        self.assertGreater(len(single.contours), 0)
+        self.assertEqual(
+            sorted(map(tuple, single.contours.bounds)), sorted(map(tuple, tiled.contours.bounds))
+        )
+        self.assertEqual(single.edge_pixels, tiled.edge_pixels)
+    
+    def test_tiles_with_contrast_normalization(self):
+        """Test that tiles normalized with their own CLAHE cells stay close to a single tile"""
+        from app.services.tiled_leaf_detector import TiledLeafDetector
+        
+        single = TiledLeafDetector(self.image_processor, self.tree_analyzer, tile_size=4096).detect(
+            self.image_path, self.context
+        )
+        tiled = TiledLeafDetector(self.image_processor, self.tree_analyzer, tile_size=400).detect(
+            self.image_path, self.context
+        )
+        
+        # CLAHE cells differ slightly per tile: allow 2% on counts and 5% of contours to differ
+        single_bounds = set(map(tuple, single.contours.bounds))
+        tiled_bounds = set(map(tuple, tiled.contours.bounds))
+        self.assertAlmostEqual(len(tiled.contours) / len(single.contours), 1.0, delta=0.02)
+        self.assertGreaterEqual(len(single_bounds & tiled_bounds) / len(single_bounds | tiled_bounds), 0.95)
+        self.assertAlmostEqual(tiled.edge_pixels / single.edge_pixels, 1.0, delta=0.02)
+    
+    def test_leaf_sizes_normalized_to_analysis_resolution(self):
+        """Test that high-res leaf areas are reported at the analysis resolution"""
+        from app.services.tiled_leaf_detector import TiledLeafDetector
+        
+        analysis = TiledLeafDetector(self.image_processor, self.tree_analyzer).analyze_leaves(
+            self.image_path, self.image_path, self.context, self.context
+        )
+        standard = self.tree_analyzer.analyze_leaves(self.context, self.context)
+        
+        self.assertGreater(analysis.estimated_leaf_count, 0)
+        self.assertAlmostEqual(analysis.average_leaf_size / standard.average_leaf_size, 1.0, delta=0.5)
+        self.assertAlmostEqual(analysis.edge_density / standard.edge_density, 1.0, delta=0.2)
+
+class TestIntermediateStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.results_patch = patch.object(settings, "RESULTS_DIR", self.test_dir)
+        self.results_patch.start()
+        self.mmap_patch = patch.object(settings, "MMAP_INTERMEDIATES", True)
+        self.mmap_patch.start()
+        self.image_path = create_tree_image(os.path.join(self.test_dir, "front.jpg"))
+
+    def tearDown(self):
+        self.mmap_patch.stop()
+        self.results_patch.stop()
+        shutil.rmtree(self.test_dir)
+
+    def test_reanalysis_maps_stored_views(self):
+        """Test that a re-analysis reuses the memory-mapped views instead of preprocessing"""
+        import numpy as np
+        from app.services import analysis_pipeline
+
+        view = ("session-1", "front", self.image_path, None)
+        first = analysis_pipeline._prepare_view(view)
+        self.assertIsInstance(first.image, np.memmap)
+
+        image_processor, _ = analysis_pipeline._get_services()
+        with patch.object(image_processor, "preprocess_image", side_effect=AssertionError("preprocessed")):
+            second = analysis_pipeline._prepare_view(view)
+
+        self.assertIsInstance(second.segmented, np.memmap)
+        np.testing.assert_array_equal(second.image, first.image)
+        np.testing.assert_array_equal(second.segmented, first.segmented)
+        np.testing.assert_array_equal(second.tree_mask, first.tree_mask)
+
+    def test_stale_fingerprint_recomputed(self):
+        """Test that views stored for other preprocessing parameters are not reused"""
+        from app.services import analysis_pipeline
+
+        view = ("session-1", "front", self.image_path, "image-hash")
+        analysis_pipeline._prepare_view(view)
+
+        image_processor, _ = analysis_pipeline._get_services()
+        with patch.object(settings, "MAX_IMAGE_SIZE", (512, 512)), \
+             patch.object(image_processor, "max_size", (512, 512)), \
+             patch.object(image_processor, "preprocess_image", wraps=image_processor.preprocess_image) as preprocess:
+            context = analysis_pipeline._prepare_view(view)
+
+        preprocess.assert_called_once()
+        self.assertLessEqual(max(context.shape[:2]), 512)
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+    
+    def test_rebuild_from_existing_sessions(self):
+        """Test that an empty index is populated from sessions already on disk"""
+        from app.services.session_store import SessionStore
+        
+        for session_id in ("a", "b"):
+            os.makedirs(os.path.join(self.test_dir, session_id))
+            with open(os.path.join(self.test_dir, session_id, "metadata.json"), "w") as f:
+                f.write("{}")
+        os.makedirs(os.path.join(self.test_dir, "not-a-session"))
+        
+        database_url = f"sqlite:///{os.path.join(self.test_dir, 'sessions.db')}"
+        store = SessionStore(database_url, upload_dir=self.test_dir)
+        self.assertEqual(store.count(), 2)
+        store.set_status("a", "queued", job_id="job-1")
+        store.close()
+        
+        # The index persists and is not rebuilt once populated
+        store = SessionStore(database_url, upload_dir=self.test_dir)
+        self.assertEqual(store.get("a")["status"], "queued")
+        self.assertEqual(store.get("a")["job_id"], "job-1")
+        store.close()
+    
+    def test_rejects_non_sqlite_urls(self):
+        """Test that only sqlite DATABASE_URLs are accepted"""
+        from app.services.session_store import SessionStore
+        
+        with self.assertRaises(ValueError):
+            SessionStore("postgresql://localhost/trees", upload_dir=self.test_dir)
+
+class TestBatchExtractor(unittest.TestCase):
+    def setUp(self):
+        from app.services.batch_extractor import BatchExtractor
+        
+        self.test_dir = tempfile.mkdtemp()
+        self.extractor = BatchExtractor(upload_dir=os.path.join(self.test_dir, "uploads"))
+        self.image_path = create_tree_image(os.path.join(self.test_dir, "tree.jpg"))
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+    
+    def _create_archive(self, manifest):
+        import json
+        import zipfile
+        
+        archive_path = os.path.join(self.test_dir, "batch.zip")
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            archive.write(self.image_path, "trees/a_front.jpg")
+            archive.write(self.image_path, "trees/a_side.jpg")
+            if manifest is not None:
+                archive.writestr("manifest.json", json.dumps(manifest))
+        return archive_path
+    
+    def test_extract_creates_session_per_tree(self):
+        """Test that every manifest entry becomes an upload session"""
+        tree = {"front_image": "trees/a_front.jpg", "side_image": "trees/a_side.jpg"}
+        archive_path = self._create_archive({"trees": [
+            dict(tree, tree_id="a", camera_height=1.5, distance_from_tree=8.0),
+            dict(tree, tree_id="b"),
+        ]})
+        
+        sessions = self.extractor.extract(archive_path)
+        
+        self.assertEqual([s["tree_id"] for s in sessions], ["a", "b"])
+        self.assertEqual(sessions[0]["camera_height"], 1.5)
+        self.assertTrue(os.path.exists(sessions[0]["front_image"]))
+        self.assertTrue(os.path.exists(
+            os.path.join(os.path.dirname(sessions[1]["side_image"]), "metadata.json")
+        ))
+    
+    def test_manifest_form_field_and_validation(self):
+        """Test that an explicit manifest is used and missing images are rejected"""
+        archive_path = self._create_archive(None)
+        
+        sessions = self.extractor.extract(
+            archive_path, '[{"front_image": "trees/a_front.jpg", "side_image": "trees/a_side.jpg"}]'
+        )
+        self.assertEqual(len(sessions), 1)
+        
+        with self.assertRaises(ValueError):
+            self.extractor.extract(archive_path)
+        with self.assertRaises(ValueError):
+            self.extractor.extract(
+                archive_path, '[{"front_image": "missing.jpg", "side_image": "trees/a_side.jpg"}]'
+            )
+    
+    def test_manifest_field_types(self):
+        """Test that non-string image names and non-numeric camera fields are rejected"""
+        import json
+        
+        archive_path = self._create_archive(None)
+        tree = {"front_image": "trees/a_front.jpg", "side_image": "trees/a_side.jpg"}
+        
+        for invalid in (
+            dict(tree, front_image=["trees/a_front.jpg"]),
+            dict(tree, side_image={"path": "trees/a_side.jpg"}),
+            dict(tree, camera_height="abc"),
+            dict(tree, distance_from_tree=-2.0),
+            dict(tree, image_dpi=True)
+        ):
+            with self.assertRaises(ValueError):
+                self.extractor.extract(archive_path, json.dumps([invalid]))
+        
+        sessions = self.extractor.extract(archive_path, json.dumps([dict(tree, camera_height=None, image_dpi=300)]))
+        self.assertEqual(sessions[0]["image_dpi"], 300)
+
 class TestSchemas(unittest.TestCase):
     def test_tree_dimensions_creation(self):
         """Test TreeDimensions model creation"""
@@ -18,7 +18,8 @@ const ExportButtons = ({ sessionId, onExport }) => {
     { format: 'pdf', label: '📄 PDF Report', description: 'Complete analysis report' },
     { format: 'png', label: '🖼️ PNG Image', description: 'Visualization chart' },
     { format: 'obj', label: '🎯 OBJ Model', description: '3D model file' },
-    { format: 'gltf', label: '✨ GLTF Model', description: 'Web-optimized 3D' }
+    { format: 'gltf', label: '✨ GLTF Model', description: 'Web-optimized 3D' },
+    { format: 'glb', label: '📦 GLB Model', description: 'Compact binary 3D' }
   ];
 
   return (
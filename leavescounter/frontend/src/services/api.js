@@ -87,7 +87,8 @@ export const exportResults = async (sessionId, format) => {
     // Determine filename based on format
     const fileExtension = format === 'pdf' ? 'pdf' : 
                          format === 'png' ? 'png' : 
-                         format === 'obj' ? 'obj' : 'gltf';
+                         format === 'obj' ? 'obj' :
+                         format === 'glb' ? 'glb' : 'gltf';
     link.setAttribute('download', `tree_analysis_${sessionId}.${fileExtension}`);
     
     document.body.appendChild(link);
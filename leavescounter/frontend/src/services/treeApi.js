@@ -56,10 +56,28 @@ export const uploadImages = async (frontImage, sideImage, metadata = {}) => {
 };
 
 /**
- * Process uploaded images for tree analysis
+ * Get the status of a queued processing job
  */
-export const processImages = async (sessionId) => {
-  return api.post(`/process/${sessionId}`);
+export const getJobStatus = async (jobId) => {
+  return api.get(`/jobs/${jobId}`);
+};
+
+/**
+ * Process uploaded images for tree analysis and wait for the job to finish
+ */
+export const processImages = async (sessionId, pollInterval = 1000) => {
+  const job = await api.post(`/process/${sessionId}`);
+
+  let status = job;
+  while (status.status !== 'completed') {
+    if (status.status === 'failed') {
+      throw new Error(status.message || 'Processing failed');
+    }
+    await new Promise((resolve) => setTimeout(resolve, pollInterval));
+    status = await getJobStatus(job.job_id);
+  }
+
+  return status;
 };
 
 /**
@@ -109,6 +127,37 @@ export const exportResults = async (sessionId, format) => {
   document.body.removeChild(a);
 };
 
+/**
+ * Update a session's camera parameters; only the dimensions and foliage
+ * volume/density are recomputed, so this returns without re-running the analysis
+ */
+export const calibrateSession = async (sessionId, metadata = {}) => {
+  const formData = new FormData();
+  if (metadata.camera_height) {
+    formData.append('camera_height', metadata.camera_height);
+  }
+  if (metadata.distance_from_tree) {
+    formData.append('distance_from_tree', metadata.distance_from_tree);
+  }
+
+  return api.post(`/calibrate/${sessionId}`, formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+};
+
+/**
+ * Get foliage geometry at a level of detail (0 is the coarsest).
+ * Levels nest, so load level 0 first and refine with the next ones.
+ */
+export const getFoliage = async (sessionId, lod = 0, format = 'glb') => {
+  return api.get(`/foliage/${sessionId}`, {
+    params: { lod, format },
+    responseType: format === 'glb' ? 'arraybuffer' : 'json',
+  });
+};
+
 /**
  * Get list of all analysis sessions
  */